@@ -2,6 +2,7 @@
 
 import os
 import time
+import asyncio
 import tempfile
 from flask import Flask, render_template, request, jsonify, send_file
 from werkzeug.utils import secure_filename
@@ -10,7 +11,7 @@ import urllib.parse
 
 # Import with error handling
 try:
-    from src.utils.track_utils import merge_results, deduplicate_tracks
+    from src.utils.track_utils import merge_results, merge_results_async, deduplicate_tracks, track_identity, infer_track, track_reused
 except ImportError as e:
     print(f"ERROR: Failed to import track_utils: {e}")
     raise
@@ -20,20 +21,31 @@ try:
     from src.recognizers.audd import AuddRecognizer
     from src.recognizers.shazam import ShazamRecognizer
     from src.recognizers.songfinder import SongFinderRecognizer
+    from src.recognizers.local import LocalRecognizer
 except ImportError as e:
     print(f"ERROR: Failed to import recognizers: {e}")
     raise
 
 try:
     from src.utils.config import Config
-    from src.audio_processor import AudioProcessor
+    from src.utils.pcm_cache import PCMCache
+    from src.utils.result_cache import get_result_cache
+    from src.utils.fingerprint_cache import get_fingerprint_cache
+    from src.utils.circuit_breaker import breaker_states
+    from src.audio_processor import AudioProcessor, SegmentStream
+    from src.fingerprint import RepeatIndex
+    from src.pipeline import (
+        run_segments_screened, recognize_segment, recognize_segment_async,
+        PROVIDER_MODES, PIPELINE_ENGINES, SAMPLING_MODES, SCREEN_POLICIES
+    )
+    from src.scheduler import get_scheduler
     from src.output.formatters import format_output
 except ImportError as e:
     print(f"ERROR: Failed to import core modules: {e}")
     raise
 
 app = Flask(__name__)
-app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max file size (free tier limit)
+app.config['MAX_CONTENT_LENGTH'] = Config.MAX_UPLOAD_MB * 1024 * 1024  # Long mixes are streamed, not decoded whole
 app.config['UPLOAD_FOLDER'] = tempfile.gettempdir()
 
 # Allowed audio extensions
@@ -42,6 +54,18 @@ ALLOWED_EXTENSIONS = {'mp3', 'wav', 'flac', 'm4a', 'ogg', 'aac'}
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+_pcm_cache = None
+
+def get_pcm_cache():
+    """Shared decoded-PCM cache (None when disabled or unusable - off by default, uploads are one-shot)"""
+    global _pcm_cache
+    if _pcm_cache is None and Config.PCM_CACHE_ENABLED and Config.WEB_PCM_CACHE_ENABLED:
+        try:
+            _pcm_cache = PCMCache(Config.PCM_CACHE_DIR, Config.PCM_CACHE_MAX_MB * 1024 * 1024)
+        except OSError as e:
+            print(f"[MAIN] PCM cache disabled: {e}")
+    return _pcm_cache
+
 @app.route('/')
 def index():
     """Main page"""
@@ -61,13 +85,22 @@ def status():
         audd = AuddRecognizer()
         shazam = ShazamRecognizer()
         songfinder = SongFinderRecognizer()
+        local = LocalRecognizer()
         
+        cache = get_result_cache()
+        fingerprint_cache = get_fingerprint_cache()
         return jsonify({
             'acrcloud_available': acrcloud.is_available(),
             'audd_available': audd.is_available(),
             'shazam_available': shazam.is_available(),
             'songfinder_available': songfinder.is_available(),
-            'status': 'ready' if any([acrcloud.is_available(), audd.is_available(), shazam.is_available(), songfinder.is_available()]) else 'no_apis'
+            'local_available': local.is_available(),
+            'result_cache': cache.stats() if cache is not None else None,
+            'fingerprint_cache': fingerprint_cache.stats() if fingerprint_cache is not None else None,
+            'circuit_breakers': breaker_states(),
+            # Scheduled order with hit rate, latency percentiles and expected cost (None when scheduling is off)
+            'providers': get_scheduler().report([local, acrcloud, shazam, songfinder, audd]) if Config.SCHEDULER_ENABLED else None,
+            'status': 'ready' if any([local.is_available(), acrcloud.is_available(), audd.is_available(), shazam.is_available(), songfinder.is_available()]) else 'no_apis'
         })
     except Exception as e:
         return jsonify({
@@ -128,6 +161,31 @@ def recognize():
         confidence_threshold = float(request.form.get('confidence_threshold', 0.5))
         segment_length = int(request.form.get('segment_length', 60))
         segment_overlap = int(request.form.get('segment_overlap', 20))
+        probe_length = float(request.form.get('probe_length', Config.PROBE_LENGTH))
+        segment_mode = request.form.get('segment_mode', Config.SEGMENT_MODE).lower()
+        if segment_mode not in AudioProcessor.SEGMENT_MODES:
+            raise ValueError(f"segment_mode must be one of {', '.join(AudioProcessor.SEGMENT_MODES)}")
+        engine = request.form.get('engine', Config.PIPELINE_ENGINE).lower()
+        if engine not in PIPELINE_ENGINES:
+            raise ValueError(f"engine must be one of {', '.join(PIPELINE_ENGINES)}")
+        if engine == 'asyncio':
+            # Segments in flight on one event loop - no thread per request
+            workers = max(1, min(int(request.form.get('workers', Config.ASYNC_CONCURRENCY)), Config.ASYNC_CONCURRENCY))
+        else:
+            workers = max(1, min(int(request.form.get('workers', Config.WORKERS)), Config.MAX_WORKERS))
+        provider_mode = request.form.get('provider_mode', Config.PROVIDER_MODE).lower()
+        if provider_mode not in PROVIDER_MODES:
+            raise ValueError(f"provider_mode must be one of {', '.join(PROVIDER_MODES)}")
+        sampling = request.form.get('sampling', Config.SAMPLING_MODE).lower()
+        if sampling not in SAMPLING_MODES:
+            raise ValueError(f"sampling must be one of {', '.join(SAMPLING_MODES)}")
+        stride = max(1, int(request.form.get('stride', Config.SAMPLING_STRIDE)))
+        screen = request.form.get('screen', Config.SCREEN_MODE).lower()
+        if screen not in SCREEN_POLICIES:
+            raise ValueError(f"screen must be one of {', '.join(SCREEN_POLICIES)}")
+        single_decode = request.form.get('single_decode', 'true').lower() not in ('0', 'false', 'no')
+        use_temp_files = request.form.get('temp_files', 'false').lower() in ('1', 'true', 'yes')
+        use_repeat_index = request.form.get('repeat_index', str(Config.REPEAT_INDEX_ENABLED)).lower() in ('1', 'true', 'yes')
     except (ValueError, TypeError) as e:
         return jsonify({'error': f'Invalid parameter: {str(e)}'}), 400
     
@@ -148,20 +206,21 @@ def recognize():
     try:
         file.save(filepath)
         
-        # Check file size - limit to 50MB for free tier
+        # Check file size
         file_size = os.path.getsize(filepath)
-        max_size = 50 * 1024 * 1024  # 50MB
+        max_size = Config.MAX_UPLOAD_MB * 1024 * 1024
         if file_size > max_size:
             os.unlink(filepath)
             return jsonify({
-                'error': f'File too large ({file_size / 1024 / 1024:.1f}MB). Maximum size: 50MB for free tier.',
+                'error': f'File too large ({file_size / 1024 / 1024:.1f}MB). Maximum size: {Config.MAX_UPLOAD_MB}MB.',
                 'file_size_mb': round(file_size / 1024 / 1024, 1),
-                'max_size_mb': 50,
+                'max_size_mb': Config.MAX_UPLOAD_MB,
                 'hint': 'Try a smaller file or split your mix into smaller parts'
             }), 400
     except Exception as e:
         return jsonify({'error': f'Failed to save file: {str(e)}'}), 500
     
+    windows = None  # SegmentStream of a streamed mix, closed before the upload is deleted
     try:
         # Check API availability first
         try:
@@ -169,28 +228,41 @@ def recognize():
             audd = AuddRecognizer()
             shazam = ShazamRecognizer()
             songfinder = SongFinderRecognizer()
+            local = LocalRecognizer()
         except Exception as e:
             return jsonify({
                 'error': f'Failed to initialize API recognizers: {str(e)}',
                 'error_type': type(e).__name__
             }), 500
         
-        available_apis = [acrcloud, audd, shazam, songfinder]
-        if not any(api.is_available() for api in available_apis):
+        # Default priority: local library (offline, always asked first), ACRCloud
+        # (best for underground), Shazam (good coverage), SongFinder (underground
+        # focus), Audd.io. The scheduler reorders the APIs per segment from
+        # observed hit rate, latency and cost.
+        recognizers = [local, acrcloud, shazam, songfinder, audd]
+        scheduler = get_scheduler() if Config.SCHEDULER_ENABLED else None
+        # Fingerprints of this upload's recognized segments (needs in-memory segments)
+        repeats = RepeatIndex(min_coverage=Config.REPEAT_MIN_COVERAGE) if use_repeat_index and not use_temp_files else None
+        if not any(api.is_available() for api in recognizers):
             return jsonify({
                 'error': 'No recognition APIs available. Please configure API keys in environment variables.',
                 'acrcloud_configured': acrcloud.is_available(),
                 'audd_configured': audd.is_available(),
                 'shazam_configured': shazam.is_available(),
                 'songfinder_configured': songfinder.is_available(),
-                'hint': 'At least ACRCLOUD_ACCESS_KEY and ACRCLOUD_SECRET_KEY must be set'
+                'local_library_configured': local.is_available(),
+                'hint': 'Set ACRCLOUD_ACCESS_KEY and ACRCLOUD_SECRET_KEY, or LOCAL_INDEX_DIR to an index built with edm-index'
             }), 500
         
         # Process the file
         try:
             processor = AudioProcessor(
                 segment_length=segment_length,
-                segment_overlap=segment_overlap
+                segment_overlap=segment_overlap,
+                single_decode=single_decode,
+                probe_length=probe_length or None,
+                segment_mode=segment_mode,
+                pcm_cache=get_pcm_cache() if single_decode else None
             )
         except Exception as e:
             return jsonify({
@@ -199,8 +271,26 @@ def recognize():
                 'hint': 'Check if librosa and soundfile are installed'
             }), 500
         
-        # Get segments
+        # Get segments (single-decode mode decodes the upload once here).
+        # Mixes too long to hold decoded in memory are streamed instead: one
+        # sequential decode through a ring buffer, constant memory however long
+        stream_notes = []
         try:
+            stream = single_decode and (
+                processor.get_duration(filepath) * processor.SAMPLE_RATE * 2 > Config.MAX_DECODE_MB * 1024 * 1024
+            )
+            if stream:
+                processor.single_decode = False
+                processor.pcm_cache = None
+                # Novelty/phrase plans and screening analyse the whole decoded mix
+                if segment_mode != 'grid':
+                    stream_notes.append(f"Long mix streamed: segment_mode={segment_mode} needs the whole mix decoded, used grid")
+                    processor.segment_mode = 'grid'
+                if screen != 'off':
+                    stream_notes.append("Long mix streamed: screening needs the whole mix decoded, skipped")
+                    screen = 'off'
+            elif single_decode:
+                processor.decode(filepath)
             segments = processor.segment_audio(filepath)
         except Exception as e:
             return jsonify({
@@ -208,79 +298,56 @@ def recognize():
                 'error_type': type(e).__name__,
                 'hint': 'File may be corrupted or unsupported format'
             }), 500
-        all_tracks = []
-        
-        print(f"[MAIN] Processing {len(segments)} segments...")
-        print(f"[MAIN] API Status - ACRCloud: {acrcloud.is_available()}, Shazam: {shazam.is_available()}, SongFinder: {songfinder.is_available()}, Audd: {audd.is_available()}")
+        print(f"[MAIN] Processing {len(segments)} segments with {workers} {engine} workers...")
+        print(f"[MAIN] API Status - Local library: {local.is_available()}, ACRCloud: {acrcloud.is_available()}, Shazam: {shazam.is_available()}, SongFinder: {songfinder.is_available()}, Audd: {audd.is_available()}")
         
-        # Limit segments for very large files to prevent memory issues
-        # Free tier has ~512MB RAM, so be conservative
-        max_segments = 50  # Process max 50 segments (~37 minutes at 45s segments)
-        if len(segments) > max_segments:
-            segments = segments[:max_segments]
-            print(f"[MAIN] Large file detected ({len(segments)} total segments). Processing first {max_segments} segments to prevent memory issues.")
-            api_errors.append(f"File too long - processing first {max_segments} of {len(segments)} segments")
-        
-        # Process each segment
+        # Process segments (several in flight - almost all time is spent waiting on HTTP)
         segments_processed = 0
-        segments_with_results = 0
-        api_errors = []
+        collected_at = 0  # segments_processed at the last gc.collect()
+        api_errors = list(stream_notes)
+        # Streamed mixes: windows cut from the decode as the workers reach them
+        windows = SegmentStream(processor, filepath, segments, lookahead=max(8, workers)) if stream and not use_temp_files else None
         import gc  # Garbage collection
         
-        for start_time, end_time in segments:
+        def on_provider_error(recognizer, error):
+            api_errors.append(f"{recognizer.display_name} error: {error}")
+        
+        def process_segment(index, start_time, end_time):
+            """Recognize one segment; returns (processed, track)"""
             segment_path = None
             try:
-                # Extract segment
-                segment_path = processor.extract_segment(
-                    filepath, start_time, end_time - start_time
-                )
-                
-                # Try recognition with multiple APIs (try all available)
-                results = []
-                
-                # Try ACRCloud first (best for underground)
-                if acrcloud.is_available():
-                    try:
-                        print(f"[API] Calling ACRCloud for segment {start_time}-{end_time}...")
-                        result = acrcloud.recognize(segment_path, start_time, end_time - start_time)
-                        if result:
-                            results.append(result)
-                            print(f"[API] ✓ Segment {start_time}-{end_time}: ACRCloud found {result.artist} - {result.title} (conf: {result.confidence})")
-                        else:
-                            print(f"[API] ✗ Segment {start_time}-{end_time}: ACRCloud found nothing")
-                    except Exception as e:
-                        error_msg = str(e)
-                        print(f"[API] ✗ ACRCloud error for segment {start_time}-{end_time}: {error_msg}")
-                        api_errors.append(f"ACRCloud error: {error_msg}")
+                # Extract segment - in memory and shared by every API unless temp files were requested
+                if use_temp_files:
+                    segment_path = processor.extract_segment(
+                        filepath, start_time, end_time - start_time
+                    )
+                    segment_audio = segment_path
+                elif windows is not None:
+                    segment_audio = windows.get(index)
+                else:
+                    segment_audio = processor.load_segment(
+                        filepath, start_time, end_time - start_time
+                    )
                 
-                # Try Shazam (good coverage)
-                if (not results or (results and results[0].confidence < confidence_threshold)) and shazam.is_available():
-                    try:
-                        result = shazam.recognize(segment_path, start_time, end_time - start_time)
-                        if result:
-                            results.append(result)
-                            print(f"Segment {start_time}-{end_time}: Shazam found {result.artist} - {result.title}")
-                    except Exception as e:
-                        api_errors.append(f"Shazam error: {str(e)}")
-                
-                # Try SongFinder (underground focus)
-                if (not results or (results and results[0].confidence < confidence_threshold)) and songfinder.is_available():
-                    try:
-                        result = songfinder.recognize(segment_path, start_time, end_time - start_time)
-                        if result:
-                            results.append(result)
-                            print(f"Segment {start_time}-{end_time}: SongFinder found {result.artist} - {result.title}")
-                    except Exception as e:
-                        api_errors.append(f"SongFinder error: {str(e)}")
+                # Audio already recognized earlier in the mix - no API call
+                fp = None
+                if repeats is not None:
+                    fp = segment_audio.fingerprint()
+                    repeated = repeats.lookup(fp, segment_audio.duration, segment_audio.sample_rate)
+                    if repeated:
+                        print(f"[API] = Segment {start_time}-{end_time}: repeats {repeated['artist']} - {repeated['title']}")
+                        return True, infer_track(repeated, start_time, end_time)
                 
-                # Try Audd.io as last fallback
-                if (not results or (results and results[0].confidence < confidence_threshold)) and audd.is_available():
-                    try:
-                        result = audd.recognize(segment_path, start_time, end_time - start_time)
-                        if result:
-                            results.append(result)
-                    except Exception as e:
-                        api_errors.append(f"Audd error: {str(e)}")
+                results = recognize_segment(
+                    recognizers, segment_audio, start_time, end_time - start_time,
+                    confidence_threshold, mode=provider_mode, on_error=on_provider_error,
+                    scheduler=scheduler
+                )
+                if results:
+                    best = results[0]
+                    print(f"[API] ✓ Segment {start_time}-{end_time}: {best.source} found {best.artist} - {best.title} (conf: {best.confidence})")
+                else:
+                    print(f"[API] ✗ Segment {start_time}-{end_time}: no provider found a match")
                 
                 # Merge results (AI only used if results conflict)
                 # Fast by default - AI only when APIs disagree
@@ -290,11 +357,9 @@ def recognize():
                     for r2 in results[i+1:]
                 )
                 track = merge_results(results, start_time, end_time, confidence_threshold, use_ai=use_ai_merge)
-                if track:
-                    all_tracks.append(track)
-                    segments_with_results += 1
-                
-                segments_processed += 1
+                if track and fp is not None:
+                    repeats.add(fp, track)
+                return True, track
                     
             except Exception as e:
                 error_msg = str(e)
@@ -302,17 +367,105 @@ def recognize():
                 import traceback
                 traceback.print_exc()
                 api_errors.append(f"Segment {start_time}-{end_time}: {error_msg}")
+                return False, None
             finally:
-                # CRITICAL: Delete segment file immediately after processing to free memory
+                # Temp-file mode: delete segment file immediately after processing
                 if segment_path and os.path.exists(segment_path):
                     try:
                         os.unlink(segment_path)
                     except:
                         pass
+        
+        async def process_segment_async(index, start_time, end_time):
+            """process_segment() for the asyncio engine"""
+            segment_path = None
+            try:
+                # Extraction/decoding is blocking work - keep it off the event loop
+                if use_temp_files:
+                    segment_path = await asyncio.to_thread(
+                        processor.extract_segment, filepath, start_time, end_time - start_time
+                    )
+                    segment_audio = segment_path
+                elif windows is not None:
+                    segment_audio = await asyncio.to_thread(windows.get, index)
+                else:
+                    segment_audio = await asyncio.to_thread(
+                        processor.load_segment, filepath, start_time, end_time - start_time
+                    )
+                
+                fp = None
+                if repeats is not None:
+                    fp = await asyncio.to_thread(segment_audio.fingerprint)
+                    repeated = repeats.lookup(fp, segment_audio.duration, segment_audio.sample_rate)
+                    if repeated:
+                        print(f"[API] = Segment {start_time}-{end_time}: repeats {repeated['artist']} - {repeated['title']}")
+                        return True, infer_track(repeated, start_time, end_time)
+                
+                results = await recognize_segment_async(
+                    recognizers, segment_audio, start_time, end_time - start_time,
+                    confidence_threshold, mode=provider_mode, on_error=on_provider_error,
+                    scheduler=scheduler
+                )
+                if results:
+                    best = results[0]
+                    print(f"[API] ✓ Segment {start_time}-{end_time}: {best.source} found {best.artist} - {best.title} (conf: {best.confidence})")
+                else:
+                    print(f"[API] ✗ Segment {start_time}-{end_time}: no provider found a match")
                 
-                # Force garbage collection every 3 segments to free memory (more aggressive)
-                if segments_processed % 3 == 0:
-                    gc.collect()
+                use_ai_merge = len(results) > 1 and any(
+                    r1.artist != r2.artist or r1.title != r2.title 
+                    for i, r1 in enumerate(results) 
+                    for r2 in results[i+1:]
+                )
+                track = await merge_results_async(results, start_time, end_time, confidence_threshold, use_ai=use_ai_merge)
+                if track and fp is not None:
+                    repeats.add(fp, track)
+                return True, track
+                    
+            except Exception as e:
+                error_msg = str(e)
+                print(f"Error processing segment {start_time}-{end_time}: {error_msg}")
+                traceback.print_exc()
+                api_errors.append(f"Segment {start_time}-{end_time}: {error_msg}")
+                return False, None
+            finally:
+                if segment_path and os.path.exists(segment_path):
+                    try:
+                        os.unlink(segment_path)
+                    except:
+                        pass
+        
+        # Segments finish out of order with several workers; results stay in segment order
+        def on_complete(index, outcome):
+            nonlocal segments_processed, collected_at
+            if outcome[0]:
+                segments_processed += 1
+            # Force garbage collection every 3 processed segments to free memory
+            # (skipped windows don't count, so compare against the last collection)
+            if segments_processed - collected_at >= 3:
+                collected_at = segments_processed
+                gc.collect()
+        
+        # Flag silence/noise/ambience before any API call
+        screened = [None] * len(segments)
+        if screen != 'off':
+            try:
+                screened = processor.screen_segments(filepath, segments)
+                print(f"[MAIN] {sum(1 for reason in screened if reason)} low-information segments ({screen})")
+            except Exception as e:
+                print(f"[MAIN] Segment screening failed, querying every segment: {e}")
+        
+        # Inferred windows (adaptive sampling, deferred low-information windows) are not queried,
+        # and reused ones (repeat index, caches) were answered without an API call
+        outcomes, counts = run_segments_screened(
+            segments, process_segment_async if engine == 'asyncio' else process_segment, screened,
+            policy=screen, sampling=sampling, stride=stride, workers=workers, on_complete=on_complete,
+            identity=lambda outcome: track_identity(outcome[1]),
+            infer=lambda outcome, start_time, end_time: (True, infer_track(outcome[1], start_time, end_time)),
+            skipped=(False, None), engine=engine, reused=lambda outcome: track_reused(outcome[1])
+        )
+        all_tracks = [track for _, track in outcomes if track]
+        segments_with_results = len(all_tracks)
         
         print(f"Processed {segments_processed}/{len(segments)} segments, found {segments_with_results} with tracks")
         
@@ -330,13 +483,31 @@ def recognize():
                 'segments_processed': segments_processed,
                 'segments_total': len(segments),
                 'segments_with_tracks': segments_with_results,
+                'segments_queried': counts['queried'],
+                'segments_reused': counts['reused'],
+                'segments_inferred': counts['inferred'],
+                'segments_skipped': counts['skipped'],
+                'segments_low_info': {
+                    reason: sum(1 for r in screened if r == reason) for reason in sorted(set(filter(None, screened)))
+                },
                 'api_status': {
                     'acrcloud': acrcloud.is_available(),
                     'audd': audd.is_available(),
                     'shazam': shazam.is_available(),
-                    'songfinder': songfinder.is_available()
+                    'songfinder': songfinder.is_available(),
+                    'local': local.is_available()
                 }
             }
+            if repeats is not None:
+                response_data['repeat_index'] = repeats.stats()
+            if windows is not None:
+                response_data['stream'] = windows.stats()
+            cache = get_result_cache()
+            if cache is not None:
+                response_data['result_cache'] = cache.stats()
+            cache = get_fingerprint_cache()
+            if cache is not None:
+                response_data['fingerprint_cache'] = cache.stats()
             if api_errors:
                 response_data['warnings'] = api_errors[:5]  # First 5 errors
             return jsonify(response_data)
@@ -378,6 +549,9 @@ def recognize():
         }), 500
     
     finally:
+        # Stop the decoder (and any FFmpeg process) before its file goes away
+        if windows is not None:
+            windows.close()
         # Clean up uploaded file
         try:
             os.unlink(filepath)
@@ -0,0 +1,75 @@
+"""
+Benchmark window extraction to files: a decode per window vs one pass for all windows
+
+Usage (from the repo root):
+    python -m benchmarks.bench_bulk_extraction [--hours 1,2] [--format mp3] [--decoder ffmpeg] [--segment-length 45]
+
+Synthetic mixes of each length are encoded once to a temporary file, then
+every grid window is extracted to WAV with per-segment extract_segment()
+(a seek and decode per window: one FFmpeg process each with --decoder
+ffmpeg) and with extract_segments() (one sequential decode streamed
+through the slicer). CPU includes the FFmpeg child processes.
+"""
+
+import os
+import time
+import resource
+import tempfile
+import click
+import soundfile as sf
+
+from src.audio_processor import AudioProcessor
+from src.decoders import FFmpegDecoder
+from benchmarks.common import synth_mix
+
+FORMATS = {'mp3': ('MP3', 'MPEG_LAYER_III'), 'flac': ('FLAC', 'PCM_16'), 'wav': ('WAV', 'PCM_16')}
+
+
+def cpu_seconds() -> float:
+    """User + system CPU of this process and its finished children"""
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def measure(extract) -> tuple:
+    """(wall s, CPU s, files) of extract(), deleting the files it wrote"""
+    wall, cpu = time.perf_counter(), cpu_seconds()
+    paths = extract()
+    result = (time.perf_counter() - wall, cpu_seconds() - cpu, len(paths))
+    for path in paths:
+        os.unlink(path)
+    return result
+
+
+@click.command()
+@click.option('--hours', default='1,2', help='Comma-separated mix lengths in hours')
+@click.option('--format', 'audio_format', default='mp3', type=click.Choice(list(FORMATS)), help='Container of the mix')
+@click.option('--decoder', type=click.Choice(['auto', 'ffmpeg']), default='auto',
+              help='Decoding backends: in-process where possible (auto) or FFmpeg only')
+@click.option('--segment-length', default=45, help='Segment length in seconds')
+@click.option('--segment-overlap', default=15, help='Segment overlap in seconds')
+def main(hours, audio_format, decoder, segment_length, segment_overlap):
+    processor = AudioProcessor(segment_length=segment_length, segment_overlap=segment_overlap, single_decode=False,
+                               decoders=[FFmpegDecoder()] if decoder == 'ffmpeg' else None)
+    click.echo(f"{'mix':>5} {'windows':>7}  {'per-segment wall':>16} {'cpu':>7}  {'bulk wall':>9} {'cpu':>7}  {'speedup':>7}")
+    for h in (float(x) for x in hours.split(',')):
+        seconds = h * 3600
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, f"mix.{audio_format}")
+            container, subtype = FORMATS[audio_format]
+            sf.write(path, synth_mix(seconds, processor.SAMPLE_RATE, seed=int(h * 10)), processor.SAMPLE_RATE,
+                     format=container, subtype=subtype)
+            segments = processor._grid_segments(seconds)
+
+            per_wall, per_cpu, _ = measure(lambda: [
+                processor.extract_segment(path, start, end - start, os.path.join(tmp, f"{i}.wav"))
+                for i, (start, end) in enumerate(segments)
+            ])
+            bulk_wall, bulk_cpu, _ = measure(lambda: processor.extract_segments(path, segments, output_dir=tmp))
+            click.echo(f"{h:4.1f}h {len(segments):7d}  {per_wall:15.1f}s {per_cpu:6.1f}s  "
+                       f"{bulk_wall:8.1f}s {bulk_cpu:6.1f}s  {per_wall / bulk_wall:6.1f}x")
+
+
+if __name__ == '__main__':
+    main()
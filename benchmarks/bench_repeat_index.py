@@ -0,0 +1,87 @@
+"""
+Benchmark the repeat index: API calls saved and wrong reuses on a looped mix
+
+Usage (from the repo root):
+    python -m benchmarks.bench_repeat_index [--minutes 60] [--segment-length 45] [--overlap 15]
+
+Synthetic tracks here are built from a repeated 8-bar loop (as most techno
+is), so windows inside one track share audio at loop-aligned offsets while
+different tracks share none. Every window is looked up before it would be
+"sent"; on a miss it is recognized (the ground-truth track) and indexed.
+A reuse is correct if the reused track is the one playing in the middle of
+the window.
+"""
+
+import time
+import click
+import numpy as np
+
+from src.audio_processor import AudioProcessor
+from src.fingerprint import RepeatIndex, fingerprint
+from benchmarks.common import synth_track
+
+
+def looped_mix(seconds: float, sr: int, track_length: float, seed: int = 0) -> np.ndarray:
+    """Tracks made of a tiled 8-bar loop, back to back with 8-second crossfades, as int16 PCM"""
+    rng = np.random.default_rng(seed)
+    fade = int(8 * sr)
+    y = np.zeros(0, dtype=np.float32)
+    k = 0
+    while len(y) < seconds * sr:
+        bpm = rng.uniform(118, 132)
+        loop = synth_track(8 * 4 * 60.0 / bpm, sr, seed=seed + k)
+        track = np.tile(loop, int(np.ceil(track_length * sr / len(loop))))[:int(track_length * sr)]
+        if len(y):
+            ramp = np.linspace(0.0, 1.0, fade, dtype=np.float32)
+            y[-fade:] = y[-fade:] * (1 - ramp) + track[:fade] * ramp
+            track = track[fade:]
+        y = np.concatenate([y, track])
+        k += 1
+    return (y[:int(seconds * sr)] * 32767).astype(np.int16)
+
+
+@click.command()
+@click.option('--minutes', default=60.0, help='Length of the synthetic mix')
+@click.option('--track-length', default=300.0, help='Seconds per track')
+@click.option('--segment-length', default=45, help='Segment length in seconds')
+@click.option('--overlap', default=15, help='Segment overlap in seconds')
+@click.option('--min-coverage', default=0.6, help='RepeatIndex min_coverage')
+def main(minutes, track_length, segment_length, overlap, min_coverage):
+    processor = AudioProcessor(segment_length=segment_length, segment_overlap=overlap)
+    sr = processor.SAMPLE_RATE
+    pcm = looped_mix(minutes * 60, sr, track_length)
+    step = segment_length - overlap
+    fade = 8.0
+    windows = [(s, min(s + segment_length, len(pcm) / sr)) for s in np.arange(0, len(pcm) / sr, step)]
+
+    def playing(start, end):
+        # Track k occupies [k * (L - fade), (k + 1) * (L - fade) + fade)
+        return int(((start + end) / 2) // (track_length - fade))
+
+    index = RepeatIndex(min_coverage=min_coverage)
+    reused = wrong = 0
+    fingerprint(pcm[:sr], sr)  # Warm-up
+    fingerprint_ms, lookup_ms = [], []
+    for start, end in windows:
+        samples = processor.slice_segment(pcm, start, end)
+        t0 = time.perf_counter()
+        fp = fingerprint(samples, sr)
+        t1 = time.perf_counter()
+        result = index.lookup(fp, len(samples) / sr, sr)
+        fingerprint_ms.append((t1 - t0) * 1000)
+        lookup_ms.append((time.perf_counter() - t1) * 1000)
+        if result is not None:
+            reused += 1
+            wrong += int(result != playing(start, end))
+        else:
+            index.add(fp, playing(start, end))
+
+    click.echo(f"{len(windows)} windows of {segment_length}s ({overlap}s overlap), {minutes:.0f} min mix, "
+               f"{track_length:.0f}s tracks")
+    click.echo(f"API calls: {len(windows) - reused} (saved {reused}, {reused / len(windows):.0%}), wrong reuses: {wrong}")
+    click.echo(f"fingerprint: {np.mean(fingerprint_ms):.1f} ms per segment; "
+               f"lookup: {np.mean(lookup_ms):.1f} ms mean, {np.max(lookup_ms):.1f} ms max")
+
+
+if __name__ == '__main__':
+    main()
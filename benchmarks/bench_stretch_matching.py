@@ -0,0 +1,119 @@
+"""
+Benchmark local-library matching of pitched clips: accuracy and latency per stretch factor
+
+Usage (from the repo root):
+    python -m benchmarks.bench_stretch_matching [--tracks 20] [--clips 8] [--clip-length 45] [--max-stretch 0.08]
+
+Reference tracks are synthetic (kick, chords, hats and a harmonic lead line
+so peaks reach the upper bins) and indexed into a temporary ReferenceIndex.
+Clips cut from them are sped up the way a DJ would: resampled (pitch
+follows tempo, as with key lock off) or time-stretched with key lock.
+Each clip is matched as is only (--max-stretch 0, the plain peak-pair
+match) and with the stretch search. Clips of tracks that are not in the
+index measure false matches and the cost of a miss.
+"""
+
+import os
+import time
+import tempfile
+import click
+import librosa
+import numpy as np
+import soundfile as sf
+
+from src.fingerprint import spectral_peaks
+from src.reference_index import ReferenceIndex
+from benchmarks.common import synth_track
+
+SR = 22050
+FACTORS = (0.92, 0.94, 0.96, 0.98, 0.99, 1.0, 1.01, 1.02, 1.04, 1.06, 1.08)
+
+
+def pitched_track(seconds: float, sr: int, seed: int) -> np.ndarray:
+    """synth_track() plus a 16th-note lead with harmonics up to ~4 kHz"""
+    rng = np.random.default_rng(seed + 10_000)
+    y = synth_track(seconds, sr, seed=seed)
+    step = int(sr * 60.0 / rng.uniform(118, 132) / 4)
+    notes = 440 * 2 ** (rng.integers(0, 12, size=16) / 12)
+    t = np.arange(step) / sr
+    envelope = np.exp(-t * 8)
+    lead = np.zeros(len(y), dtype=np.float32)
+    for k, start in enumerate(range(0, len(y) - step, step)):
+        f = notes[k % len(notes)]
+        lead[start:start + step] = sum(np.sin(2 * np.pi * f * h * t) / h for h in range(1, 5)) * envelope
+    y = y + 0.2 * lead
+    return (y / np.abs(y).max() * 0.8).astype(np.float32)
+
+
+def speed_up(clip: np.ndarray, factor: float, key_lock: bool) -> np.ndarray:
+    """Clip played `factor` times faster, with or without key lock"""
+    if key_lock:
+        return librosa.effects.time_stretch(clip, rate=factor)
+    return librosa.resample(clip, orig_sr=SR, target_sr=SR / factor, res_type='soxr_hq')
+
+
+@click.command()
+@click.option('--tracks', default=20, help='Reference tracks indexed')
+@click.option('--track-length', default=180.0, help='Seconds per reference track')
+@click.option('--clips', default=8, help='Clips per stretch factor and mode')
+@click.option('--clip-length', default=45.0, help='Seconds per clip (after stretching)')
+@click.option('--max-stretch', default=0.08, help='Stretch searched by the index')
+@click.option('--seed', default=0)
+def main(tracks, track_length, clips, clip_length, max_stretch, seed):
+    rng = np.random.default_rng(seed)
+    references = [pitched_track(track_length, SR, seed=seed + k) for k in range(tracks)]
+    unknown = [pitched_track(track_length, SR, seed=seed + 1000 + k) for k in range(clips)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        library = os.path.join(tmp, 'library')
+        os.makedirs(library)
+        for k, y in enumerate(references):
+            sf.write(os.path.join(library, f"Artist {k:03d} - Track {k:03d}.wav"), y, SR)
+        index = ReferenceIndex(os.path.join(tmp, 'index'))
+        start = time.perf_counter()
+        index.update(library, lambda path: sf.read(path, dtype='int16'), ('.wav',))
+        click.echo(f"Indexed {len(index)} tracks of {track_length:.0f}s in {time.perf_counter() - start:.1f}s")
+        spectral_peaks(references[0][:SR], SR)  # Warm-up
+
+        def run(clip, stretch):
+            peaks = spectral_peaks(clip, SR)
+            t0 = time.perf_counter()
+            match = index.match(peaks, len(clip) / SR, SR, max_stretch=stretch)
+            return match, (time.perf_counter() - t0) * 1000
+
+        click.echo(f"\n{'mode':8} {'factor':>6}  {'plain':>6} {'ms':>5}  {'search':>6} {'ms':>5}  {'speed err':>9}")
+        for key_lock in (False, True):
+            for factor in FACTORS:
+                plain = found = 0
+                plain_ms, search_ms, errors = [], [], []
+                for _ in range(clips):
+                    k = int(rng.integers(tracks))
+                    source_length = int(clip_length * factor * SR) + SR
+                    offset = int(rng.integers(0, len(references[k]) - source_length))
+                    clip = speed_up(references[k][offset:offset + source_length], factor, key_lock)[:int(clip_length * SR)]
+                    expected = f"Track {k:03d}"
+
+                    match, ms = run(clip, 0.0)
+                    plain += int(match is not None and match['title'] == expected)
+                    plain_ms.append(ms)
+                    match, ms = run(clip, max_stretch)
+                    search_ms.append(ms)
+                    if match is not None and match['title'] == expected:
+                        found += 1
+                        errors.append(abs(match['stretch'] - factor))
+                error = f"{np.median(errors) * 100:.2f}%" if errors else '-'
+                click.echo(f"{'key lock' if key_lock else 'pitch':8} {factor:6.2f}  {plain / clips:6.0%} {np.mean(plain_ms):5.0f}  "
+                           f"{found / clips:6.0%} {np.mean(search_ms):5.0f}  {error:>9}")
+
+        false_matches = 0
+        miss_ms = []
+        for y in unknown:
+            offset = int(rng.integers(0, len(y) - int(clip_length * SR)))
+            match, ms = run(y[offset:offset + int(clip_length * SR)], max_stretch)
+            false_matches += int(match is not None)
+            miss_ms.append(ms)
+        click.echo(f"\nUnindexed clips: {false_matches}/{len(unknown)} false matches, {np.mean(miss_ms):.0f} ms per miss")
+
+
+if __name__ == '__main__':
+    main()
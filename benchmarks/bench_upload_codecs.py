@@ -0,0 +1,73 @@
+"""
+Benchmark upload encodings: bytes on the wire and time per segment
+
+Usage (from the repo root):
+    python -m benchmarks.bench_upload_codecs [AUDIO_FILE] [--segments 10] [--uplink-mbps 10]
+    python -m benchmarks.bench_upload_codecs mix.mp3 --live acrcloud
+
+Without --live the end-to-end time is encode time plus the upload time at the
+given uplink speed. With --live each segment is actually sent to the provider
+(uses API quota) and the measured round trip is reported.
+"""
+
+import time
+import click
+import numpy as np
+
+from src.audio_processor import AudioProcessor, SegmentAudio, UPLOAD_CODECS
+from src.recognizers.acrcloud import ACRCloudRecognizer
+from src.recognizers.audd import AuddRecognizer
+from src.recognizers.shazam import ShazamRecognizer
+from src.recognizers.songfinder import SongFinderRecognizer
+from benchmarks.common import synth_mix
+
+RECOGNIZERS = {
+    'acrcloud': ACRCloudRecognizer,
+    'audd': AuddRecognizer,
+    'shazam': ShazamRecognizer,
+    'songfinder': SongFinderRecognizer,
+}
+
+
+@click.command()
+@click.argument('audio_file', required=False, type=click.Path(exists=True))
+@click.option('--segments', default=10, help='Number of segments to sample')
+@click.option('--segment-length', default=45, help='Segment length in seconds')
+@click.option('--uplink-mbps', default=10.0, help='Assumed uplink for the offline estimate')
+@click.option('--live', type=click.Choice(list(RECOGNIZERS)), help='Send segments to this provider')
+def main(audio_file, segments, segment_length, uplink_mbps, live):
+    processor = AudioProcessor(segment_length=segment_length, segment_overlap=0)
+    if audio_file:
+        pcm = processor.decode(audio_file)
+    else:
+        pcm = synth_mix(segments * segment_length, processor.SAMPLE_RATE)
+    
+    windows = [(i * segment_length, (i + 1) * segment_length) for i in range(segments)]
+    windows = [(s, e) for s, e in windows if e * processor.SAMPLE_RATE <= len(pcm)]
+    recognizer = RECOGNIZERS[live]() if live else None
+    
+    click.echo(f"{len(windows)} segments x {segment_length}s, uplink {uplink_mbps} Mbps")
+    click.echo(f"{'codec':<8} {'bytes/seg':>10} {'ratio':>6} {'encode ms':>10} {'e2e ms':>8}")
+    baseline = None
+    for codec in UPLOAD_CODECS:
+        sizes, encode_ms, e2e_ms = [], [], []
+        for start, end in windows:
+            segment = SegmentAudio(processor.slice_segment(pcm, start, end), processor.SAMPLE_RATE)
+            t0 = time.perf_counter()
+            encoded = segment.encode(codec)
+            t1 = time.perf_counter()
+            sizes.append(len(encoded.data))
+            encode_ms.append((t1 - t0) * 1000)
+            if recognizer:
+                recognizer.upload_codec = codec
+                recognizer.recognize(segment, start, end - start)
+                e2e_ms.append((time.perf_counter() - t0) * 1000)
+            else:
+                e2e_ms.append(encode_ms[-1] + len(encoded.data) * 8 / (uplink_mbps * 1e6) * 1000)
+        size = float(np.mean(sizes))
+        baseline = baseline or size
+        click.echo(f"{codec:<8} {size:>10.0f} {baseline / size:>5.1f}x {np.mean(encode_ms):>10.1f} {np.mean(e2e_ms):>8.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Shared helpers for benchmarks"""
+
+import time
+import numpy as np
+from contextlib import contextmanager
+
+
+def synth_track(seconds: float, sr: int = 22050, seed: int = 0) -> np.ndarray:
+    """
+    Synthetic techno-ish track: kick on every beat plus a random chord
+    progression and hats, so it has stable spectral peaks and onsets
+    """
+    rng = np.random.default_rng(seed)
+    n = int(seconds * sr)
+    t = np.arange(n) / sr
+    bpm = rng.uniform(118, 132)
+    beat = 60.0 / bpm
+    y = np.zeros(n, dtype=np.float32)
+    
+    # Kick: decaying low sine on each beat
+    kick_len = int(0.25 * sr)
+    kt = np.arange(kick_len) / sr
+    kick = np.sin(2 * np.pi * (50 + 60 * np.exp(-kt * 30)) * kt) * np.exp(-kt * 12)
+    for start in np.arange(0, seconds, beat):
+        i = int(start * sr)
+        seg = kick[:max(0, min(kick_len, n - i))]
+        y[i:i + len(seg)] += seg
+    
+    # Chords change every 4 bars
+    bar = beat * 4
+    for k, start in enumerate(np.arange(0, seconds, bar * 4)):
+        i0, i1 = int(start * sr), min(n, int((start + bar * 4) * sr))
+        freqs = 110 * 2 ** (rng.integers(0, 24, size=3) / 12)
+        for f in freqs:
+            y[i0:i1] += 0.15 * np.sin(2 * np.pi * f * t[i0:i1])
+    
+    # Hats on off-beats
+    hat_len = int(0.03 * sr)
+    for start in np.arange(beat / 2, seconds, beat):
+        i = int(start * sr)
+        seg = rng.standard_normal(max(0, min(hat_len, n - i))) * 0.05
+        y[i:i + len(seg)] += seg
+    
+    return (y / max(1e-9, np.abs(y).max()) * 0.8).astype(np.float32)
+
+
+def synth_mix(seconds: float, sr: int = 22050, track_length: float = 300.0, seed: int = 0) -> np.ndarray:
+    """Concatenate synthetic tracks with short crossfades, as int16 PCM"""
+    parts = []
+    remaining = seconds
+    k = 0
+    while remaining > 0:
+        length = min(track_length, remaining)
+        parts.append(synth_track(length, sr, seed=seed + k))
+        remaining -= length
+        k += 1
+    y = np.concatenate(parts)
+    return (y * 32767).astype(np.int16)
+
+
+@contextmanager
+def timed(label: str, results: dict):
+    """Record wall time (s) and process CPU time (s) of a block under label"""
+    wall, cpu = time.perf_counter(), time.process_time()
+    yield
+    results[label] = (time.perf_counter() - wall, time.process_time() - cpu)
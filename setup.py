@@ -10,6 +10,7 @@ setup(
         "click>=8.1.0",
         "librosa>=0.10.0",
         "soundfile>=0.12.0",
+        "soxr>=0.3.0",
         "requests>=2.31.0",
         "python-dotenv>=1.0.0",
         "tqdm>=4.66.0",
@@ -17,9 +18,15 @@ setup(
         "numpy>=1.24.0",
         "scipy>=1.11.0",
     ],
+    extras_require={
+        # Native async HTTP for the asyncio pipeline (falls back to threads without it)
+        "async": ["aiohttp>=3.9.0"],
+        "test": ["pytest>=7.0"],
+    },
     entry_points={
         "console_scripts": [
             "edm-recognize=src.cli:main",
+            "edm-index=src.cli:build_index",
         ],
     },
     python_requires=">=3.11",
@@ -1,10 +1,10 @@
 """AI-powered API orchestrator for intelligent track recognition"""
 
 import json
-import requests
 from typing import List, Optional, Dict, Any
 from ..recognizers.base import RecognitionResult
 from ..utils.config import Config
+from ..utils import http_client
 
 
 class AIOrchestrator:
@@ -13,6 +13,7 @@ class AIOrchestrator:
     # Free LLM API options
     HUGGINGFACE_API_URL = "https://api-inference.huggingface.co/models/mistralai/Mistral-7B-Instruct-v0.2"
     TOGETHER_API_URL = "https://api.together.xyz/v1/chat/completions"
+    SERVICE_NAMES = {'together': 'Together AI', 'huggingface': 'Hugging Face', 'openai': 'OpenAI'}
     
     def __init__(self):
         self.huggingface_key = getattr(Config, 'HUGGINGFACE_API_KEY', None)
@@ -49,8 +50,28 @@ class AIOrchestrator:
             print(f"[AI] Validation failed: {e}, using fallback")
             return sorted(results, key=lambda r: r.confidence, reverse=True)
     
+    async def validate_and_rank_results_async(self, results: List[RecognitionResult], audio_context: Optional[Dict] = None) -> List[RecognitionResult]:
+        """Async validate_and_rank_results() for the asyncio pipeline"""
+        if not self.is_available() or not results:
+            return sorted(results, key=lambda r: r.confidence, reverse=True)
+        
+        if len(results) == 1:
+            return results
+        
+        try:
+            response = await self._ask_async(self._validation_prompt(results, audio_context))
+            ranked = self._rank_from_response(results, response)
+            return ranked if ranked else sorted(results, key=lambda r: r.confidence, reverse=True)
+        except Exception as e:
+            print(f"[AI] Validation failed: {e}, using fallback")
+            return sorted(results, key=lambda r: r.confidence, reverse=True)
+    
     def _ai_validate_results(self, results: List[RecognitionResult], audio_context: Optional[Dict]) -> Optional[List[RecognitionResult]]:
         """Use AI to validate results"""
+        response = self._ask(self._validation_prompt(results, audio_context))
+        return self._rank_from_response(results, response)
+    
+    def _validation_prompt(self, results: List[RecognitionResult], audio_context: Optional[Dict]) -> str:
         # Prepare results for AI analysis
         results_data = []
         for r in results:
@@ -75,22 +96,10 @@ Task:
 4. Return a JSON array with ranked results, each with: artist, title, confidence_score (0-1), is_valid (true/false), reason
 
 Return ONLY valid JSON, no other text."""
-
-        # Try different AI services
-        response = None
-        
-        # Try Together AI first (good free tier)
-        if self.together_key:
-            response = self._call_together_ai(prompt)
-        
-        # Try Hugging Face
-        if not response and self.huggingface_key:
-            response = self._call_huggingface(prompt)
-        
-        # Try OpenAI
-        if not response and self.openai_key:
-            response = self._call_openai(prompt)
-        
+        return prompt
+    
+    def _rank_from_response(self, results: List[RecognitionResult], response: Optional[str]) -> Optional[List[RecognitionResult]]:
+        """Reorder results as ranked by the AI answer"""
         if not response:
             return None
         
@@ -111,62 +120,106 @@ Return ONLY valid JSON, no other text."""
         
         return None
     
-    def _call_together_ai(self, prompt: str) -> Optional[str]:
-        """Call Together AI API (fast, optimized)"""
+    def _services(self) -> List[str]:
+        """Configured AI services, in preference order"""
+        services = []
+        # Together AI first (good free tier), then Hugging Face, then OpenAI
+        if self.together_key:
+            services.append('together')
+        if self.huggingface_key:
+            services.append('huggingface')
+        if self.openai_key:
+            services.append('openai')
+        return services
+    
+    def _ask(self, prompt: str, fallback: bool = True) -> Optional[str]:
+        """Ask the first configured service; with fallback, try the next ones until one answers"""
+        for service in self._services():
+            response = self._call(service, prompt)
+            if response or not fallback:
+                return response
+        return None
+    
+    async def _ask_async(self, prompt: str, fallback: bool = True) -> Optional[str]:
+        """Async _ask()"""
+        for service in self._services():
+            response = await self._call_async(service, prompt)
+            if response or not fallback:
+                return response
+        return None
+    
+    def _call(self, service: str, prompt: str) -> Optional[str]:
+        """Call one AI service; None on any error"""
         try:
-            headers = {
-                'Authorization': f'Bearer {self.together_key}',
-                'Content-Type': 'application/json'
-            }
-            data = {
-                'model': 'mistralai/Mixtral-8x7B-Instruct-v0.1',
-                'messages': [{'role': 'user', 'content': prompt}],
-                'temperature': 0.2,  # Lower = faster, more deterministic
-                'max_tokens': 300,  # Reduced for speed
-                'stop': ['\n\n']  # Stop early if possible
-            }
-            response = requests.post(self.TOGETHER_API_URL, json=data, headers=headers, timeout=5)  # Shorter timeout
-            if response.status_code == 200:
-                result = response.json()
-                return result.get('choices', [{}])[0].get('message', {}).get('content')
+            response = http_client.post(**self._request(service, prompt))
+            return self._content(service, response)
         except Exception as e:
-            print(f"[AI] Together AI error: {e}")
+            print(f"[AI] {self.SERVICE_NAMES[service]} error: {e}")
         return None
     
-    def _call_huggingface(self, prompt: str) -> Optional[str]:
-        """Call Hugging Face Inference API (fast)"""
+    async def _call_async(self, service: str, prompt: str) -> Optional[str]:
+        """Async _call()"""
         try:
-            headers = {'Authorization': f'Bearer {self.huggingface_key}'}
-            data = {'inputs': prompt, 'parameters': {'max_new_tokens': 200, 'temperature': 0.2}}
-            response = requests.post(self.HUGGINGFACE_API_URL, json=data, headers=headers, timeout=8)  # Shorter timeout
-            if response.status_code == 200:
-                result = response.json()
-                if isinstance(result, list) and len(result) > 0:
-                    return result[0].get('generated_text', '')
+            response = await http_client.post_async(**self._request(service, prompt))
+            return self._content(service, response)
         except Exception as e:
-            print(f"[AI] Hugging Face error: {e}")
+            print(f"[AI] {self.SERVICE_NAMES[service]} error: {e}")
         return None
     
-    def _call_openai(self, prompt: str) -> Optional[str]:
-        """Call OpenAI API (fast, optimized)"""
-        try:
-            headers = {
+    def _request(self, service: str, prompt: str) -> Dict[str, Any]:
+        """http_client.post() arguments for a service"""
+        if service == 'together':
+            # Together AI (fast, optimized)
+            return {
+                'url': self.TOGETHER_API_URL,
+                'headers': {
+                    'Authorization': f'Bearer {self.together_key}',
+                    'Content-Type': 'application/json'
+                },
+                'json': {
+                    'model': 'mistralai/Mixtral-8x7B-Instruct-v0.1',
+                    'messages': [{'role': 'user', 'content': prompt}],
+                    'temperature': 0.2,  # Lower = faster, more deterministic
+                    'max_tokens': 300,  # Reduced for speed
+                    'stop': ['\n\n']  # Stop early if possible
+                },
+                'timeout': 5  # Shorter timeout
+            }
+        if service == 'huggingface':
+            # Hugging Face Inference API (fast)
+            return {
+                'url': self.HUGGINGFACE_API_URL,
+                'headers': {'Authorization': f'Bearer {self.huggingface_key}'},
+                'json': {'inputs': prompt, 'parameters': {'max_new_tokens': 200, 'temperature': 0.2}},
+                'timeout': 8  # Shorter timeout
+            }
+        # OpenAI (fast, optimized)
+        return {
+            'url': 'https://api.openai.com/v1/chat/completions',
+            'headers': {
                 'Authorization': f'Bearer {self.openai_key}',
                 'Content-Type': 'application/json'
-            }
-            data = {
+            },
+            'json': {
                 'model': 'gpt-3.5-turbo',
                 'messages': [{'role': 'user', 'content': prompt}],
                 'temperature': 0.2,  # Lower = faster
                 'max_tokens': 300  # Reduced for speed
-            }
-            response = requests.post('https://api.openai.com/v1/chat/completions', json=data, headers=headers, timeout=5)
-            if response.status_code == 200:
-                result = response.json()
-                return result.get('choices', [{}])[0].get('message', {}).get('content')
-        except Exception as e:
-            print(f"[AI] OpenAI error: {e}")
-        return None
+            },
+            'timeout': 5
+        }
+    
+    @staticmethod
+    def _content(service: str, response) -> Optional[str]:
+        """Generated text from a service response"""
+        if response.status_code != 200:
+            return None
+        result = response.json()
+        if service == 'huggingface':
+            if isinstance(result, list) and len(result) > 0:
+                return result[0].get('generated_text', '')
+            return None
+        return result.get('choices', [{}])[0].get('message', {}).get('content')
     
     def smart_deduplicate(self, tracks: List[Dict]) -> List[Dict]:
         """
@@ -186,8 +239,26 @@ Return ONLY valid JSON, no other text."""
             from ..utils.track_utils import deduplicate_tracks
             return deduplicate_tracks(tracks)
     
+    async def smart_deduplicate_async(self, tracks: List[Dict]) -> List[Dict]:
+        """Async smart_deduplicate()"""
+        from ..utils.track_utils import deduplicate_tracks
+        if not self.is_available() or len(tracks) <= 1:
+            return deduplicate_tracks(tracks)
+        
+        try:
+            # Only the first configured service is asked, as in the sync path
+            response = await self._ask_async(self._dedup_prompt(tracks), fallback=False)
+            return self._unique_from_response(tracks, response)
+        except Exception as e:
+            print(f"[AI] Smart deduplication failed: {e}, using fallback")
+            return deduplicate_tracks(tracks)
+    
     def _ai_deduplicate(self, tracks: List[Dict]) -> List[Dict]:
         """Use AI to deduplicate tracks intelligently"""
+        response = self._ask(self._dedup_prompt(tracks), fallback=False)
+        return self._unique_from_response(tracks, response)
+    
+    def _dedup_prompt(self, tracks: List[Dict]) -> str:
         prompt = f"""Analyze these music tracks and identify which are duplicates or variations of the same track (remixes, edits, extended versions, etc.).
 
 Tracks:
@@ -196,16 +267,10 @@ Tracks:
 Return a JSON array with only unique tracks. Group variations together and keep the best/most complete version.
 
 Return ONLY valid JSON array, no other text."""
-
-        # Try AI services
-        response = None
-        if self.together_key:
-            response = self._call_together_ai(prompt)
-        elif self.huggingface_key:
-            response = self._call_huggingface(prompt)
-        elif self.openai_key:
-            response = self._call_openai(prompt)
-        
+        return prompt
+    
+    def _unique_from_response(self, tracks: List[Dict], response: Optional[str]) -> List[Dict]:
+        """Unique tracks from the AI answer (simple deduplication if unusable)"""
         if response:
             try:
                 unique = json.loads(response)
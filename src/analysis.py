@@ -0,0 +1,315 @@
+"""Whole-mix audio analysis used to plan where segments go"""
+
+from typing import Dict, List, Tuple
+
+import librosa
+import numpy as np
+from scipy.ndimage import maximum_filter1d, uniform_filter1d
+
+
+N_FFT = 2048
+HOP = 512
+
+
+def _power_blocks(pcm: np.ndarray, sample_rate: int, block_seconds: float = 60.0, hop: int = HOP):
+    """
+    Yield (first frame index, power spectrogram) for consecutive blocks of the mix
+
+    Frames are on one global grid (frame j starts at sample j * hop), so
+    blocks can be stitched without gaps; memory is bounded by the block size.
+    """
+    block = int(block_seconds * sample_rate) // hop * hop
+    for block_start in range(0, len(pcm), block):
+        y = pcm[block_start:block_start + block + N_FFT]
+        if len(y) < N_FFT:
+            break
+        y = y.astype(np.float32) / 32768.0 if y.dtype == np.int16 else y.astype(np.float32)
+        power = np.abs(librosa.stft(y, n_fft=N_FFT, hop_length=hop, center=False)) ** 2
+        # Frames that start in the next block belong to the next one
+        yield block_start // hop, power[:, :block // hop]
+
+
+def frame_times(frames: np.ndarray, sample_rate: int) -> np.ndarray:
+    """Centre time in seconds of global STFT frames"""
+    return (np.asarray(frames) * HOP + N_FFT / 2) / sample_rate
+
+
+def frame_features(pcm: np.ndarray, sample_rate: int, frame_seconds: float = 1.0,
+                   block_seconds: float = 60.0) -> np.ndarray:
+    """
+    Timbre and harmony features pooled to one row per frame_seconds
+
+    Log-mel bands describe the sound (kick, bass, pads) and chroma the key,
+    which is what changes between two tracks in a mix. The STFT runs block by
+    block so memory stays flat however long the mix is.
+
+    Args:
+        pcm: Mono samples (int16 or float)
+        sample_rate: Sample rate of pcm
+        frame_seconds: Output resolution in seconds
+        block_seconds: Audio analysed per STFT call
+
+    Returns:
+        Array of shape (frames, 52): 40 log-mel bands + 12 chroma bins
+    """
+    n_frames = max(1, int(np.ceil(len(pcm) / sample_rate / frame_seconds)))
+    sums = np.zeros((n_frames, 52), dtype=np.float64)
+    counts = np.zeros(n_frames, dtype=np.int64)
+    mel_basis = librosa.filters.mel(sr=sample_rate, n_fft=N_FFT, n_mels=40)
+    chroma_basis = librosa.filters.chroma(sr=sample_rate, n_fft=N_FFT)
+
+    for first, power in _power_blocks(pcm, sample_rate, block_seconds):
+        mel = np.log1p(mel_basis @ power)
+        chroma = chroma_basis @ power
+        chroma /= chroma.sum(axis=0, keepdims=True) + 1e-9
+        features = np.vstack([mel, chroma]).T
+
+        centres = frame_times(first + np.arange(power.shape[1]), sample_rate)
+        index = np.minimum((centres / frame_seconds).astype(np.int64), n_frames - 1)
+        np.add.at(sums, index, features)
+        counts += np.bincount(index, minlength=n_frames)
+
+    features = sums / np.maximum(counts, 1)[:, None]
+    # Standardize so every band contributes on the same scale
+    return (features - features.mean(axis=0)) / (features.std(axis=0) + 1e-9)
+
+
+def window_stats(pcm: np.ndarray, sample_rate: int, windows: List[Tuple[float, float]],
+                 hop: int = N_FFT) -> Dict[str, np.ndarray]:
+    """
+    Loudness, spectral flatness and onset rate of each (start, end) window
+
+    One pass of non-overlapping STFT frames over the whole mix (4x cheaper
+    than the analysis grid; a ~90 ms frame still resolves every beat), then
+    every window is averaged at once with cumulative sums.
+
+    Returns:
+        Dict of arrays, one value per window:
+            rms_db: Loudness in dB relative to full scale
+            flatness: Geometric mean spectral flatness of the non-silent frames
+                (0 = tonal, 1 = white noise; a few seconds of music pull it well down)
+            onset_rate: Onsets per second
+    """
+    window_power = np.sum(np.hanning(N_FFT) ** 2)
+    energy, flatness, flux = [], [], []
+    previous = None
+    for _, power in _power_blocks(pcm, sample_rate, hop=hop):
+        # Parseval: mean square of the windowed frame from its one-sided spectrum
+        energy.append(2 * power.sum(axis=0) / (N_FFT * window_power))
+        log_power = np.log(power + 1e-10)
+        flatness.append(np.exp(log_power.mean(axis=0)) / (power.mean(axis=0) + 1e-10))
+        if previous is not None:
+            log_power = np.hstack([previous, log_power])
+        diff = np.maximum(0.0, np.diff(log_power, axis=1)).mean(axis=0)
+        flux.append(diff if previous is not None else np.concatenate([[0.0], diff]))
+        previous = log_power[:, -1:]
+
+    n_windows = len(windows)
+    if not energy:
+        return {'rms_db': np.full(n_windows, -120.0), 'flatness': np.zeros(n_windows), 'onset_rate': np.zeros(n_windows)}
+    energy, flatness, flux = np.concatenate(energy), np.concatenate(flatness), np.concatenate(flux)
+
+    # Onset = a local flux peak well above the mix's typical flux
+    threshold = np.median(flux) + 2 * 1.4826 * np.median(np.abs(flux - np.median(flux)))
+    peaks = (flux > threshold) & (flux >= np.roll(flux, 1)) & (flux > np.roll(flux, -1))
+    loud = energy > 1e-8  # -80 dBFS: flux of silence is all rounding noise
+
+    bounds = np.array(windows, dtype=np.float64).reshape(-1, 2)
+    # Frames lying wholly inside each window (at least one)
+    starts = np.clip(np.ceil(bounds[:, 0] * sample_rate / hop).astype(np.int64), 0, len(energy) - 1)
+    ends = np.clip(((bounds[:, 1] * sample_rate - N_FFT) // hop).astype(np.int64) + 1, 0, len(energy))
+    ends = np.maximum(ends, starts + 1)
+    counts = np.maximum(ends - starts, 1)
+
+    def window_sum(x):
+        c = np.concatenate(([0.0], np.cumsum(x, dtype=np.float64)))
+        return c[ends] - c[starts]
+
+    loud_counts = window_sum(loud)
+    log_flatness = np.where(loud, np.log(flatness + 1e-10), 0.0)
+    return {
+        'rms_db': 10 * np.log10(window_sum(energy) / counts + 1e-12),
+        'flatness': np.where(loud_counts > 0, np.exp(window_sum(log_flatness) / np.maximum(loud_counts, 1)), 1.0),
+        'onset_rate': window_sum(peaks & loud) / (counts * hop / sample_rate),
+    }
+
+
+def onset_envelope(pcm: np.ndarray, sample_rate: int, block_seconds: float = 60.0) -> np.ndarray:
+    """
+    Spectral flux onset strength on the global frame grid (librosa's definition, computed blockwise)
+
+    Returns:
+        One value per STFT frame (see frame_times)
+    """
+    mel_basis = librosa.filters.mel(sr=sample_rate, n_fft=N_FFT, n_mels=128)
+    parts = []
+    previous = None
+    for _, power in _power_blocks(pcm, sample_rate, block_seconds):
+        mel_db = librosa.power_to_db(mel_basis @ power, ref=1.0, top_db=None)
+        if previous is not None:
+            mel_db = np.hstack([previous, mel_db])
+        flux = np.maximum(0.0, np.diff(mel_db, axis=1)).mean(axis=0)
+        parts.append(flux if previous is not None else np.concatenate([[0.0], flux]))
+        previous = mel_db[:, -1:]
+    if not parts:
+        return np.zeros(1)
+    return np.concatenate(parts)
+
+
+def _block_tempo(envelope: np.ndarray, sample_rate: int, previous: float,
+                 tempo_min: float, tempo_max: float) -> float:
+    """
+    Tempo of a stretch of onset envelope, from its autocorrelation
+
+    One autocorrelation of the whole stretch (rather than a tempogram per
+    frame) weighted towards the previous tempo, refined between lags by a
+    parabola so the result isn't quantized to whole frames.
+    """
+    lag_min = max(1, int(60.0 * sample_rate / (HOP * tempo_max)))
+    lag_max = int(np.ceil(60.0 * sample_rate / (HOP * tempo_min))) + 1
+    ac = librosa.autocorrelate(envelope - envelope.mean(), max_size=lag_max + 2)
+    lags = np.arange(lag_min, lag_max + 1)
+    bpms = 60.0 * sample_rate / (HOP * lags)
+    prior = np.exp(-0.5 * (np.log2(bpms / previous) / 0.2) ** 2)
+    lag = int(lags[np.argmax(ac[lags] * (0.5 + prior))])
+    a, b, c = ac[lag - 1], ac[lag], ac[lag + 1]
+    offset = 0.5 * (a - c) / (a - 2 * b + c) if a - 2 * b + c < 0 else 0.0
+    return float(60.0 * sample_rate / (HOP * (lag + offset)))
+
+
+def track_beats(envelope: np.ndarray, sample_rate: int, block_seconds: float = 60.0,
+                tempo_min: float = 100.0, tempo_max: float = 170.0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Beat times for a whole mix, following tempo changes between and within tracks
+
+    The mix is tracked block by block, each block at its own tempo (seeded
+    with the previous block's tempo so it doesn't jump between octaves).
+    Blocks overlap by a few seconds and only each block's own span is kept,
+    so beats stay continuous across the seams while the tempo drifts.
+
+    Args:
+        envelope: onset_envelope() of the mix
+        sample_rate: Sample rate of the mix
+        block_seconds: Span of audio tracked at one tempo
+        tempo_min: Lower bound of the expected tempo (estimates are folded by octaves into range)
+        tempo_max: Upper bound of the expected tempo
+
+    Returns:
+        (beat times in seconds, tempo in BPM of the block each beat is in)
+    """
+    block = max(1, int(block_seconds * sample_rate / HOP))
+    margin = int(8.0 * sample_rate / HOP)
+    if len(envelope) < margin:
+        return np.zeros(0), np.zeros(0)
+    beats, tempos = [], []
+    tempo = (tempo_min + tempo_max) / 2
+    for start in range(0, len(envelope), block):
+        low, high = max(0, start - margin), min(len(envelope), start + block + margin)
+        # A short last block keeps the previous tempo
+        if high - low >= 4 * margin or not beats:
+            tempo = _block_tempo(envelope[low:high], sample_rate, tempo, tempo_min, tempo_max)
+        _, found = librosa.beat.beat_track(onset_envelope=envelope[low:high], sr=sample_rate, hop_length=HOP,
+                                           bpm=tempo, trim=False, units='frames')
+        found = found + low
+        found = found[(found >= start) & (found < start + block)]
+        beats.append(found)
+        tempos.append(np.full(len(found), tempo))
+
+    if not beats:
+        return np.zeros(0), np.zeros(0)
+    frames, tempos = np.concatenate(beats), np.concatenate(tempos)
+    # Two blocks may each place a beat right at their seam
+    period = 60.0 / tempo_max * sample_rate / HOP
+    keep = np.concatenate([[True], np.diff(frames) > period / 2])
+    return frame_times(frames[keep], sample_rate), tempos[keep]
+
+
+def phrase_boundaries(beat_times: np.ndarray, features: np.ndarray, frame_seconds: float,
+                      beats_per_phrase: int, search: int = 2) -> List[float]:
+    """
+    Phrase starts: every beats_per_phrase beats, re-anchored at the strongest change
+
+    Each beat gets a change score: how much the features of the next bar
+    differ from the previous bar. The first boundary is the strongest
+    change in the first phrase; each next one is the strongest change
+    within +/- `search` beats of one phrase later, which keeps the grid
+    locked to the music through tempo drift and the odd missed beat.
+
+    Args:
+        beat_times: Beat times in seconds
+        features: frame_features() rows at frame_seconds resolution
+        frame_seconds: Resolution of features
+        beats_per_phrase: e.g. 64 for 16 bars of 4/4
+        search: Beats of slack around each expected boundary
+
+    Returns:
+        Phrase start times in seconds
+    """
+    n = len(beat_times)
+    if n < beats_per_phrase + 8:
+        return []
+    c = np.vstack([np.zeros((1, features.shape[1])), np.cumsum(features, axis=0)])
+    rows = np.clip(np.round(beat_times / frame_seconds).astype(np.int64), 0, len(features))
+    bar = 4
+    index = np.arange(bar, n - bar)
+    before_start, here, after_end = rows[index - bar], rows[index], rows[index + bar]
+    before = (c[here] - c[before_start]) / np.maximum(here - before_start, 1)[:, None]
+    after = (c[after_end] - c[here]) / np.maximum(after_end - here, 1)[:, None]
+    strength = np.zeros(n)
+    strength[index] = np.linalg.norm(after - before, axis=1)
+
+    boundary = int(np.argmax(strength[:beats_per_phrase]))
+    boundaries = [boundary]
+    while boundary + beats_per_phrase + search < n:
+        expected = boundary + beats_per_phrase
+        low = expected - search
+        boundary = low + int(np.argmax(strength[low:expected + search + 1]))
+        boundaries.append(boundary)
+    return [float(beat_times[b]) for b in boundaries]
+
+
+def novelty_curve(features: np.ndarray, context: int = 30) -> np.ndarray:
+    """
+    How different the `context` frames after each frame are from the ones before
+
+    Distance between the mean feature vector of [t - context, t) and
+    [t, t + context), computed for every t at once with cumulative sums.
+    Changes inside a track (a breakdown, a new chord) move only part of the
+    window; a track change moves all of it. Frames closer than `context` to
+    either end have no full window and score 0.
+    """
+    n = len(features)
+    novelty = np.zeros(n)
+    if n <= 2 * context:
+        return novelty
+    c = np.vstack([np.zeros((1, features.shape[1])), np.cumsum(features, axis=0)])
+    t = np.arange(context, n - context + 1)
+    before = (c[t] - c[t - context]) / context
+    after = (c[t + context] - c[t]) / context
+    novelty[context:n - context + 1] = np.linalg.norm(after - before, axis=1) / np.sqrt(features.shape[1])
+    return uniform_filter1d(novelty, size=5)
+
+
+def pick_transitions(novelty: np.ndarray, min_gap: int, threshold: float = 2.0,
+                     ambiguous: float = 1.0) -> Tuple[List[int], List[int]]:
+    """
+    Peaks of the novelty curve, split into confident and ambiguous ones
+
+    A peak must be the maximum within +/- min_gap frames. Its height is
+    measured in robust standard deviations (median/MAD) above the median
+    novelty of the mix, so the thresholds adapt to how busy the mix is.
+
+    Returns:
+        (confident frame indices, ambiguous frame indices), both sorted
+    """
+    valid = novelty[novelty > 0]
+    if len(valid) == 0:
+        return [], []
+    median = np.median(valid)
+    sigma = 1.4826 * np.median(np.abs(valid - median)) + 1e-9
+    score = (novelty - median) / sigma
+
+    peaks = np.flatnonzero((novelty == maximum_filter1d(novelty, size=2 * min_gap + 1)) & (novelty > 0))
+    confident = [int(p) for p in peaks if score[p] >= threshold]
+    unsure = [int(p) for p in peaks if ambiguous <= score[p] < threshold]
+    return confident, unsure
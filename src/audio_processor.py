@@ -1,28 +1,220 @@
 """Audio processing and segmentation"""
 
+import io
 import os
+import hashlib
 import tempfile
+import threading
 import librosa
+import numpy as np
 import soundfile as sf
-from typing import List, Tuple, Optional
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
 from pathlib import Path
+from .utils.config import Config
+from .utils.pcm_cache import PCMCache
+from .decoders import Decoder, DecoderMissing, default_decoders
+from .recognizers.base import EncodedAudio
+
+
+@dataclass(frozen=True)
+class UploadCodec:
+    """How a segment is encoded before upload"""
+    format: str
+    subtype: str
+    sample_rate: int
+    extension: str
+    content_type: str
+    compression_level: Optional[float] = None  # libsndfile 0.0-1.0, higher = smaller
+
+
+# Upload encodings recognizers can choose from. Fingerprint services only
+# look at a narrow band, so low-rate PCM or compressed mono is plenty.
+UPLOAD_CODECS = {
+    'wav': UploadCodec('WAV', 'PCM_16', 22050, 'wav', 'audio/wav'),
+    'wav16k': UploadCodec('WAV', 'PCM_16', 16000, 'wav', 'audio/wav'),
+    'wav8k': UploadCodec('WAV', 'PCM_16', 8000, 'wav', 'audio/wav'),
+    'mp3': UploadCodec('MP3', 'MPEG_LAYER_III', 22050, 'mp3', 'audio/mpeg', compression_level=0.8),
+    'opus': UploadCodec('OGG', 'OPUS', 16000, 'ogg', 'audio/ogg', compression_level=0.9),
+    'vorbis': UploadCodec('OGG', 'VORBIS', 22050, 'ogg', 'audio/ogg', compression_level=0.6),
+}
+DEFAULT_UPLOAD_CODEC = 'wav'
+
+
+class SegmentAudio:
+    """
+    One segment held in memory
+    
+    The samples are usually a view into the decoded mix. Each upload codec is
+    encoded at most once and the bytes are reused by every recognizer that
+    asks for it.
+    """
+    
+    def __init__(self, samples: np.ndarray, sample_rate: int, offset: float = 0.0):
+        self.samples = samples
+        self.sample_rate = sample_rate
+        self.offset = offset  # Seconds into the segment window where these samples start
+        self._encoded: Dict[str, EncodedAudio] = {}
+        self._digest: Optional[str] = None
+        self._peaks = None
+        self._fingerprint = None
+        # Providers may run concurrently on the same segment (fan-out mode)
+        self._lock = threading.Lock()
+    
+    @property
+    def duration(self) -> float:
+        return len(self.samples) / self.sample_rate
+    
+    @property
+    def digest(self) -> str:
+        """Content hash of the samples (result cache key)"""
+        if self._digest is None:
+            h = hashlib.sha1(np.ascontiguousarray(self.samples).tobytes())
+            h.update(str(self.sample_rate).encode())
+            self._digest = h.hexdigest()
+        return self._digest
+    
+    def peaks(self):
+        """Spectral peaks of the samples (see fingerprint.spectral_peaks), computed once"""
+        from .fingerprint import spectral_peaks
+        with self._lock:
+            if self._peaks is None:
+                self._peaks = spectral_peaks(self.samples, self.sample_rate)
+            return self._peaks
+    
+    def fingerprint(self):
+        """Peak-pair fingerprint of the samples (see fingerprint.fingerprint), computed once"""
+        from .fingerprint import peak_pair_hashes
+        peaks = self.peaks()
+        with self._lock:
+            if self._fingerprint is None:
+                self._fingerprint = peak_pair_hashes(*peaks)
+            return self._fingerprint
+    
+    def encode(self, codec: Optional[str] = None) -> EncodedAudio:
+        """
+        Encoded bytes of the segment for upload (cached per codec)
+        
+        Args:
+            codec: Key of UPLOAD_CODECS (defaults to 16-bit WAV at the source rate)
+        """
+        codec = codec or DEFAULT_UPLOAD_CODEC
+        with self._lock:
+            if codec not in self._encoded:
+                self._encoded[codec] = self._encode(codec)
+            return self._encoded[codec]
+    
+    def _encode(self, codec: str) -> EncodedAudio:
+        spec = UPLOAD_CODECS.get(codec)
+        if spec is None:
+            raise ValueError(f"Unknown upload codec: {codec}. Choose from {', '.join(UPLOAD_CODECS)}")
+        if spec.format not in sf.available_formats():
+            print(f"[AudioProcessor] libsndfile has no {spec.format} support, uploading WAV instead")
+            return self._encode(DEFAULT_UPLOAD_CODEC)
+        
+        samples = self.samples
+        if spec.sample_rate != self.sample_rate:
+            samples = librosa.resample(
+                samples.astype(np.float32) / 32768.0,
+                orig_sr=self.sample_rate,
+                target_sr=spec.sample_rate,
+                res_type='soxr_hq'
+            )
+        
+        kwargs = {}
+        if spec.compression_level is not None:
+            kwargs['compression_level'] = spec.compression_level
+        buf = io.BytesIO()
+        sf.write(buf, samples, spec.sample_rate, format=spec.format, subtype=spec.subtype, **kwargs)
+        return EncodedAudio(buf.getvalue(), f"segment.{spec.extension}", spec.content_type)
+
+
+class PCMRing:
+    """
+    Fixed-size ring buffer over a PCM stream
+    
+    Samples are addressed by their index in the whole stream. Writing past
+    the capacity overwrites the oldest samples, so memory stays the same
+    however long the stream runs.
+    """
+    
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.end = 0  # Stream index one past the newest sample
+        self._ring = np.zeros(capacity, dtype=np.int16)
+    
+    @property
+    def start(self) -> int:
+        """Stream index of the oldest sample still held"""
+        return max(0, self.end - self.capacity)
+    
+    def write(self, samples: np.ndarray):
+        """Append samples (at most capacity at once)"""
+        n = len(samples)
+        if n > self.capacity:
+            raise ValueError(f"Cannot write {n} samples to a ring of {self.capacity}")
+        i = self.end % self.capacity
+        first = min(n, self.capacity - i)
+        self._ring[i:i + first] = samples[:first]
+        self._ring[:n - first] = samples[first:]
+        self.end += n
+    
+    def read(self, start: int, end: int) -> np.ndarray:
+        """Copy of stream samples [start, end), which must still be held"""
+        if start < self.start or end > self.end:
+            raise IndexError(f"Samples {start}-{end} not in ring ({self.start}-{self.end})")
+        n = max(0, end - start)
+        i = start % self.capacity
+        first = min(n, self.capacity - i)
+        out = np.empty(n, dtype=np.int16)
+        out[:first] = self._ring[i:i + first]
+        out[first:] = self._ring[:n - first]
+        return out
 
 
 class AudioProcessor:
     """Handle audio file loading, segmentation, and processing"""
     
     SUPPORTED_FORMATS = {'.mp3', '.wav', '.flac', '.m4a', '.ogg', '.aac'}
+    SAMPLE_RATE = 22050
+    # Streaming: decoded audio is written to the ring buffer this many seconds at a time
+    STREAM_CHUNK_SECONDS = 1.0
+    # grid: fixed segment_length/segment_overlap windows
+    # novelty: windows follow track changes detected in the decoded mix
+    # phrase: one window per beat-tracked phrase, probed in its middle
+    SEGMENT_MODES = ('grid', 'novelty', 'phrase')
+    # Shortest partial phrase (mix intro/outro) given its own window
+    MIN_PHRASE_SECONDS = 10.0
     
-    def __init__(self, segment_length: int = 45, segment_overlap: int = 15):
+    def __init__(self, segment_length: int = 45, segment_overlap: int = 15, single_decode: bool = True,
+                 pcm_cache: Optional[PCMCache] = None, probe_length: Optional[float] = None,
+                 segment_mode: str = 'grid', decoders: Optional[Sequence[Decoder]] = None):
         """
         Initialize audio processor
         
         Args:
             segment_length: Length of each segment in seconds
             segment_overlap: Overlap between segments in seconds
+            single_decode: Decode the whole file once and slice segments from
+                the shared PCM buffer instead of running FFmpeg per segment
+            pcm_cache: Optional on-disk cache of decoded PCM reused across runs
+            probe_length: If set, send only a clip of this many seconds from the
+                most stable part of each window (the segment grid is unchanged)
+            segment_mode: 'grid', 'novelty' or 'phrase' (see SEGMENT_MODES)
+            decoders: Decoding backends, tried in order (default: in-process
+                libsndfile, then FFmpeg - see default_decoders())
         """
         self.segment_length = segment_length
         self.segment_overlap = segment_overlap
+        self.single_decode = single_decode
+        self.pcm_cache = pcm_cache
+        self.probe_length = probe_length
+        self.segment_mode = segment_mode
+        self.decoders = list(decoders) if decoders else default_decoders()
+        
+        # Decoded PCM of the most recently decoded file (single-decode mode)
+        self._pcm_path: Optional[str] = None
+        self._pcm: Optional[np.ndarray] = None
     
     def is_supported_format(self, file_path: str) -> bool:
         """Check if file format is supported"""
@@ -31,45 +223,35 @@ class AudioProcessor:
     
     def get_duration(self, file_path: str) -> float:
         """Get duration of audio file in seconds (memory efficient)"""
-        # Try FFprobe first (doesn't load file into memory)
-        import subprocess
-        try:
-            cmd = [
-                'ffprobe',
-                '-v', 'error',
-                '-show_entries', 'format=duration',
-                '-of', 'default=noprint_wrappers=1:nokey=1',
-                file_path
-            ]
-            result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=10)
-            if result.returncode == 0:
-                duration = float(result.stdout.decode().strip())
-                return duration
-            else:
-                error_msg = result.stderr.decode() if result.stderr else "FFprobe failed"
-                print(f"[AudioProcessor] FFprobe failed: {error_msg}")
-        except FileNotFoundError:
-            print("[AudioProcessor] FFprobe not found - FFmpeg not installed!")
-            raise ValueError("FFmpeg/FFprobe not installed. Please add FFmpeg buildpack in Render settings. See FFMPEG_SETUP.md")
-        except Exception as e:
-            print(f"[AudioProcessor] FFprobe error: {e}")
+        # Already decoded - no need to probe the file again
+        if self._pcm is not None and self._pcm_path == file_path:
+            return len(self._pcm) / self.SAMPLE_RATE
         
-        # Fallback to librosa (only if FFprobe fails but FFmpeg might not be installed)
-        try:
-            print("[AudioProcessor] Falling back to librosa for duration (less efficient)")
-            duration = librosa.get_duration(path=file_path)
-            return duration
-        except Exception as e:
-            raise ValueError(f"Could not read audio file: {e}")
+        # Header only (libsndfile) or FFprobe - neither decodes the file
+        return self.decoder_for(file_path).duration(file_path)
+    
+    def decoder_for(self, file_path: str) -> Decoder:
+        """First decoder that can read the file (FFmpeg handles anything the others can't)"""
+        for decoder in self.decoders:
+            if decoder.supports(file_path):
+                return decoder
+        raise ValueError(f"No decoder for {os.path.basename(file_path)}")
     
     def segment_audio(self, file_path: str) -> List[Tuple[float, float]]:
         """
-        Segment audio file into overlapping windows
+        Segment audio file into overlapping windows (or a novelty/phrase plan, see plan_segments/plan_phrases)
         
         Returns:
             List of (start_time, end_time) tuples in seconds
         """
-        duration = self.get_duration(file_path)
+        if self.segment_mode == 'novelty':
+            return self.plan_segments(file_path)
+        if self.segment_mode == 'phrase':
+            return self.plan_phrases(file_path)
+        return self._grid_segments(self.get_duration(file_path))
+    
+    def _grid_segments(self, duration: float) -> List[Tuple[float, float]]:
+        """Fixed segment_length windows every segment_length - segment_overlap seconds"""
         segments = []
         
         start = 0.0
@@ -80,98 +262,471 @@ class AudioProcessor:
         
         return segments
     
-    def extract_segment(self, file_path: str, start_time: float, duration: float, output_path: Optional[str] = None) -> str:
+    def detect_transitions(self, file_path: str) -> Tuple[List[float], List[float]]:
+        """
+        Find likely track changes from a spectral novelty curve of the whole mix
+        
+        Decodes the file (once, shared with segment loading) and analyses it
+        at one-second resolution.
+        
+        Returns:
+            (confident transition times, ambiguous transition times) in seconds
+        """
+        from .analysis import frame_features, novelty_curve, pick_transitions
+        pcm = self.decode(file_path)
+        features = frame_features(pcm, self.SAMPLE_RATE, frame_seconds=1.0)
+        novelty = novelty_curve(features, context=Config.NOVELTY_CONTEXT)
+        confident, ambiguous = pick_transitions(novelty, min_gap=Config.NOVELTY_MIN_GAP)
+        return [float(t) for t in confident], [float(t) for t in ambiguous]
+    
+    def plan_segments(self, file_path: str) -> List[Tuple[float, float]]:
+        """
+        Adaptive segment plan from detected transitions
+        
+        Each stretch between transitions is one track: short ones get a single
+        window, ones longer than two segment lengths are split in two (two
+        probes per track). Ambiguous transitions also split, so there is a
+        probe on either side of them and the answers decide. Windows span the
+        whole stretch, so track start/end times follow the transitions; only
+        a segment_length clip from the steadiest part of each is uploaded.
+        
+        Returns:
+            List of (start_time, end_time) tuples in seconds
         """
-        Extract a segment from audio file using FFmpeg (memory efficient)
+        duration = self.get_duration(file_path)
+        confident, ambiguous = self.detect_transitions(file_path)
+        print(f"[AudioProcessor] Novelty plan: {len(confident)} transitions, {len(ambiguous)} ambiguous")
+        
+        cuts = sorted(t for t in set(confident) | set(ambiguous) if 0 < t < duration)
+        bounds = [0.0] + cuts + [duration]
+        segments = []
+        for start, end in zip(bounds, bounds[1:]):
+            if end - start > 2 * self.segment_length:
+                middle = (start + end) / 2
+                segments += [(start, middle), (middle, end)]
+            else:
+                segments.append((start, end))
+        return segments
+    
+    def detect_phrases(self, file_path: str) -> Tuple[List[float], float]:
+        """
+        Find phrase boundaries (every PHRASE_BARS bars) of the whole mix
+        
+        Beats are tracked block by block so the grid follows tempo changes
+        between tracks and gradual drift within one; the phrase grid is then
+        snapped to where the sound changes most, which in EDM is the phrase
+        start (new bassline, drop, breakdown).
+        
+        Returns:
+            (phrase start times in seconds, median tempo in BPM or 0 if no beat was found)
+        """
+        from .analysis import frame_features, onset_envelope, phrase_boundaries, track_beats
+        pcm = self.decode(file_path)
+        beat_times, tempos = track_beats(onset_envelope(pcm, self.SAMPLE_RATE), self.SAMPLE_RATE)
+        if len(beat_times) == 0:
+            return [], 0.0
+        features = frame_features(pcm, self.SAMPLE_RATE, frame_seconds=0.25)
+        boundaries = phrase_boundaries(beat_times, features, 0.25, beats_per_phrase=4 * Config.PHRASE_BARS)
+        return boundaries, float(np.median(tempos))
+    
+    def plan_phrases(self, file_path: str) -> List[Tuple[float, float]]:
+        """
+        Segment plan with one window per phrase
+        
+        DJs blend on phrase boundaries, so a window that starts and ends on
+        them has the blend at its edges; the clip uploaded for it comes from
+        the middle of the phrase (see _phrase_clip_length). Falls back to the
+        grid if no beat is found (beatless intros, ambient mixes).
+        
+        Returns:
+            List of (start_time, end_time) tuples in seconds
+        """
+        duration = self.get_duration(file_path)
+        boundaries, tempo = self.detect_phrases(file_path)
+        boundaries = [t for t in boundaries
+                      if self.MIN_PHRASE_SECONDS <= t <= duration - self.MIN_PHRASE_SECONDS]
+        if not boundaries:
+            print("[AudioProcessor] Phrase plan: no beat grid found, using fixed segments")
+            return self._grid_segments(duration)
+        print(f"[AudioProcessor] Phrase plan: {len(boundaries) + 1} phrases of {Config.PHRASE_BARS} bars at ~{tempo:.1f} BPM")
+        
+        bounds = [0.0] + boundaries + [duration]
+        return list(zip(bounds, bounds[1:]))
+    
+    def screen_segments(self, file_path: str, segments: List[Tuple[float, float]]) -> List[Optional[str]]:
+        """
+        Flag windows unlikely to match any provider, before any HTTP call
+        
+        One vectorized pass over the decoded mix measures loudness, spectral
+        flatness and onset rate of every window (about a second per hour of
+        audio). Silent windows, noise (crowd, vinyl crackle, white-noise
+        sweeps) and beatless stretches (long ambient intros and breakdowns)
+        rarely produce a fingerprint match.
+        
+        Returns:
+            Per window, None if it is worth querying or the reason it isn't:
+            'silence', 'noise' or 'ambient'
+        """
+        from .analysis import window_stats
+        stats = window_stats(self.decode(file_path), self.SAMPLE_RATE, segments)
+        reasons = []
+        for rms_db, flatness, onset_rate in zip(stats['rms_db'], stats['flatness'], stats['onset_rate']):
+            if rms_db < Config.SCREEN_SILENCE_DB:
+                reasons.append('silence')
+            elif flatness > Config.SCREEN_MAX_FLATNESS:
+                reasons.append('noise')
+            elif onset_rate < Config.SCREEN_MIN_ONSET_RATE:
+                reasons.append('ambient')
+            else:
+                reasons.append(None)
+        return reasons
+    
+    def _phrase_clip_length(self, duration: float) -> float:
+        """Seconds uploaded for a phrase window: up to the probe/segment length, one bar clear of each end"""
+        bar = duration / Config.PHRASE_BARS
+        return min(self.probe_length or self.segment_length, max(duration - 2 * bar, 0.0))
+    
+    def _select_clip(self, samples: np.ndarray, sample_rate: int, duration: float) -> Tuple[float, np.ndarray]:
+        """(offset in seconds, clip) uploaded for a window of the given duration"""
+        if self.segment_mode != 'phrase':
+            return self.select_probe(samples, sample_rate, self._clip_length(duration))
+        # Centre of the phrase, away from the blends at its boundaries
+        clip_len = int(self._phrase_clip_length(duration) * sample_rate)
+        if clip_len <= 0 or clip_len >= len(samples):
+            return 0.0, samples
+        start = (len(samples) - clip_len) // 2
+        return start / sample_rate, samples[start:start + clip_len]
+    
+    def _clip_length(self, duration: float) -> Optional[float]:
+        """Seconds uploaded for a window: the probe, or segment_length for long planned windows"""
+        if self.probe_length:
+            return self.probe_length
+        return self.segment_length if duration > self.segment_length + 1 else None
+    
+    def decode(self, file_path: str) -> np.ndarray:
+        """
+        Decode the whole file once to mono 16-bit PCM at SAMPLE_RATE
+        
+        The buffer is kept on the processor so every segment can be sliced
+        from it without touching the source file again. With a PCM cache the
+        decoded samples are memory-mapped from disk, and later runs on the
+        same file skip decoding entirely.
+        
+        Returns:
+            1-D int16 array of samples
+        """
+        if self._pcm is not None and self._pcm_path == file_path:
+            return self._pcm
+        
+        # Release the previous buffer before decoding the next file
+        self._pcm = None
+        self._pcm_path = None
+        
+        cache_key = None
+        if self.pcm_cache is not None:
+            cache_key = self.pcm_cache.key_for(file_path, self.SAMPLE_RATE)
+            cached = self.pcm_cache.get(cache_key)
+            if cached is not None:
+                print(f"[AudioProcessor] PCM cache hit for {os.path.basename(file_path)}")
+                self._pcm = cached
+                self._pcm_path = file_path
+                return cached
+        
+        try:
+            decoder = self.decoder_for(file_path)
+            pcm = decoder.read(file_path, self.SAMPLE_RATE)
+            if len(pcm) == 0:
+                raise RuntimeError(f"{decoder.name} decoded no audio")
+        except DecoderMissing:
+            raise
+        except Exception as e:
+            print(f"[AudioProcessor] Decode failed: {e}. Falling back to librosa (memory intensive)")
+            try:
+                y, _ = librosa.load(file_path, sr=self.SAMPLE_RATE, mono=True)
+                pcm = (np.clip(y, -1.0, 1.0) * 32767).astype(np.int16)
+            except Exception as e2:
+                raise ValueError(f"Could not decode audio file: {e2}")
+        
+        if cache_key is not None:
+            pcm = self.pcm_cache.put(cache_key, pcm)
+        
+        self._pcm = pcm
+        self._pcm_path = file_path
+        return pcm
+    
+    def slice_segment(self, pcm: np.ndarray, start_time: float, end_time: float) -> np.ndarray:
+        """Return the (start_time, end_time) window of a decoded buffer as a view (no copy)"""
+        start = max(0, int(round(start_time * self.SAMPLE_RATE)))
+        end = min(len(pcm), int(round(end_time * self.SAMPLE_RATE)))
+        return pcm[start:max(start, end)]
+    
+    def load_segment(self, file_path: str, start_time: float, duration: float) -> SegmentAudio:
+        """
+        Get a segment as in-memory audio (no temp files in single-decode mode)
         
         Args:
             file_path: Path to source audio file
             start_time: Start time in seconds
             duration: Duration of segment in seconds
-            output_path: Optional output path (creates temp file if not provided)
             
         Returns:
-            Path to extracted segment file
+            SegmentAudio for the window
         """
+        if self.single_decode:
+            pcm = self.decode(file_path)
+            samples = self.slice_segment(pcm, start_time, start_time + duration)
+            offset, samples = self._select_clip(samples, self.SAMPLE_RATE, duration)
+            return SegmentAudio(samples, self.SAMPLE_RATE, offset)
+        
+        # Per-segment FFmpeg writes a file; read it back and drop it right away
+        segment_path = self.extract_segment(file_path, start_time, duration)
         try:
-            # Use FFmpeg for memory-efficient extraction (doesn't load full file)
-            import subprocess
-            
-            # Create output file if not provided
-            if output_path is None:
-                fd, output_path = tempfile.mkstemp(suffix='.wav', prefix='segment_')
-                os.close(fd)
+            samples, sr = sf.read(segment_path, dtype='int16')
+        finally:
+            try:
+                os.unlink(segment_path)
+            except OSError:
+                pass
+        offset, samples = self._select_clip(samples, sr, duration)
+        return SegmentAudio(samples, sr, offset)
+    
+    def select_probe(self, samples: np.ndarray, sample_rate: int, length: Optional[float] = None) -> Tuple[float, np.ndarray]:
+        """
+        Pick the probe clip from a segment window (probe mode)
+        
+        Scores every candidate clip position by an energy/onset heuristic:
+        high, steady RMS (no breakdown or fade inside the clip) with regular
+        onsets, and a penalty near the window edges where DJ blends sit.
+        
+        Args:
+            samples: Window samples
+            sample_rate: Sample rate of samples
+            length: Clip seconds (defaults to probe_length; None = whole window)
+        
+        Returns:
+            (offset in seconds, clip samples as a view of the window)
+        """
+        length = length or self.probe_length
+        if not length:
+            return 0.0, samples
+        clip_len = int(length * sample_rate)
+        if clip_len >= len(samples):
+            return 0.0, samples
+        
+        hop = 512
+        y = samples.astype(np.float32) / 32768.0 if samples.dtype == np.int16 else samples.astype(np.float32)
+        rms = librosa.feature.rms(y=y, frame_length=2048, hop_length=hop)[0]
+        onset = librosa.onset.onset_strength(y=y, sr=sample_rate, hop_length=hop)
+        n = min(len(rms), len(onset))
+        rms, onset = rms[:n], onset[:n]
+        
+        win = max(1, clip_len // hop)
+        positions = n - win + 1
+        if positions <= 1:
+            return 0.0, samples[:clip_len]
+        
+        # Sliding-window mean/std via cumulative sums (vectorized)
+        def window_mean(x):
+            c = np.concatenate(([0.0], np.cumsum(x, dtype=np.float64)))
+            return (c[win:] - c[:-win]) / win
+        
+        rms_mean = window_mean(rms)
+        rms_std = np.sqrt(np.maximum(window_mean(rms ** 2) - rms_mean ** 2, 0.0))
+        onset_mean = window_mean(onset)
+        
+        stability = rms_mean / (rms_mean.max() + 1e-9) * (1.0 - np.minimum(rms_std / (rms_mean + 1e-9), 1.0))
+        rhythm = onset_mean / (onset_mean.max() + 1e-9)
+        centre = np.linspace(-1.0, 1.0, positions)
+        edge_penalty = 0.25 * centre ** 2
+        score = stability + 0.5 * rhythm - edge_penalty
+        
+        start = int(np.argmax(score)) * hop
+        start = min(start, len(samples) - clip_len)
+        return start / sample_rate, samples[start:start + clip_len]
+    
+    def write_segment(self, samples: np.ndarray, output_path: Optional[str] = None) -> str:
+        """
+        Write PCM samples to a WAV file
+        
+        Args:
+            samples: Mono samples at SAMPLE_RATE
+            output_path: Optional output path (creates temp file if not provided)
             
-            # Use FFmpeg to extract segment directly (much more memory efficient)
-            cmd = [
-                'ffmpeg',
-                '-i', file_path,
-                '-ss', str(start_time),
-                '-t', str(duration),
-                '-ar', '22050',  # Sample rate
-                '-ac', '1',  # Mono
-                '-y',  # Overwrite output
-                output_path
-            ]
+        Returns:
+            Path to the written WAV file
+        """
+        if output_path is None:
+            fd, output_path = tempfile.mkstemp(suffix='.wav', prefix='segment_')
+            os.close(fd)
+        sf.write(output_path, samples, self.SAMPLE_RATE, subtype='PCM_16')
+        return output_path
+    
+    def extract_segment(self, file_path: str, start_time: float, duration: float, output_path: Optional[str] = None) -> str:
+        """
+        Extract a segment from audio file (decodes only the window - memory efficient)
+        
+        Args:
+            file_path: Path to source audio file
+            start_time: Start time in seconds
+            duration: Duration of segment in seconds
+            output_path: Optional output path (creates temp file if not provided)
             
-            result = subprocess.run(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                timeout=30
+        Returns:
+            Path to extracted segment file
+        """
+        if self.single_decode:
+            pcm = self.decode(file_path)
+            _, samples = self._select_clip(
+                self.slice_segment(pcm, start_time, start_time + duration), self.SAMPLE_RATE, duration
             )
+            return self.write_segment(samples, output_path)
+        
+        if self.segment_mode == 'phrase':
+            # Clip from the middle of the phrase
+            clip = self._phrase_clip_length(duration)
+            start_time += (duration - clip) / 2
+            duration = clip
+        elif duration > self.segment_length + 1:
+            # Long planned window - extract a segment_length clip from its middle
+            start_time += (duration - self.segment_length) / 2
+            duration = self.segment_length
+        
+        if output_path is None:
+            fd, output_path = tempfile.mkstemp(suffix='.wav', prefix='segment_')
+            os.close(fd)
+        
+        try:
+            # Only the window is decoded: a seek in the open file (libsndfile) or FFmpeg -ss
+            decoder = self.decoder_for(file_path)
+            samples = decoder.read(file_path, self.SAMPLE_RATE, start_time, duration)
+            if len(samples) == 0:
+                raise RuntimeError(f"{decoder.name} decoded no audio")
+            return self.write_segment(samples, output_path)
             
-            if result.returncode != 0:
-                # FFmpeg failed
-                error_msg = result.stderr.decode() if result.stderr else "FFmpeg failed"
-                print(f"[AudioProcessor] FFmpeg failed: {error_msg}")
-                # Try librosa fallback as last resort (better than crashing)
-                print("[AudioProcessor] Falling back to librosa (memory intensive)")
-                y, sr = librosa.load(
-                    file_path,
-                    offset=start_time,
-                    duration=duration,
-                    sr=22050
-                )
-                sf.write(output_path, y, sr)
-                return output_path
-            
-            # Verify file was created
-            if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
-                print("[AudioProcessor] FFmpeg created empty file, falling back to librosa")
-                y, sr = librosa.load(
-                    file_path,
-                    offset=start_time,
-                    duration=duration,
-                    sr=22050
-                )
-                sf.write(output_path, y, sr)
-                return output_path
-            
-            return output_path
-            
-        except FileNotFoundError:
-            # FFmpeg not installed
-            print("[AudioProcessor] FFmpeg not found! Falling back to librosa (will use more memory)")
-            raise ValueError("FFmpeg not installed. Please add FFmpeg buildpack in Render settings. See FFMPEG_SETUP.md")
+        except DecoderMissing:
+            print("[AudioProcessor] FFmpeg not found!")
+            raise
         except Exception as e:
             # Last resort - try librosa (better than crashing)
-            print(f"[AudioProcessor] Error with FFmpeg: {e}. Trying librosa fallback (memory intensive)")
+            print(f"[AudioProcessor] Error decoding segment: {e}. Trying librosa fallback (memory intensive)")
             try:
                 y, sr = librosa.load(
                     file_path,
                     offset=start_time,
                     duration=duration,
-                    sr=22050
+                    sr=self.SAMPLE_RATE
                 )
-                if output_path is None:
-                    fd, output_path = tempfile.mkstemp(suffix='.wav', prefix='segment_')
-                    os.close(fd)
                 sf.write(output_path, y, sr)
                 return output_path
             except Exception as e2:
                 raise ValueError(f"Could not extract segment: {e2}")
     
+    def extract_segments(self, file_path: str, segments: Sequence[Tuple[float, float]],
+                         output_dir: Optional[str] = None) -> List[str]:
+        """
+        Extract every window to its own WAV file from a single pass over the file
+        
+        Per-segment extract_segment() seeks and decodes once per window (with
+        the FFmpeg backend, one process that probes the container each time).
+        Here the file is decoded once, sequentially - one FFmpeg process at
+        most - and the windows are cut from the stream as it passes, so only
+        the span of the windows still open is held in memory. With
+        single_decode the already decoded buffer is sliced instead.
+        
+        Args:
+            file_path: Path to source audio file
+            segments: (start_time, end_time) windows, e.g. from segment_audio()
+            output_dir: Directory for the files (temp dir if not provided)
+            
+        Returns:
+            Paths of the window files in segment order (the caller deletes them)
+        """
+        paths: List[Optional[str]] = [None] * len(segments)
+        try:
+            if self.single_decode:
+                pcm = self.decode(file_path)
+                windows = ((i, self.slice_segment(pcm, start, end)) for i, (start, end) in enumerate(segments))
+            else:
+                windows = self._stream_windows(file_path, segments)
+            for index, samples in windows:
+                start, end = segments[index]
+                _, samples = self._select_clip(samples, self.SAMPLE_RATE, end - start)
+                fd, path = tempfile.mkstemp(suffix='.wav', prefix='segment_', dir=output_dir)
+                os.close(fd)
+                paths[index] = self.write_segment(samples, path)
+        except Exception:
+            for path in paths:
+                if path:
+                    try:
+                        os.unlink(path)
+                    except OSError:
+                        pass
+            raise
+        return paths
+    
+    def stream_segments(self, file_path: str, segments: Sequence[Tuple[float, float]]) -> Iterator[Tuple[int, SegmentAudio]]:
+        """
+        Yield (index, SegmentAudio) for every window from one sequential decode
+        
+        Memory stays constant whatever the length of the mix: decoded audio
+        passes through a ring buffer sized for the longest window, and each
+        window is copied out as soon as the stream has passed its end. Use it
+        instead of decode() for mixes too long to hold in memory.
+        
+        Args:
+            file_path: Path to source audio file
+            segments: (start_time, end_time) windows, e.g. from segment_audio()
+        
+        Yields:
+            (segment index, clip to upload), in order of window end time
+        """
+        for index, samples in self._stream_windows(file_path, segments):
+            start, end = segments[index]
+            offset, samples = self._select_clip(samples, self.SAMPLE_RATE, end - start)
+            yield index, SegmentAudio(samples, self.SAMPLE_RATE, offset)
+    
+    def _stream_windows(self, file_path: str, segments: Sequence[Tuple[float, float]]) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        Decode the file once, front to back, and yield (index, samples) as each window completes
+        
+        Windows come out in order of their end time. The ring buffer holds
+        the longest span any window still to come needs, plus one chunk.
+        """
+        bounds = [(max(0, int(round(start * self.SAMPLE_RATE))), max(0, int(round(end * self.SAMPLE_RATE))))
+                  for start, end in segments]
+        order = sorted(range(len(bounds)), key=lambda i: bounds[i][1])
+        if not order:
+            return
+        # keep_from[k]: earliest sample any of the windows order[k:] needs
+        keep_from = [0] * len(order)
+        keep_from[-1] = bounds[order[-1]][0]
+        for k in range(len(order) - 2, -1, -1):
+            keep_from[k] = min(keep_from[k + 1], bounds[order[k]][0])
+        chunk = int(self.STREAM_CHUNK_SECONDS * self.SAMPLE_RATE)
+        span = max(bounds[i][1] - keep_from[k] for k, i in enumerate(order))
+        ring = PCMRing(span + chunk)
+        
+        k = 0
+        blocks = self.decoder_for(file_path).blocks(file_path, self.SAMPLE_RATE)
+        try:
+            for block in blocks:
+                # Chunk by chunk, so a long decoder block can't overwrite a window before it is cut
+                for i in range(0, len(block), chunk):
+                    ring.write(block[i:i + chunk])
+                    while k < len(order) and bounds[order[k]][1] <= ring.end:
+                        start, end = bounds[order[k]]
+                        yield order[k], ring.read(start, end)
+                        k += 1
+                if k == len(order):
+                    return
+            # Stream ended early (duration estimate was long): cut what is there
+            for index in order[k:]:
+                start, end = bounds[index]
+                yield index, ring.read(min(start, ring.end), min(end, ring.end))
+        finally:
+            # Stops the decoder (and FFmpeg) when the last window is out before the end of the file
+            blocks.close()
+    
     def convert_to_wav(self, file_path: str, output_path: Optional[str] = None) -> str:
         """
         Convert audio file to WAV format (for API compatibility)
@@ -200,3 +755,67 @@ class AudioProcessor:
         except Exception as e:
             raise ValueError(f"Could not convert audio file: {e}")
 
+
+class SegmentStream:
+    """
+    Windows of one streamed decode, handed out by index to concurrent workers
+    
+    run_segments() asks for windows roughly in order, so the mix is decoded
+    once, front to back (see AudioProcessor.stream_segments), holding only
+    the ring buffer and up to `lookahead` windows decoded ahead of the
+    workers. A window asked for after the stream has passed it (adaptive
+    sampling going back to bisect) is decoded on its own with a seek.
+    """
+    
+    def __init__(self, processor: AudioProcessor, file_path: str, segments: Sequence[Tuple[float, float]],
+                 lookahead: int = 8):
+        """
+        Args:
+            processor: Processor whose settings (clip selection) apply; its
+                load_segment() serves windows the stream has passed, so it
+                should have single_decode off
+            file_path: Path to source audio file
+            segments: (start_time, end_time) windows
+            lookahead: Windows kept when decoded ahead of the one asked for
+        """
+        self.processor = processor
+        self.file_path = file_path
+        self.segments = segments
+        self.lookahead = lookahead
+        self._windows = processor.stream_segments(file_path, segments)
+        self._ready: Dict[int, SegmentAudio] = {}
+        self._passed = set()
+        self._lock = threading.Lock()
+        self.streamed = 0  # Windows cut from the stream
+        self.seeked = 0  # Windows decoded on their own
+    
+    def get(self, index: int) -> SegmentAudio:
+        """SegmentAudio of window `index`"""
+        with self._lock:
+            if index in self._ready:
+                self.streamed += 1
+                return self._ready.pop(index)
+            if index not in self._passed:
+                for produced, audio in self._windows:
+                    self._passed.add(produced)
+                    if produced == index:
+                        self.streamed += 1
+                        return audio
+                    self._ready[produced] = audio
+                    if len(self._ready) > self.lookahead:
+                        # Dicts keep insertion order: drop the window decoded longest ago
+                        del self._ready[next(iter(self._ready))]
+            self.seeked += 1
+        start_time, end_time = self.segments[index]
+        return self.processor.load_segment(self.file_path, start_time, end_time - start_time)
+    
+    def stats(self) -> Dict[str, int]:
+        """Windows cut from the stream / decoded on their own"""
+        with self._lock:
+            return {'streamed': self.streamed, 'seeked': self.seeked}
+    
+    def close(self):
+        """Stop decoding (ends the decoder process early)"""
+        with self._lock:
+            self._windows.close()
+            self._ready.clear()
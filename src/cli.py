@@ -2,22 +2,32 @@
 
 import os
 import sys
-import tempfile
-from pathlib import Path
+import asyncio
+from collections import Counter
 from typing import Optional
 
 import click
 from tqdm import tqdm
 
 from .audio_processor import AudioProcessor
+from .fingerprint import RepeatIndex
+from .pipeline import (
+    run_segments_screened, recognize_segment, recognize_segment_async,
+    PROVIDER_MODES, PIPELINE_ENGINES, SAMPLING_MODES, SCREEN_POLICIES
+)
 from .recognizers.acrcloud import ACRCloudRecognizer
 from .recognizers.audd import AuddRecognizer
 from .recognizers.shazam import ShazamRecognizer
 from .recognizers.songfinder import SongFinderRecognizer
+from .recognizers.local import LocalRecognizer
 from .recognizers.base import RecognitionResult
+from .scheduler import get_scheduler
 from .output.formatters import format_output, format_time
 from .utils.config import Config
-from .utils.track_utils import merge_results, deduplicate_tracks
+from .utils.pcm_cache import PCMCache
+from .utils.result_cache import get_result_cache
+from .utils.fingerprint_cache import get_fingerprint_cache
+from .utils.track_utils import merge_results, merge_results_async, deduplicate_tracks, infer_track
 
 
 @click.command()
@@ -29,8 +39,38 @@ from .utils.track_utils import merge_results, deduplicate_tracks
 @click.option('--segment-length', type=int, default=None, help='Segment length in seconds')
 @click.option('--segment-overlap', type=int, default=None, help='Segment overlap in seconds')
 @click.option('--confidence-threshold', type=float, default=None, help='Minimum confidence threshold (0.0-1.0)')
+@click.option('--segment-mode', type=click.Choice(AudioProcessor.SEGMENT_MODES), default=None,
+              help='Fixed window grid, windows placed at track changes detected in the mix (novelty), '
+                   'or one window per beat-tracked phrase (phrase)')
+@click.option('--probe-length', type=float, default=None,
+              help='Send only a clip of this many seconds from the most stable part of each segment (0 = off)')
+@click.option('--single-decode/--per-segment-decode', default=True,
+              help='Decode the mix once and slice segments from memory (default) or run FFmpeg per segment')
+@click.option('--pcm-cache/--no-pcm-cache', default=None,
+              help='Reuse decoded audio from the on-disk PCM cache across runs (default: PCM_CACHE_ENABLED)')
+@click.option('--result-cache/--no-result-cache', default=None,
+              help='Reuse cached API answers for identical segment audio (default: RESULT_CACHE_ENABLED)')
+@click.option('--fingerprint-cache/--no-fingerprint-cache', default=None,
+              help='Reuse answers for segments of earlier mixes with matching audio (default: FINGERPRINT_CACHE_ENABLED)')
+@click.option('--repeat-index/--no-repeat-index', default=None,
+              help='Reuse the result of an earlier segment whose audio this one repeats (default: REPEAT_INDEX_ENABLED)')
+@click.option('--workers', type=int, default=None, help='Segments recognized concurrently (default: WORKERS or 4)')
+@click.option('--provider-mode', type=click.Choice(PROVIDER_MODES), default=None,
+              help='Query providers one after another (sequential, saves quota) or all at once (fanout, faster)')
+@click.option('--engine', type=click.Choice(PIPELINE_ENGINES), default=None,
+              help='Segment driver: worker threads, or one asyncio event loop that keeps many segments in flight '
+                   '(--workers then sets segments in flight; default ASYNC_CONCURRENCY)')
+@click.option('--sampling', type=click.Choice(SAMPLING_MODES), default=None,
+              help='Query every window (all) or every --stride-th window, bisecting only where the track changes (adaptive)')
+@click.option('--stride', type=int, default=None, help='Initial window stride for adaptive sampling (default: SAMPLING_STRIDE or 4)')
+@click.option('--screen', type=click.Choice(SCREEN_POLICIES), default=None,
+              help='Low-information windows (silence, noise, ambience): send anyway (off), never send (skip), '
+                   'or send last and only where neighbouring windows disagree (defer) (default: SCREEN_MODE)')
+@click.option('--temp-files', is_flag=True,
+              help='Write each segment to a temporary WAV file instead of keeping it in memory')
 def main(audio_file: str, output_format: str, output: Optional[str], verbose: bool,
-         segment_length: Optional[int], segment_overlap: Optional[int], confidence_threshold: Optional[float]):
+         segment_length: Optional[int], segment_overlap: Optional[int], confidence_threshold: Optional[float],
+         segment_mode: Optional[str], probe_length: Optional[float], single_decode: bool, pcm_cache: Optional[bool], result_cache: Optional[bool], fingerprint_cache: Optional[bool], repeat_index: Optional[bool], workers: Optional[int], provider_mode: Optional[str], engine: Optional[str], sampling: Optional[str], stride: Optional[int], screen: Optional[str], temp_files: bool):
     """Identify tracks from continuous EDM/techno mixes"""
     
     # Validate configuration
@@ -49,21 +89,58 @@ def main(audio_file: str, output_format: str, output: Optional[str], verbose: bo
         Config.SEGMENT_OVERLAP = segment_overlap
     if confidence_threshold is not None:
         Config.CONFIDENCE_THRESHOLD = confidence_threshold
+    if probe_length is not None:
+        Config.PROBE_LENGTH = probe_length
+    if segment_mode is not None:
+        Config.SEGMENT_MODE = segment_mode
+    
+    if pcm_cache is None:
+        pcm_cache = Config.PCM_CACHE_ENABLED
+    if engine is None:
+        engine = Config.PIPELINE_ENGINE
+    if sampling is None:
+        sampling = Config.SAMPLING_MODE
+    if stride is None:
+        stride = Config.SAMPLING_STRIDE
+    if screen is None:
+        screen = Config.SCREEN_MODE
+    if workers is None:
+        workers = Config.ASYNC_CONCURRENCY if engine == 'asyncio' else Config.WORKERS
+    if result_cache is not None:
+        Config.RESULT_CACHE_ENABLED = result_cache
+    if fingerprint_cache is not None:
+        Config.FINGERPRINT_CACHE_ENABLED = fingerprint_cache
+    if provider_mode is None:
+        provider_mode = Config.PROVIDER_MODE
+    if repeat_index is None:
+        repeat_index = Config.REPEAT_INDEX_ENABLED
     
     # Initialize components
     processor = AudioProcessor(
         segment_length=Config.SEGMENT_LENGTH,
-        segment_overlap=Config.SEGMENT_OVERLAP
+        segment_overlap=Config.SEGMENT_OVERLAP,
+        single_decode=single_decode,
+        probe_length=Config.PROBE_LENGTH or None,
+        segment_mode=Config.SEGMENT_MODE,
+        pcm_cache=PCMCache(Config.PCM_CACHE_DIR, Config.PCM_CACHE_MAX_MB * 1024 * 1024) if pcm_cache and single_decode else None
     )
     
     acrcloud = ACRCloudRecognizer()
     audd = AuddRecognizer()
     shazam = ShazamRecognizer()
     songfinder = SongFinderRecognizer()
+    local = LocalRecognizer()
+    
+    # Default priority order; the scheduler reorders it from observed hit rate and latency
+    # (the local library is offline and always asked first)
+    recognizers = [local, acrcloud, shazam, songfinder, audd]
+    scheduler = get_scheduler() if Config.SCHEDULER_ENABLED else None
+    # Fingerprints of this mix's recognized segments (needs in-memory segments)
+    repeats = RepeatIndex(min_coverage=Config.REPEAT_MIN_COVERAGE) if repeat_index and not temp_files else None
     
     # Check if at least one recognizer is available
-    if not any([acrcloud.is_available(), audd.is_available(), shazam.is_available(), songfinder.is_available()]):
-        click.echo("Error: No recognition APIs configured. Please set at least one API key.", err=True)
+    if not any(r.is_available() for r in recognizers):
+        click.echo("Error: No recognition APIs configured. Please set at least one API key or LOCAL_INDEX_DIR.", err=True)
         sys.exit(1)
     
     # Validate audio file
@@ -73,64 +150,147 @@ def main(audio_file: str, output_format: str, output: Optional[str], verbose: bo
     
     if verbose:
         click.echo(f"Processing: {audio_file}")
-        click.echo(f"Segment length: {Config.SEGMENT_LENGTH}s, Overlap: {Config.SEGMENT_OVERLAP}s")
+        click.echo(f"Segment length: {Config.SEGMENT_LENGTH}s, Overlap: {Config.SEGMENT_OVERLAP}s, mode: {Config.SEGMENT_MODE}")
         click.echo(f"Confidence threshold: {Config.CONFIDENCE_THRESHOLD}")
+        click.echo(f"Engine: {engine}, workers: {workers}, provider mode: {provider_mode}")
+        if sampling == 'adaptive':
+            click.echo(f"Adaptive sampling: stride {stride}")
+        if screen != 'off':
+            click.echo(f"Low-information segments: {screen}")
+        if Config.PROBE_LENGTH:
+            click.echo(f"Probe mode: {Config.PROBE_LENGTH}s clip per segment")
+        if scheduler is not None:
+            order = scheduler.order([r for r in recognizers if r.is_available()])
+            click.echo(f"Provider order: {' -> '.join(r.display_name for r in order)}")
     
+    segment_tracks = []
+    segment_files = []
     try:
+        # Decode once up front so duration and segments come from the PCM buffer
+        if single_decode:
+            processor.decode(audio_file)
+        
         # Get audio duration and segments
         duration = processor.get_duration(audio_file)
         segments = processor.segment_audio(audio_file)
         
+        # Flag silence/noise/ambience before any API call
+        screened = processor.screen_segments(audio_file, segments) if screen != 'off' else [None] * len(segments)
+        
         if verbose:
             click.echo(f"Audio duration: {format_time(duration)}")
             click.echo(f"Number of segments: {len(segments)}")
         
+        # Temp files without single decode: one FFmpeg pass cuts every window
+        # instead of one FFmpeg run per segment
+        if temp_files and not single_decode:
+            segment_files = processor.extract_segments(audio_file, segments)
+        
         # Process segments
-        all_tracks = []
-        temp_files = []
+        def process_segment(index: int, start_time: float, end_time: float) -> Optional[dict]:
+            segment_path = None
+            try:
+                # Extract segment (in memory, shared by every recognizer)
+                if temp_files:
+                    segment_path = segment_files[index] if segment_files else processor.extract_segment(audio_file, start_time, end_time - start_time)
+                    segment_audio = segment_path
+                else:
+                    segment_audio = processor.load_segment(audio_file, start_time, end_time - start_time)
+                
+                # Audio already recognized earlier in the mix - no API call
+                fp = None
+                if repeats is not None:
+                    fp = segment_audio.fingerprint()
+                    repeated = repeats.lookup(fp, segment_audio.duration, segment_audio.sample_rate)
+                    if repeated:
+                        return infer_track(repeated, start_time, end_time)
+                
+                results = recognize_segment(
+                    recognizers, segment_audio, start_time, end_time - start_time,
+                    Config.CONFIDENCE_THRESHOLD, mode=provider_mode, scheduler=scheduler
+                )
+                
+                # Merge results (AI only if results conflict)
+                use_ai = len(results) > 1 and any(
+                    r1.artist != r2.artist or r1.title != r2.title 
+                    for i, r1 in enumerate(results) 
+                    for r2 in results[i+1:]
+                )
+                track = merge_results(results, start_time, end_time, Config.CONFIDENCE_THRESHOLD, use_ai=use_ai)
+                if track and fp is not None:
+                    repeats.add(fp, track)
+                return track
+                
+            except Exception as e:
+                if verbose:
+                    click.echo(f"Error processing segment {start_time}-{end_time}: {e}", err=True)
+                return None
+            finally:
+                # Temp files are only written with --temp-files
+                if segment_path:
+                    try:
+                        os.unlink(segment_path)
+                    except OSError:
+                        pass
         
-        with tqdm(total=len(segments), desc="Processing segments", disable=not verbose) as pbar:
-            for start_time, end_time in segments:
-                try:
-                    # Extract segment
-                    segment_path = processor.extract_segment(audio_file, start_time, end_time - start_time)
-                    temp_files.append(segment_path)
-                    
-                    # Try recognition with primary (ACRCloud)
-                    results = []
-                    if acrcloud.is_available():
-                        result = acrcloud.recognize(segment_path, start_time, end_time - start_time)
-                        if result:
-                            results.append(result)
-                    
-                    # Try fallback (Audd.io) if no result or low confidence
-                    if (not results or results[0].confidence < Config.CONFIDENCE_THRESHOLD) and audd.is_available():
-                        result = audd.recognize(segment_path, start_time, end_time - start_time)
-                        if result:
-                            results.append(result)
-                    
-                    # Merge results (AI only if results conflict)
-                    use_ai = len(results) > 1 and any(
-                        r1.artist != r2.artist or r1.title != r2.title 
-                        for i, r1 in enumerate(results) 
-                        for r2 in results[i+1:]
-                    )
-                    track = merge_results(results, start_time, end_time, Config.CONFIDENCE_THRESHOLD, use_ai=use_ai)
-                    if track:
-                        all_tracks.append(track)
-                    
-                except Exception as e:
-                    if verbose:
-                        click.echo(f"Error processing segment {start_time}-{end_time}: {e}", err=True)
+        async def process_segment_async(index: int, start_time: float, end_time: float) -> Optional[dict]:
+            segment_path = None
+            try:
+                # Decoding/extraction is blocking work - keep it off the event loop
+                if temp_files:
+                    segment_path = segment_files[index] if segment_files else await asyncio.to_thread(processor.extract_segment, audio_file, start_time, end_time - start_time)
+                    segment_audio = segment_path
+                else:
+                    segment_audio = await asyncio.to_thread(processor.load_segment, audio_file, start_time, end_time - start_time)
+                
+                fp = None
+                if repeats is not None:
+                    fp = await asyncio.to_thread(segment_audio.fingerprint)
+                    repeated = repeats.lookup(fp, segment_audio.duration, segment_audio.sample_rate)
+                    if repeated:
+                        return infer_track(repeated, start_time, end_time)
+                
+                results = await recognize_segment_async(
+                    recognizers, segment_audio, start_time, end_time - start_time,
+                    Config.CONFIDENCE_THRESHOLD, mode=provider_mode, scheduler=scheduler
+                )
                 
+                use_ai = len(results) > 1 and any(
+                    r1.artist != r2.artist or r1.title != r2.title 
+                    for i, r1 in enumerate(results) 
+                    for r2 in results[i+1:]
+                )
+                track = await merge_results_async(results, start_time, end_time, Config.CONFIDENCE_THRESHOLD, use_ai=use_ai)
+                if track and fp is not None:
+                    repeats.add(fp, track)
+                return track
+                
+            except Exception as e:
+                if verbose:
+                    click.echo(f"Error processing segment {start_time}-{end_time}: {e}", err=True)
+                return None
+            finally:
+                if segment_path:
+                    try:
+                        os.unlink(segment_path)
+                    except OSError:
+                        pass
+        
+        # Segments finish out of order with several workers; keep them indexed
+        segment_tracks = [None] * len(segments)
+        
+        with tqdm(total=len(segments), desc="Processing segments", disable=not verbose) as pbar:
+            def on_complete(index: int, track: Optional[dict]):
+                segment_tracks[index] = track
                 pbar.update(1)
+            
+            _, counts = run_segments_screened(
+                segments, process_segment_async if engine == 'asyncio' else process_segment, screened,
+                policy=screen, sampling=sampling, stride=stride, workers=workers, on_complete=on_complete,
+                engine=engine
+            )
         
-        # Clean up temp files
-        for temp_file in temp_files:
-            try:
-                os.unlink(temp_file)
-            except:
-                pass
+        all_tracks = [track for track in segment_tracks if track]
         
         # Deduplicate tracks (AI only for large tracklists)
         use_ai_dedup = len(all_tracks) > 10
@@ -138,6 +298,32 @@ def main(audio_file: str, output_format: str, output: Optional[str], verbose: bo
         
         if verbose:
             click.echo(f"\nFound {len(unique_tracks)} unique tracks")
+            if sampling == 'adaptive' or counts['low_info'] or counts['reused']:
+                click.echo(f"Queried {counts['queried']} of {len(segments)} segments, reused {counts['reused']}, "
+                           f"inferred {counts['inferred']}, skipped {counts['skipped']}")
+            if counts['low_info']:
+                reasons = Counter(reason for reason in screened if reason)
+                click.echo(f"Low-information segments ({screen}): {counts['low_info']} - "
+                           + ", ".join(f"{reason} {n}" for reason, n in reasons.most_common()))
+            if repeats is not None:
+                stats = repeats.stats()
+                click.echo(f"Repeat index: {stats['hits']} segments reused an earlier result, "
+                           f"{stats['indexed']} indexed")
+            cache = get_result_cache()
+            if cache is not None:
+                stats = cache.stats()
+                click.echo(f"Result cache: {stats['hits']} hits, {stats['misses']} misses, "
+                           f"~{stats['api_seconds_saved']}s of API time saved")
+            cache = get_fingerprint_cache()
+            if cache is not None:
+                stats = cache.stats()
+                click.echo(f"Fingerprint cache: {stats['hits']} hits, {stats['misses']} misses, "
+                           f"{stats['stored']} stored, {stats['segments']} segments cached")
+            if scheduler is not None:
+                for name, s in scheduler.report([r for r in recognizers if r.is_available()]).items():
+                    if s['calls']:
+                        click.echo(f"Provider {name}: {s['calls']} calls, hit rate {s['hit_rate']:.0%}, "
+                                   f"p50 {s['latency_p50']}s, p95 {s['latency_p95']}s")
         
         # Format and output
         output_text = format_output(unique_tracks, output_format)
@@ -157,9 +343,10 @@ def main(audio_file: str, output_format: str, output: Optional[str], verbose: bo
     except KeyboardInterrupt:
         click.echo("\nProcessing interrupted by user", err=True)
         # Try to save partial results if output file specified
-        if output and 'all_tracks' in locals() and all_tracks:
+        partial_tracks = [track for track in segment_tracks if track]
+        if output and partial_tracks:
             try:
-                unique_tracks = deduplicate_tracks(all_tracks)
+                unique_tracks = deduplicate_tracks(partial_tracks)
                 output_text = format_output(unique_tracks, output_format)
                 with open(output, 'w') as f:
                     f.write(output_text)
@@ -173,6 +360,53 @@ def main(audio_file: str, output_format: str, output: Optional[str], verbose: bo
             import traceback
             traceback.print_exc()
         sys.exit(1)
+    finally:
+        # Windows that were inferred or skipped were never sent (or deleted)
+        for path in segment_files:
+            if path and os.path.exists(path):
+                os.unlink(path)
+
+
+@click.command()
+@click.argument('library', type=click.Path(exists=True, file_okay=False, readable=True))
+@click.option('--index-dir', type=click.Path(file_okay=False), default=None,
+              help='Where the index is kept (default: LOCAL_INDEX_DIR)')
+@click.option('--compact', is_flag=True, help='Merge all shards and drop removed tracks after updating')
+@click.option('--verbose', '-v', is_flag=True, help='List every file indexed')
+def build_index(library: str, index_dir: Optional[str], compact: bool, verbose: bool):
+    """Build or update the local reference index from a directory of tracks
+    
+    Only files that are new or changed since the last run are fingerprinted;
+    files that disappeared are dropped from the index. Name files
+    'Artist - Title.ext' so matches come back with artist and title.
+    """
+    from .reference_index import ReferenceIndex
+    
+    index_dir = index_dir or Config.LOCAL_INDEX_DIR
+    if not index_dir:
+        click.echo("Error: No index directory. Pass --index-dir or set LOCAL_INDEX_DIR.", err=True)
+        sys.exit(1)
+    
+    processor = AudioProcessor()
+    index = ReferenceIndex(index_dir)
+    
+    def decode(path: str):
+        return processor.decode(path), processor.SAMPLE_RATE
+    
+    def on_progress(path: str, status: str):
+        if verbose:
+            click.echo(f"  {status}: {path}")
+    
+    try:
+        counts = index.update(library, decode, tuple(processor.SUPPORTED_FORMATS), on_progress)
+        if compact:
+            index.compact()
+    except KeyboardInterrupt:
+        click.echo("\nIndexing interrupted; tracks already written are kept, run again to finish", err=True)
+        sys.exit(1)
+    
+    click.echo(f"Indexed {len(index)} tracks in {index_dir}: {counts['added']} added, {counts['updated']} updated, "
+               f"{counts['removed']} removed, {counts['unchanged']} unchanged, {counts['failed']} failed")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,294 @@
+"""Audio decoding backends: in-process libsndfile, with FFmpeg for everything else"""
+
+import os
+import tempfile
+import threading
+import subprocess
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+import librosa
+import numpy as np
+import soundfile as sf
+import soxr
+
+from .utils.config import Config
+
+BLOCK_SECONDS = 6.0  # Audio decoded per block when streaming
+
+
+class DecoderMissing(ValueError):
+    """A backend's external tool (FFmpeg) is not installed"""
+
+
+class Decoder(ABC):
+    """
+    Decodes audio files to mono 16-bit PCM at a requested sample rate
+
+    AudioProcessor asks its decoders in order and uses the first whose
+    supports() accepts the file.
+    """
+
+    name: str = "unknown"
+
+    @abstractmethod
+    def supports(self, file_path: str) -> bool:
+        """Whether this backend can decode the file"""
+        pass
+
+    @abstractmethod
+    def duration(self, file_path: str) -> float:
+        """Length of the file in seconds"""
+        pass
+
+    @abstractmethod
+    def blocks(self, file_path: str, sample_rate: int, start: float = 0.0,
+               duration: Optional[float] = None) -> Iterator[np.ndarray]:
+        """
+        Decode sequentially from start, one int16 block at a time
+
+        Args:
+            file_path: Audio file
+            sample_rate: Output sample rate
+            start: Seconds into the file
+            duration: Seconds to decode (None = to the end)
+        """
+        pass
+
+    def read(self, file_path: str, sample_rate: int, start: float = 0.0,
+             duration: Optional[float] = None) -> np.ndarray:
+        """blocks() gathered into one int16 array, preallocated when the length is known"""
+        expected = duration
+        if expected is None:
+            try:
+                expected = self.duration(file_path) - start
+            except Exception:
+                expected = None
+        if expected is None or expected <= 0:
+            parts = list(self.blocks(file_path, sample_rate, start, duration))
+            return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int16)
+
+        # A 2 h mix is ~300 MB of PCM: fill one buffer instead of concatenating a copy
+        out = np.empty(int(expected * sample_rate) + sample_rate, dtype=np.int16)
+        filled = 0
+        overflow = []
+        for block in self.blocks(file_path, sample_rate, start, duration):
+            if overflow or filled + len(block) > len(out):
+                overflow.append(block)
+                continue
+            out[filled:filled + len(block)] = block
+            filled += len(block)
+        if overflow:
+            return np.concatenate([out[:filled]] + overflow)
+        return out[:filled]
+
+    def close(self):
+        """Release anything held open between calls"""
+
+
+class _OpenFile:
+    """A SoundFile shared by concurrent readers, closed once dropped from the cache and unused"""
+
+    def __init__(self, file_path: str, version: Tuple[int, float]):
+        self.handle = sf.SoundFile(file_path)
+        self.lock = threading.Lock()  # Serializes seek + read on the handle
+        self.version = version
+        self.users = 0
+        self.dropped = False
+
+
+class SoundfileDecoder(Decoder):
+    """
+    In-process decoding with libsndfile: WAV, FLAC, OGG and (libsndfile >= 1.1) MP3
+
+    Open files are kept, so the segments of a mix are read from one handle
+    (MP3 seek tables are built once) instead of re-opening the file per
+    segment. Resampling and downmixing are streamed block by block.
+    """
+
+    name = "soundfile"
+
+    def __init__(self, max_open: int = 4):
+        """
+        Args:
+            max_open: Files kept open at once (least recently used are closed
+                as soon as no reader is using them)
+        """
+        self.max_open = max_open
+        self._formats = set(sf.available_formats())
+        self._files: "OrderedDict[str, _OpenFile]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def supports(self, file_path: str) -> bool:
+        if Path(file_path).suffix.lstrip('.').upper() not in self._formats:
+            return False
+        # The handle opened to check the file stays cached for the reads that follow
+        try:
+            self._release(self._acquire(file_path))
+            return True
+        except Exception:
+            return False
+
+    def duration(self, file_path: str) -> float:
+        entry = self._acquire(file_path)
+        try:
+            return entry.handle.frames / entry.handle.samplerate
+        finally:
+            self._release(entry)
+
+    def blocks(self, file_path: str, sample_rate: int, start: float = 0.0,
+               duration: Optional[float] = None) -> Iterator[np.ndarray]:
+        entry = self._acquire(file_path)
+        try:
+            handle = entry.handle
+            source_rate = handle.samplerate
+            position = max(0, int(round(start * source_rate)))
+            remaining = int(round(duration * source_rate)) if duration is not None else None
+            block_frames = int(BLOCK_SECONDS * source_rate)
+            resampler = soxr.ResampleStream(source_rate, sample_rate, 1, dtype='float32') if source_rate != sample_rate else None
+
+            while remaining is None or remaining > 0:
+                frames = block_frames if remaining is None else min(block_frames, remaining)
+                # Segments may be read concurrently: each block is one locked seek + read
+                with entry.lock:
+                    if handle.tell() != position:
+                        handle.seek(position)
+                    block = handle.read(frames, dtype='float32', always_2d=True)
+                last = len(block) < frames
+                position += len(block)
+                if remaining is not None:
+                    remaining -= len(block)
+                mono = block.mean(axis=1) if block.shape[1] > 1 else block[:, 0]
+                if resampler is not None:
+                    mono = resampler.resample_chunk(mono, last=last or remaining == 0)
+                if len(mono):
+                    # libsndfile reads int16 as x / 32768: scale back exactly
+                    yield np.clip(np.round(mono * 32768), -32768, 32767).astype(np.int16)
+                if last:
+                    break
+        finally:
+            self._release(entry)
+
+    def _acquire(self, file_path: str) -> _OpenFile:
+        """Cached open file (reopened if the file changed), held until _release()"""
+        stat = os.stat(file_path)
+        version = (stat.st_size, stat.st_mtime)
+        with self._lock:
+            entry = self._files.get(file_path)
+            if entry is not None and entry.version == version:
+                self._files.move_to_end(file_path)
+            else:
+                if entry is not None:
+                    self._drop(self._files.pop(file_path))
+                entry = _OpenFile(file_path, version)
+                self._files[file_path] = entry
+                while len(self._files) > self.max_open:
+                    self._drop(self._files.popitem(last=False)[1])
+            entry.users += 1
+            return entry
+
+    def _release(self, entry: _OpenFile):
+        with self._lock:
+            entry.users -= 1
+            if entry.dropped and entry.users == 0:
+                entry.handle.close()
+
+    @staticmethod
+    def _drop(entry: _OpenFile):
+        """Forget a cached file (caller holds _lock); readers still using it close it when done"""
+        entry.dropped = True
+        if entry.users == 0:
+            entry.handle.close()
+
+    def close(self):
+        with self._lock:
+            for entry in self._files.values():
+                self._drop(entry)
+            self._files.clear()
+
+
+class FFmpegDecoder(Decoder):
+    """Decoding in an FFmpeg subprocess piping raw PCM (any container FFmpeg reads)"""
+
+    name = "ffmpeg"
+
+    def supports(self, file_path: str) -> bool:
+        return True
+
+    def duration(self, file_path: str) -> float:
+        # FFprobe reads the container header instead of decoding
+        try:
+            cmd = [
+                'ffprobe',
+                '-v', 'error',
+                '-show_entries', 'format=duration',
+                '-of', 'default=noprint_wrappers=1:nokey=1',
+                file_path
+            ]
+            result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=10)
+            if result.returncode == 0:
+                return float(result.stdout.decode().strip())
+            error_msg = result.stderr.decode() if result.stderr else "FFprobe failed"
+            print(f"[FFmpegDecoder] FFprobe failed: {error_msg}")
+        except FileNotFoundError:
+            print("[FFmpegDecoder] FFprobe not found - FFmpeg not installed!")
+            raise DecoderMissing("FFmpeg/FFprobe not installed. Please add FFmpeg buildpack in Render settings. See FFMPEG_SETUP.md")
+        except Exception as e:
+            print(f"[FFmpegDecoder] FFprobe error: {e}")
+
+        try:
+            print("[FFmpegDecoder] Falling back to librosa for duration (less efficient)")
+            return librosa.get_duration(path=file_path)
+        except Exception as e:
+            raise ValueError(f"Could not read audio file: {e}")
+
+    def blocks(self, file_path: str, sample_rate: int, start: float = 0.0,
+               duration: Optional[float] = None) -> Iterator[np.ndarray]:
+        cmd = ['ffmpeg', '-v', 'error']
+        if start > 0:
+            # -ss before -i seeks in the input instead of decoding up to the offset
+            cmd += ['-ss', str(start)]
+        cmd += ['-i', file_path]
+        if duration is not None:
+            cmd += ['-t', str(duration)]
+        cmd += ['-f', 's16le', '-acodec', 'pcm_s16le', '-ar', str(sample_rate), '-ac', '1', 'pipe:1']
+        # stderr goes to a file: a full pipe nobody reads until EOF would stall FFmpeg
+        errors = tempfile.TemporaryFile()
+        try:
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=errors)
+        except FileNotFoundError:
+            errors.close()
+            raise DecoderMissing("FFmpeg not installed. Please add FFmpeg buildpack in Render settings. See FFMPEG_SETUP.md")
+
+        block_bytes = int(BLOCK_SECONDS * sample_rate) * 2
+        finished = False
+        try:
+            pending = b''
+            while True:
+                data = proc.stdout.read(block_bytes)
+                if not data:
+                    break
+                data = pending + data
+                usable = len(data) - len(data) % 2
+                pending = data[usable:]
+                yield np.frombuffer(data[:usable], dtype=np.int16)
+            finished = True
+            if proc.wait() != 0:
+                errors.seek(0)
+                raise RuntimeError(errors.read().decode(errors='replace') or "FFmpeg failed")
+        finally:
+            # Stopped early (window list done, or an error downstream)
+            if not finished and proc.poll() is None:
+                proc.kill()
+            proc.wait()
+            proc.stdout.close()
+            errors.close()
+
+
+def default_decoders() -> List[Decoder]:
+    """Decoders in the order they are tried (DECODER_BACKEND=ffmpeg skips the in-process one)"""
+    if Config.DECODER_BACKEND == 'ffmpeg':
+        return [FFmpegDecoder()]
+    return [SoundfileDecoder(), FFmpegDecoder()]
@@ -0,0 +1,283 @@
+"""Local spectral-peak fingerprints for spotting audio we have already recognized"""
+
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import librosa
+import numpy as np
+from scipy.ndimage import maximum_filter
+
+N_FFT = 2048
+HOP = 512
+MAX_BIN = 512  # ~5.5 kHz at 22.05 kHz - bass, chords and leads, not hats
+PEAK_NEIGHBOURHOOD = (21, 11)  # (bins, frames) a peak must dominate
+PEAKS_PER_SECOND = 30
+FAN_OUT = 5  # Pairs per anchor peak
+MAX_DT = 63  # Frames between the peaks of a pair (6 bits)
+
+
+def spectral_peaks(samples: np.ndarray, sample_rate: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Constellation of a clip: the strongest local maxima of its spectrogram
+
+    Returns:
+        (frame index, frequency bin) of each peak, sorted by frame
+    """
+    y = samples.astype(np.float32) / 32768.0 if samples.dtype == np.int16 else samples.astype(np.float32)
+    if len(y) < N_FFT:
+        return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32)
+    magnitude = np.abs(librosa.stft(y, n_fft=N_FFT, hop_length=HOP, center=False))[:MAX_BIN]
+    log_mag = np.log(magnitude + 1e-6)
+
+    is_peak = (log_mag == maximum_filter(log_mag, size=PEAK_NEIGHBOURHOOD, mode='constant', cval=-np.inf))
+    is_peak &= log_mag > np.median(log_mag) + 1.0
+    bins, frames = np.nonzero(is_peak)
+    strength = log_mag[bins, frames]
+
+    # Keep the strongest peaks so density doesn't depend on loudness
+    budget = max(1, int(PEAKS_PER_SECOND * len(y) / sample_rate))
+    if len(strength) > budget:
+        keep = np.argpartition(strength, -budget)[-budget:]
+        bins, frames = bins[keep], frames[keep]
+    order = np.lexsort((bins, frames))
+    return frames[order].astype(np.int32), bins[order].astype(np.int32)
+
+
+def peak_pair_hashes(frames: np.ndarray, bins: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Hash each peak with the next FAN_OUT peaks after it
+
+    A hash packs (anchor bin, target bin, frame gap) into 24 bits. It only
+    depends on relative timing, so the same audio gives the same hashes
+    wherever it sits in a clip; the anchor frame says where.
+
+    Returns:
+        (uint32 hashes, int32 anchor frames)
+    """
+    hashes, anchors = [], []
+    for k in range(1, FAN_OUT + 1):
+        dt = frames[k:] - frames[:-k]
+        valid = (dt >= 1) & (dt <= MAX_DT)
+        anchor_bins, target_bins = bins[:-k][valid], bins[k:][valid]
+        hashes.append((anchor_bins.astype(np.uint32) << 15) | (target_bins.astype(np.uint32) << 6) | dt[valid].astype(np.uint32))
+        anchors.append(frames[:-k][valid])
+    if not hashes:
+        return np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.int32)
+    return np.concatenate(hashes), np.concatenate(anchors).astype(np.int32)
+
+
+def fingerprint(samples: np.ndarray, sample_rate: int) -> Tuple[np.ndarray, np.ndarray]:
+    """(hashes, anchor frames) of a clip - see spectral_peaks() and peak_pair_hashes()"""
+    return peak_pair_hashes(*spectral_peaks(samples, sample_rate))
+
+
+def stretch_peaks(frames: np.ndarray, bins: np.ndarray, factor: float, pitch: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Peaks of a clip played `factor` times faster, mapped back to normal speed
+
+    Sped up, every peak comes `factor` times sooner and - unless the DJ
+    used key lock - sits `factor` times higher. Undoing that before hashing
+    lets a pitched clip's hashes meet those of the original recording.
+
+    Args:
+        frames: Peak frames (spectral_peaks())
+        bins: Peak frequency bins
+        factor: Playback speed of the clip relative to the original
+        pitch: Whether pitch moved with tempo (False = key lock / time-stretch)
+
+    Returns:
+        (frame index, frequency bin) of each peak, sorted by frame
+    """
+    frames = np.round(frames * factor).astype(np.int32)
+    if pitch:
+        bins = np.round(bins / factor).astype(np.int32)
+    keep = bins < MAX_BIN
+    frames, bins = frames[keep], bins[keep]
+    order = np.lexsort((bins, frames))
+    return frames[order], bins[order]
+
+
+def best_alignment(query_frames: np.ndarray, ref_ids: np.ndarray, ref_frames: np.ndarray) -> Optional[Tuple[int, int, np.ndarray]]:
+    """
+    Offset-histogram vote over hash hits
+
+    Every hit (a query hash found in a reference) votes for its reference
+    and the time offset between the two. Real matches pile up on one
+    offset; chance hits scatter. Votes one frame either side count too.
+
+    Args:
+        query_frames: Query anchor frame of each hit
+        ref_ids: Reference id of each hit
+        ref_frames: Reference anchor frame of each hit
+
+    Returns:
+        (reference id, offset in frames, query frames of the agreeing hits), or None without hits
+    """
+    if len(query_frames) == 0:
+        return None
+    offsets = ref_frames.astype(np.int64) - query_frames
+    span = int(offsets.max() - offsets.min()) + 3
+    keys = ref_ids.astype(np.int64) * span + (offsets - offsets.min() + 1)
+    unique, counts = np.unique(keys, return_counts=True)
+    # Smooth by +/- one frame (neighbouring keys of the same reference)
+    smoothed = counts.copy()
+    for shift in (-1, 1):
+        position = np.searchsorted(unique, unique + shift)
+        found = (position < len(unique)) & (unique[np.minimum(position, len(unique) - 1)] == unique + shift)
+        smoothed[found] += counts[position[found]]
+    best = unique[np.argmax(smoothed)]
+    ref_id, offset_key = divmod(int(best), span)
+    agree = (ref_ids == ref_id) & (np.abs(offsets - offsets.min() + 1 - offset_key) <= 1)
+    return ref_id, int(offset_key - 1 + offsets.min()), query_frames[agree]
+
+
+def best_scaled_alignment(query_frames: np.ndarray, ref_ids: np.ndarray, ref_frames: np.ndarray,
+                          scales: Sequence[float]) -> Optional[Tuple[int, int, np.ndarray, float]]:
+    """
+    best_alignment() with the query's time axis scaled by each of `scales`
+
+    Hashes still match when a clip's speed is a little off, but the offsets
+    of their hits drift apart along the clip. Scaling the query frames
+    (about the middle of the clip) by the right factor lines them up again.
+
+    Returns:
+        (reference id, offset in frames, agreeing query frames, scale), or None without hits
+    """
+    if len(query_frames) == 0:
+        return None
+    centre = float(np.median(query_frames))
+    best = None
+    for scale in scales:
+        scaled = np.round((query_frames - centre) * scale + centre).astype(np.int64)
+        match = best_alignment(scaled, ref_ids, ref_frames)
+        if best is None or len(match[2]) > len(best[2]):
+            best = (*match, float(scale))
+    return best
+
+
+def runner_up_votes(query_frames: np.ndarray, ref_ids: np.ndarray, ref_frames: np.ndarray, agreeing: np.ndarray,
+                    same: np.ndarray) -> int:
+    """
+    Aligned votes of the best competing reference over the part of the clip a match covers
+
+    Shared drums and loops give unrelated references some aligned votes
+    too; a real match stands well clear of them. Hits outside the span of
+    the match's agreeing frames don't compete (in a mix, that is the
+    previous or next track).
+
+    Args:
+        query_frames, ref_ids, ref_frames: All hits, as passed to best_alignment()
+        agreeing: Query frames of the match's agreeing hits
+        same: Mask of hits that belong to the matched reference
+    """
+    if len(agreeing) == 0:
+        return 0
+    other = ~same & (query_frames >= agreeing.min()) & (query_frames <= agreeing.max())
+    runner_up = best_alignment(query_frames[other], ref_ids[other], ref_frames[other])
+    return 0 if runner_up is None else len(runner_up[2])
+
+
+def sample_hashes(hashes: np.ndarray, frames: np.ndarray, keep_one_in: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    A fixed pseudo-random 1/keep_one_in of a fingerprint's hashes
+
+    The choice depends only on the hash value, so two fingerprints of the
+    same audio keep the same hashes and still line up - with fewer votes.
+    """
+    if keep_one_in <= 1:
+        return hashes, frames
+    mixed = (hashes.astype(np.uint64) * np.uint64(2654435761)) & np.uint64(0xFFFFFFFF)
+    keep = (mixed >> np.uint64(16)) % np.uint64(keep_one_in) == 0
+    return hashes[keep], frames[keep]
+
+
+def coverage(frames: np.ndarray, sample_rate: int, duration: float) -> float:
+    """Share of the clip's seconds that contain at least one of the given anchor frames"""
+    seconds = max(1, int(np.ceil(duration)))
+    hit = np.unique(np.minimum((frames * HOP / sample_rate).astype(np.int64), seconds - 1))
+    return len(hit) / seconds
+
+
+class RepeatIndex:
+    """
+    In-memory inverted index of the segments recognized so far in one mix
+
+    A mix keeps returning to the same audio: overlapping windows, and loops
+    that run for minutes inside a track. Each recognized segment's peak-pair
+    hashes are indexed; a new segment whose hashes line up with one of them
+    (same offset) over most of its length reuses that segment's result
+    instead of going to the APIs. Requiring coverage of most of the clip,
+    not just many votes, keeps the shared tail of an overlapping window
+    (which may be followed by the next track) from counting as a repeat.
+    """
+
+    def __init__(self, min_votes: int = 20, min_coverage: float = 0.6):
+        """
+        Args:
+            min_votes: Aligned hash hits needed for a match
+            min_coverage: Share of the query's seconds the aligned hits must cover
+        """
+        self.min_votes = min_votes
+        self.min_coverage = min_coverage
+        self._postings: Dict[int, List[Tuple[int, int]]] = {}
+        self._results: List[Any] = []
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    def add(self, fp: Tuple[np.ndarray, np.ndarray], result: Any) -> int:
+        """
+        Index a recognized segment
+
+        Args:
+            fp: fingerprint() of the segment's audio
+            result: What a later repeat of this audio reuses
+
+        Returns:
+            Reference id of the segment
+        """
+        hashes, frames = fp
+        with self._lock:
+            ref_id = len(self._results)
+            self._results.append(result)
+            for h, frame in zip(hashes.tolist(), frames.tolist()):
+                self._postings.setdefault(h, []).append((ref_id, frame))
+        return ref_id
+
+    def lookup(self, fp: Tuple[np.ndarray, np.ndarray], duration: float, sample_rate: int) -> Optional[Any]:
+        """
+        Result of an indexed segment this one repeats, or None
+
+        Args:
+            fp: fingerprint() of the segment's audio
+            duration: Seconds of audio fingerprinted
+            sample_rate: Sample rate it was fingerprinted at
+        """
+        hashes, frames = fp
+        query_frames, ref_ids, ref_frames = [], [], []
+        with self._lock:
+            for h, frame in zip(hashes.tolist(), frames.tolist()):
+                for ref_id, ref_frame in self._postings.get(h, ()):
+                    query_frames.append(frame)
+                    ref_ids.append(ref_id)
+                    ref_frames.append(ref_frame)
+
+        match = best_alignment(np.array(query_frames, dtype=np.int64), np.array(ref_ids, dtype=np.int64),
+                               np.array(ref_frames, dtype=np.int64))
+        if match is not None:
+            ref_id, _, agreeing = match
+            if len(agreeing) >= self.min_votes and coverage(agreeing, sample_rate, duration) >= self.min_coverage:
+                with self._lock:
+                    self.hits += 1
+                    return self._results[ref_id]
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def stats(self) -> Dict[str, int]:
+        """Segments indexed, and lookups that did / didn't find a repeat"""
+        with self._lock:
+            return {'indexed': len(self._results), 'hits': self.hits, 'misses': self.misses}
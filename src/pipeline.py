@@ -0,0 +1,577 @@
+"""Segment processing pipeline shared by the CLI and the web app"""
+
+import asyncio
+import threading
+from dataclasses import asdict
+from concurrent.futures import ThreadPoolExecutor, wait, as_completed, FIRST_COMPLETED
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .recognizers.base import AudioInput, BaseRecognizer, RecognitionResult
+from .scheduler import ProviderScheduler
+from .utils.config import Config
+from .utils.fingerprint_cache import FingerprintCache, get_fingerprint_cache
+
+# process(index, start_time, end_time) -> per-segment result
+SegmentFn = Callable[[int, float, float], Any]
+# async process(index, start_time, end_time) for the asyncio engine
+AsyncSegmentFn = Callable[[int, float, float], Awaitable[Any]]
+# on_complete(index, result), called from the calling thread as segments finish
+CompleteFn = Callable[[int, Any], None]
+# on_error(recognizer, exception) for provider calls that raised
+ErrorFn = Callable[[BaseRecognizer, Exception], None]
+
+PROVIDER_MODES = ('sequential', 'fanout')
+PIPELINE_ENGINES = ('threads', 'asyncio')
+SAMPLING_MODES = ('all', 'adaptive')
+# What happens to windows screened as low-information (see AudioProcessor.screen_segments)
+SCREEN_POLICIES = ('off', 'skip', 'defer')
+
+_fanout_executor: Optional[ThreadPoolExecutor] = None
+_fanout_lock = threading.Lock()
+
+
+def run_segments(segments: Sequence[Tuple[float, float]], process: SegmentFn, workers: int = 1,
+                 on_complete: Optional[CompleteFn] = None) -> List[Any]:
+    """
+    Run process() over every segment with at most `workers` segments in flight
+
+    Recognition is almost entirely waiting on HTTP, so a small thread pool
+    keeps several segments in flight. Segments are submitted lazily, which
+    keeps memory bounded by the number of workers rather than the mix length.
+
+    Args:
+        segments: (start_time, end_time) windows
+        process: Called for each segment; should handle its own errors
+        workers: Maximum concurrent segments (1 = sequential)
+        on_complete: Progress callback, invoked as each segment finishes
+            (out of order when workers > 1)
+
+    Returns:
+        Results in segment order, regardless of completion order
+    """
+    results: List[Any] = [None] * len(segments)
+
+    if workers <= 1:
+        for index, (start_time, end_time) in enumerate(segments):
+            results[index] = process(index, start_time, end_time)
+            if on_complete:
+                on_complete(index, results[index])
+        return results
+
+    pending = {}
+    queue = iter(enumerate(segments))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='segment') as executor:
+        def submit_next() -> bool:
+            item = next(queue, None)
+            if item is None:
+                return False
+            index, (start_time, end_time) = item
+            pending[executor.submit(process, index, start_time, end_time)] = index
+            return True
+
+        for _ in range(workers):
+            if not submit_next():
+                break
+
+        try:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = pending.pop(future)
+                    results[index] = future.result()
+                    if on_complete:
+                        on_complete(index, results[index])
+                    submit_next()
+        except BaseException:
+            # Don't start queued segments after an error or Ctrl-C
+            for future in pending:
+                future.cancel()
+            raise
+
+    return results
+
+
+async def run_segments_async(segments: Sequence[Tuple[float, float]], process: AsyncSegmentFn, concurrency: int = 64,
+                             on_complete: Optional[CompleteFn] = None) -> List[Any]:
+    """
+    Async run_segments(): at most `concurrency` segments in flight on one event loop
+
+    Tasks are created lazily as earlier ones finish, so memory stays bounded
+    by the concurrency rather than the mix length.
+
+    Returns:
+        Results in segment order, regardless of completion order
+    """
+    results: List[Any] = [None] * len(segments)
+    pending = {}
+    queue = iter(enumerate(segments))
+
+    def submit_next() -> bool:
+        item = next(queue, None)
+        if item is None:
+            return False
+        index, (start_time, end_time) = item
+        pending[asyncio.ensure_future(process(index, start_time, end_time))] = index
+        return True
+
+    for _ in range(max(1, concurrency)):
+        if not submit_next():
+            break
+
+    try:
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                index = pending.pop(task)
+                results[index] = task.result()
+                if on_complete:
+                    on_complete(index, results[index])
+                submit_next()
+    except BaseException:
+        for task in pending:
+            task.cancel()
+        raise
+
+    return results
+
+
+def run_segments_asyncio(segments: Sequence[Tuple[float, float]], process: AsyncSegmentFn, concurrency: int = 64,
+                         on_complete: Optional[CompleteFn] = None) -> List[Any]:
+    """Run run_segments_async() on a new event loop (from sync code, e.g. the CLI or a Flask view)"""
+    from .utils.http_client import close_async_session
+
+    async def main():
+        try:
+            return await run_segments_async(segments, process, concurrency, on_complete)
+        finally:
+            await close_async_session()
+
+    return asyncio.run(main())
+
+
+def run_segments_adaptive(segments: Sequence[Tuple[float, float]], process, stride: int = 4, workers: int = 1,
+                          on_complete: Optional[CompleteFn] = None, identity: Optional[Callable[[Any], Any]] = None,
+                          infer: Optional[Callable[[Any, float, float], Any]] = None,
+                          engine: str = 'threads') -> Tuple[List[Any], int]:
+    """
+    Run process() on a coarse subset of segments and infer the rest
+
+    A track in a DJ mix spans many overlapping windows. Windows 0, k, 2k, ...
+    and the last one are queried first. Wherever two queried windows name the
+    same track, the windows between them are inferred as that track; wherever
+    the identity changes (or either side found nothing) the gap is bisected
+    and queried again, down to neighbouring windows. Track boundaries thus
+    keep single-window resolution while most windows inside a track are
+    never sent to a provider. Each round of queries runs in parallel.
+
+    Args:
+        segments: (start_time, end_time) windows
+        process: Per-segment function for the chosen engine (async for asyncio)
+        stride: Initial spacing k between queried windows (1 = query all)
+        workers: Segments in flight per round
+        on_complete: Called for every segment, queried or inferred
+        identity: Maps a result to a comparable track identity (None = no track);
+            defaults to track_identity() on merge_results() dicts
+        infer: Builds the result of an inferred window from its left neighbour's
+            result and the window's (start_time, end_time); defaults to infer_track()
+        engine: 'threads' or 'asyncio'
+
+    Returns:
+        (results in segment order, number of segments actually processed)
+    """
+    from .utils.track_utils import track_identity, infer_track
+    identity = identity or track_identity
+    infer = infer or infer_track
+
+    results: List[Any] = [None] * len(segments)
+    queried = set()
+
+    def query(indices: List[int]):
+        indices = [i for i in indices if i not in queried]
+        if not indices:
+            return
+        queried.update(indices)
+        batch = [segments[i] for i in indices]
+
+        def done(position: int, result: Any):
+            results[indices[position]] = result
+            if on_complete:
+                on_complete(indices[position], result)
+
+        if engine == 'asyncio':
+            async def run_one(position, start_time, end_time):
+                return await process(indices[position], start_time, end_time)
+            run_segments_asyncio(batch, run_one, concurrency=workers, on_complete=done)
+        else:
+            run_segments(batch, lambda position, start_time, end_time: process(indices[position], start_time, end_time),
+                         workers=workers, on_complete=done)
+
+    if not segments:
+        return results, 0
+
+    stride = max(1, stride)
+    anchors = sorted(set(range(0, len(segments), stride)) | {len(segments) - 1})
+    query(anchors)
+
+    gaps = list(zip(anchors, anchors[1:]))
+    while gaps:
+        split, midpoints = [], []
+        for left, right in gaps:
+            if right - left <= 1:
+                continue
+            track = identity(results[left])
+            if track is not None and track == identity(results[right]):
+                # Same track on both sides - everything in between is that track
+                for index in range(left + 1, right):
+                    results[index] = infer(results[left], *segments[index])
+                    if on_complete:
+                        on_complete(index, results[index])
+                continue
+            middle = (left + right) // 2
+            midpoints.append(middle)
+            split += [(left, middle), (middle, right)]
+        query(midpoints)
+        gaps = split
+
+    return results, len(queried)
+
+
+def run_segments_screened(segments: Sequence[Tuple[float, float]], process, screen: Sequence[Optional[str]],
+                          policy: str = 'skip', sampling: str = 'all', stride: int = 4, workers: int = 1,
+                          on_complete: Optional[CompleteFn] = None, identity: Optional[Callable[[Any], Any]] = None,
+                          infer: Optional[Callable[[Any, float, float], Any]] = None, skipped: Any = None,
+                          engine: str = 'threads', reused: Optional[Callable[[Any], bool]] = None
+                          ) -> Tuple[List[Any], Dict[str, int]]:
+    """
+    Run the informative segments first; skip or defer the low-information ones
+
+    Windows flagged by the screen (silence, noise, beatless ambience) almost
+    never match. With 'skip' they are never sent. With 'defer' they wait
+    until every other window is done: one between two windows that found the
+    same track is inferred as that track (a breakdown inside it), the others
+    are queried last; silent windows are always skipped. 'off' runs every
+    window. Informative windows are run with the chosen sampling mode.
+
+    Args:
+        segments: (start_time, end_time) windows
+        process: Per-segment function for the chosen engine (async for asyncio)
+        screen: Per segment, None or the reason it is low-information
+        policy: One of SCREEN_POLICIES
+        sampling: One of SAMPLING_MODES, for the informative windows
+        stride: Adaptive sampling stride
+        workers: Segments in flight
+        on_complete: Called for every segment, queried, inferred or skipped
+        identity: As in run_segments_adaptive()
+        infer: As in run_segments_adaptive()
+        skipped: Result recorded for a skipped window
+        engine: 'threads' or 'asyncio'
+        reused: Whether a processed window's result was found without an API
+            call (repeat index, caches); defaults to track_reused() on
+            merge_results() dicts
+
+    Returns:
+        (results in segment order, counts of 'queried', 'reused', 'inferred',
+        'skipped' and 'low_info' segments)
+    """
+    from .utils.track_utils import track_identity, infer_track, track_reused
+    identity = identity or track_identity
+    infer = infer or infer_track
+    reused = reused or track_reused
+
+    results: List[Any] = [None] * len(segments)
+    counts = {'queried': 0, 'reused': 0, 'inferred': 0, 'skipped': 0, 'low_info': 0}
+    counts_lock = threading.Lock()
+
+    # Each outcome is counted where it happens: processed windows as they
+    # return (worker threads), inferred ones when their result is built
+    def processed(result: Any) -> Any:
+        with counts_lock:
+            counts['reused' if reused(result) else 'queried'] += 1
+        return result
+
+    def inferred(result: Any, start_time: float, end_time: float) -> Any:
+        counts['inferred'] += 1
+        return infer(result, start_time, end_time)
+
+    def finish(index: int, result: Any):
+        results[index] = result
+        if on_complete:
+            on_complete(index, result)
+
+    def run(indices: List[int], adaptive: bool):
+        if not indices:
+            return
+        batch = [segments[i] for i in indices]
+        done = lambda position, result: finish(indices[position], result)
+        if engine == 'asyncio':
+            async def run_one(position, start_time, end_time):
+                return processed(await process(indices[position], start_time, end_time))
+            run_batch = run_one
+        else:
+            run_batch = lambda position, start_time, end_time: processed(process(indices[position], start_time, end_time))
+
+        if adaptive:
+            run_segments_adaptive(batch, run_batch, stride=stride, workers=workers, on_complete=done,
+                                  identity=identity, infer=inferred, engine=engine)
+        elif engine == 'asyncio':
+            run_segments_asyncio(batch, run_batch, concurrency=workers, on_complete=done)
+        else:
+            run_segments(batch, run_batch, workers=workers, on_complete=done)
+
+    low_info = [i for i, reason in enumerate(screen) if reason] if policy != 'off' else []
+    counts['low_info'] = len(low_info)
+    flagged = set(low_info)
+    run([i for i in range(len(segments)) if i not in flagged], adaptive=sampling == 'adaptive')
+
+    deferred = []
+    for index in low_info:
+        if policy == 'skip' or screen[index] == 'silence':
+            finish(index, skipped)
+            counts['skipped'] += 1
+            continue
+        left = next((i for i in range(index - 1, -1, -1) if i not in flagged), None)
+        right = next((i for i in range(index + 1, len(segments)) if i not in flagged), None)
+        track = identity(results[left]) if left is not None else None
+        if track is not None and right is not None and track == identity(results[right]):
+            finish(index, inferred(results[left], *segments[index]))
+        else:
+            deferred.append(index)
+    run(deferred, adaptive=False)
+    return results, counts
+
+
+def _get_fanout_executor() -> ThreadPoolExecutor:
+    """Pool for provider calls, separate from the segment pool so they can't deadlock"""
+    global _fanout_executor
+    with _fanout_lock:
+        if _fanout_executor is None:
+            _fanout_executor = ThreadPoolExecutor(max_workers=Config.FANOUT_THREADS, thread_name_prefix='provider')
+        return _fanout_executor
+
+
+def recognize_segment(recognizers: Sequence[BaseRecognizer], audio: AudioInput, start_time: float, duration: float,
+                      confidence_threshold: float, mode: str = 'sequential',
+                      on_error: Optional[ErrorFn] = None,
+                      scheduler: Optional[ProviderScheduler] = None) -> List[RecognitionResult]:
+    """
+    Ask providers about one segment until one answer clears the threshold
+
+    sequential: call providers in order, each only if the previous ones came
+        back empty or below the threshold (fewest API calls - saves quota)
+    fanout: call all providers at once and return as soon as one answer
+        clears the threshold; calls not yet started are cancelled and the
+        answers of those still running are ignored (lowest latency)
+
+    Offline recognizers (BaseRecognizer.offline) are asked first in either
+    mode; an accepted local answer means no API is called at all. Before
+    either, a decoded segment is looked up in the fingerprint cache, which
+    remembers accepted API answers across mixes and processes.
+
+    Args:
+        recognizers: Providers in default priority order
+        audio: Segment audio shared by every provider
+        start_time: Segment start in seconds
+        duration: Segment duration in seconds
+        confidence_threshold: Confidence at which an answer is accepted
+        mode: 'sequential' or 'fanout'
+        on_error: Called for provider calls that raised
+        scheduler: Reorders providers by learned expected cost for this
+            segment; None keeps the given order
+
+    Returns:
+        Results collected, accepted answer first
+    """
+    # Answered before, in this or any earlier mix, for audio that lines up with this segment
+    cache = _fingerprint_cache_for(audio)
+    if cache is not None:
+        fp = audio.fingerprint()
+        cached = cache.get(fp, audio.duration, audio.sample_rate)
+        if cached is not None:
+            return [_cached_result(cached)]
+    results = _ask_providers(recognizers, audio, start_time, duration, confidence_threshold, mode, on_error, scheduler)
+    if cache is not None:
+        answer = _cacheable_answer(results, recognizers, confidence_threshold)
+        if answer is not None:
+            cache.put(fp, asdict(answer))
+    return results
+
+
+def _ask_providers(recognizers: Sequence[BaseRecognizer], audio: AudioInput, start_time: float, duration: float,
+                   confidence_threshold: float, mode: str, on_error: Optional[ErrorFn],
+                   scheduler: Optional[ProviderScheduler]) -> List[RecognitionResult]:
+    """recognize_segment() without the fingerprint cache"""
+    available = [r for r in recognizers if r.is_available()]
+    if scheduler is not None:
+        available = scheduler.order(available)
+    # Offline recognizers (local library) are free: ask them first, on their own
+    offline = [r for r in available if r.offline]
+    available = [r for r in available if not r.offline]
+    results: List[RecognitionResult] = []
+    for recognizer in offline:
+        try:
+            result = recognizer.recognize(audio, start_time, duration, confidence_threshold)
+        except Exception as e:
+            if on_error:
+                on_error(recognizer, e)
+            continue
+        if result and result.confidence >= confidence_threshold:
+            return [result]
+        if result:
+            results.append(result)
+
+    if mode == 'fanout' and len(available) > 1:
+        executor = _get_fanout_executor()
+        futures = {executor.submit(r.recognize, audio, start_time, duration, confidence_threshold): r for r in available}
+        try:
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    if on_error:
+                        on_error(futures[future], e)
+                    continue
+                if not result:
+                    continue
+                if result.confidence >= confidence_threshold:
+                    results.insert(0, result)
+                    break
+                results.append(result)
+        finally:
+            for future in futures:
+                future.cancel()
+        return results
+
+    for recognizer in available:
+        try:
+            result = recognizer.recognize(audio, start_time, duration, confidence_threshold)
+        except Exception as e:
+            if on_error:
+                on_error(recognizer, e)
+            continue
+        if not result:
+            continue
+        # Earlier weak answers (e.g. the local library) stay behind the accepted one
+        if result.confidence >= confidence_threshold:
+            results.insert(0, result)
+            break
+        results.append(result)
+    return results
+
+
+async def recognize_segment_async(recognizers: Sequence[BaseRecognizer], audio: AudioInput, start_time: float,
+                                  duration: float, confidence_threshold: float, mode: str = 'sequential',
+                                  on_error: Optional[ErrorFn] = None,
+                                  scheduler: Optional[ProviderScheduler] = None) -> List[RecognitionResult]:
+    """
+    Async recognize_segment(); in fanout mode the losing requests are cancelled
+
+    Returns:
+        Results collected, accepted answer first
+    """
+    cache = _fingerprint_cache_for(audio)
+    if cache is not None:
+        # Fingerprinting and SQLite stay off the event loop
+        fp = await asyncio.to_thread(audio.fingerprint)
+        cached = await asyncio.to_thread(cache.get, fp, audio.duration, audio.sample_rate)
+        if cached is not None:
+            return [_cached_result(cached)]
+    results = await _ask_providers_async(recognizers, audio, start_time, duration, confidence_threshold, mode,
+                                         on_error, scheduler)
+    if cache is not None:
+        answer = _cacheable_answer(results, recognizers, confidence_threshold)
+        if answer is not None:
+            await asyncio.to_thread(cache.put, fp, asdict(answer))
+    return results
+
+
+async def _ask_providers_async(recognizers: Sequence[BaseRecognizer], audio: AudioInput, start_time: float,
+                               duration: float, confidence_threshold: float, mode: str, on_error: Optional[ErrorFn],
+                               scheduler: Optional[ProviderScheduler]) -> List[RecognitionResult]:
+    """recognize_segment_async() without the fingerprint cache"""
+    available = [r for r in recognizers if r.is_available()]
+    if scheduler is not None:
+        available = scheduler.order(available)
+    offline = [r for r in available if r.offline]
+    available = [r for r in available if not r.offline]
+    results: List[RecognitionResult] = []
+    for recognizer in offline:
+        try:
+            result = await recognizer.recognize_async(audio, start_time, duration, confidence_threshold)
+        except Exception as e:
+            if on_error:
+                on_error(recognizer, e)
+            continue
+        if result and result.confidence >= confidence_threshold:
+            return [result]
+        if result:
+            results.append(result)
+
+    if mode == 'fanout' and len(available) > 1:
+        tasks = {asyncio.ensure_future(r.recognize_async(audio, start_time, duration, confidence_threshold)): r for r in available}
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        if on_error:
+                            on_error(tasks[task], task.exception())
+                        continue
+                    result = task.result()
+                    if not result:
+                        continue
+                    if result.confidence >= confidence_threshold:
+                        results.insert(0, result)
+                        return results
+                    results.append(result)
+        finally:
+            for task in pending:
+                task.cancel()
+        return results
+
+    for recognizer in available:
+        try:
+            result = await recognizer.recognize_async(audio, start_time, duration, confidence_threshold)
+        except Exception as e:
+            if on_error:
+                on_error(recognizer, e)
+            continue
+        if not result:
+            continue
+        # Earlier weak answers (e.g. the local library) stay behind the accepted one
+        if result.confidence >= confidence_threshold:
+            results.insert(0, result)
+            break
+        results.append(result)
+    return results
+
+
+def _fingerprint_cache_for(audio: AudioInput) -> Optional[FingerprintCache]:
+    """The fingerprint cache, if enabled and the segment is decoded samples (not a path or encoded bytes)"""
+    if not hasattr(audio, 'fingerprint'):
+        return None
+    return get_fingerprint_cache()
+
+
+def _cached_result(cached: Dict[str, Any]) -> RecognitionResult:
+    """RecognitionResult rebuilt from a fingerprint cache entry, marked as such"""
+    metadata = dict(cached.get('metadata') or {})
+    metadata['fingerprint_cache'] = True
+    return RecognitionResult(**{**cached, 'metadata': metadata})
+
+
+def _cacheable_answer(results: List[RecognitionResult], recognizers: Sequence[BaseRecognizer],
+                      confidence_threshold: float) -> Optional[RecognitionResult]:
+    """
+    Accepted API answer worth remembering across mixes, or None
+
+    Local-library answers are not stored: the index already answers those
+    for free, and it would keep answering after a track leaves the library.
+    """
+    if not results or results[0].confidence < confidence_threshold:
+        return None
+    offline = {r.name for r in recognizers if r.offline}
+    answer = results[0]
+    if answer.source in offline or not (answer.artist or answer.title):
+        return None
+    return answer
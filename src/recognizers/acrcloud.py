@@ -1,19 +1,27 @@
 """ACRCloud API integration"""
 
-import os
 import time
 import hmac
+import asyncio
 import hashlib
 import base64
+import threading
 import requests
-from typing import Optional
-from .base import BaseRecognizer, RecognitionResult
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout, as_completed
+from typing import Any, Dict, List, Optional
+from .base import HTTPRecognizer, RecognitionResult, RecognizerError, EncodedAudio
 from ..utils.config import Config
+from ..utils import http_client
+from ..utils.rate_limit import RateLimitedError
 
 
-class ACRCloudRecognizer(BaseRecognizer):
+class ACRCloudRecognizer(HTTPRecognizer):
     """ACRCloud API recognizer"""
     
+    name = "acrcloud"
+    display_name = "ACRCloud"
+    
     # ACRCloud uses region-specific endpoints
     # Common regions: us-west-2, eu-west-1, ap-southeast-1
     # Try multiple regions if one fails
@@ -25,9 +33,21 @@ class ACRCloudRecognizer(BaseRecognizer):
     ]
     API_URL = f"https://identify-{API_REGIONS[0]}.acrcloud.com/v1/identify"
     
+    # Region that last worked for our keys, shared by every instance in the
+    # process. Cleared on failure so the next call probes all regions again.
+    _pinned_region: Optional[str] = None
+    _region_lock = threading.Lock()
+    # Recent successful request latencies (seconds) used for the hedge delay
+    _latencies: deque = deque(maxlen=200)
+    _hedge_executor: Optional[ThreadPoolExecutor] = None
+    
     def __init__(self):
         self.access_key = Config.ACRCLOUD_ACCESS_KEY
         self.secret_key = Config.ACRCLOUD_SECRET_KEY
+        self.upload_codec = Config.ACRCLOUD_UPLOAD_CODEC
+        self.rate_limit = Config.ACRCLOUD_RATE_LIMIT
+        self.rate_burst = Config.ACRCLOUD_RATE_BURST
+        self.hedge = Config.ACRCLOUD_HEDGE
     
     def is_available(self) -> bool:
         """Check if ACRCloud API is configured"""
@@ -42,116 +62,280 @@ class ACRCloudRecognizer(BaseRecognizer):
         ).decode('utf-8')
         return sign
     
-    def recognize(self, audio_file_path: str, start_time: float = 0.0, duration: float = 30.0) -> Optional[RecognitionResult]:
+    @classmethod
+    def _region_order(cls) -> List[str]:
+        """Regions to try, pinned (or configured) region first"""
+        preferred = cls._pinned_region or Config.ACRCLOUD_REGION
+        if preferred:
+            return [preferred] + [r for r in cls.API_REGIONS if r != preferred]
+        return list(cls.API_REGIONS)
+    
+    @classmethod
+    def _pin(cls, region: str):
+        with cls._region_lock:
+            if cls._pinned_region != region:
+                print(f"[ACRCloud] Pinning region {region}")
+                cls._pinned_region = region
+    
+    @classmethod
+    def _unpin(cls, region: str):
+        with cls._region_lock:
+            if cls._pinned_region == region:
+                print(f"[ACRCloud] Region {region} failed, will re-probe regions")
+                cls._pinned_region = None
+    
+    def _check_region_response(self, region: str, response: requests.Response, started: float) -> requests.Response:
+        if response.status_code != 200:
+            print(f"[ACRCloud] ✗ Region {region} HTTP {response.status_code}: {response.text[:300]}")
+        response.raise_for_status()
+        self._latencies.append(time.monotonic() - started)
+        return response
+    
+    def _post_region(self, region: str, files: dict, data: dict) -> requests.Response:
+        """POST to one region; raises on HTTP errors"""
+        started = time.monotonic()
+        response = http_client.post(self._region_url(region), files=files, data=data)
+        return self._check_region_response(region, response, started)
+    
+    async def _post_region_async(self, region: str, files: dict, data: dict) -> requests.Response:
+        """Async _post_region()"""
+        started = time.monotonic()
+        response = await http_client.post_async(self._region_url(region), files=files, data=data)
+        return self._check_region_response(region, response, started)
+    
+    @staticmethod
+    def _region_url(region: str) -> str:
+        return f"https://identify-{region}.acrcloud.com/v1/identify"
+    
+    def _region_failed(self, region: str, error: Exception) -> bool:
         """
-        Recognize a track using ACRCloud API
+        Handle a failed region request
         
-        Args:
-            audio_file_path: Path to the audio file
-            start_time: Start time in seconds (not used for ACRCloud, processes full file)
-            duration: Duration of segment in seconds (not used for ACRCloud)
-            
         Returns:
-            RecognitionResult if track found, None otherwise
+            True to try the next region, False if the error should be raised
+        """
+        if isinstance(error, requests.exceptions.HTTPError):
+            status = error.response.status_code if error.response is not None else None
+            if status is None or status == 404 or status >= 500:
+                self._unpin(region)
+            # 404 = wrong region for these keys; other errors (auth, quota) are final
+            return status == 404
+        self._unpin(region)
+        print(f"[ACRCloud] ✗ Region {region} exception: {str(error)[:200]}")
+        return True
+    
+    def _identify(self, files: dict, data: dict) -> requests.Response:
         """
-        if not self.is_available():
-            return None
+        Send the request, preferring the pinned region
+        
+        Regions are probed in order until one answers; that region is then
+        pinned for the process. 404 means "wrong region for these keys" and
+        moves on; other HTTP errors (auth, quota) are raised immediately.
+        """
+        regions = self._region_order()
+        
+        if self.hedge and self._pinned_region and len(regions) > 1:
+            try:
+                return self._hedged_post(regions[0], regions[1], files, data)
+            except Exception as e:
+                # Same rules as the probe loop: only region errors fail over
+                if not self._region_failed(regions[0], e):
+                    raise
+                regions = self._region_order()
+        
+        last_error = None
+        for region in regions:
+            try:
+                response = self._post_region(region, files, data)
+                self._pin(region)
+                return response
+            except Exception as e:
+                last_error = e
+                if not self._region_failed(region, e):
+                    raise
         
+        # If all regions failed, raise the last error
+        raise last_error or Exception("All API regions failed")
+    
+    async def _identify_async(self, files: dict, data: dict) -> requests.Response:
+        """Async _identify(): same region pinning, failover and hedging"""
+        regions = self._region_order()
+        
+        if self.hedge and self._pinned_region and len(regions) > 1:
+            try:
+                return await self._hedged_post_async(regions[0], regions[1], files, data)
+            except Exception as e:
+                # Same rules as the probe loop: only region errors fail over
+                if not self._region_failed(regions[0], e):
+                    raise
+                regions = self._region_order()
+        
+        last_error = None
+        for region in regions:
+            try:
+                response = await self._post_region_async(region, files, data)
+                self._pin(region)
+                return response
+            except Exception as e:
+                last_error = e
+                if not self._region_failed(region, e):
+                    raise
+        
+        raise last_error or Exception("All API regions failed")
+    
+    def _hedge_delay(self) -> float:
+        """Seconds to wait on the primary region before firing the hedge"""
+        latencies = sorted(self._latencies)
+        if len(latencies) < Config.ACRCLOUD_HEDGE_MIN_SAMPLES:
+            return Config.ACRCLOUD_HEDGE_DELAY
+        index = min(len(latencies) - 1, int(len(latencies) * Config.ACRCLOUD_HEDGE_PERCENTILE / 100.0))
+        return latencies[index]
+    
+    @classmethod
+    def _get_hedge_executor(cls) -> ThreadPoolExecutor:
+        with cls._region_lock:
+            if cls._hedge_executor is None:
+                cls._hedge_executor = ThreadPoolExecutor(max_workers=Config.HTTP_POOL_MAXSIZE, thread_name_prefix='acrcloud-hedge')
+            return cls._hedge_executor
+    
+    def _hedged_post(self, primary: str, secondary: str, files: dict, data: dict) -> requests.Response:
+        """
+        Send to the primary region and, if it is slower than the latency
+        percentile, also to the secondary; the first successful answer wins
+        """
+        executor = self._get_hedge_executor()
+        first = executor.submit(self._post_region, primary, files, data)
         try:
-            # Read audio file
-            with open(audio_file_path, 'rb') as f:
-                audio_data = f.read()
-            
-            # Generate signature
-            http_method = "POST"
-            uri = "/v1/identify"
-            data_type = "audio"
-            signature_version = "1"
-            timestamp = str(int(time.time()))
-            signature = self._generate_signature(
-                http_method, uri, self.access_key, self.secret_key, data_type, signature_version
-            )
-            
-            # Prepare request
-            files = {
-                'sample': (os.path.basename(audio_file_path), audio_data, 'audio/mpeg')
-            }
-            data = {
+            return first.result(timeout=self._hedge_delay())
+        except FuturesTimeout:
+            pass
+        
+        print(f"[ACRCloud] Region {primary} slow, hedging with {secondary}")
+        second = executor.submit(self._post_region, secondary, files, data)
+        regions = {first: primary, second: secondary}
+        for future in as_completed(regions):
+            try:
+                response = future.result()
+            except Exception:
+                continue
+            if future is second and first.done() and first.exception() is not None:
+                # The pinned region actually failed - move the pin
+                self._pin(secondary)
+            return response
+        # Both failed: the pinned region's error decides whether to fail over
+        raise first.exception()
+    
+    async def _hedged_post_async(self, primary: str, secondary: str, files: dict, data: dict) -> requests.Response:
+        """Async _hedged_post(); the losing request is cancelled"""
+        first = asyncio.ensure_future(self._post_region_async(primary, files, data))
+        done, _ = await asyncio.wait({first}, timeout=self._hedge_delay())
+        if done:
+            return first.result()
+        
+        print(f"[ACRCloud] Region {primary} slow, hedging with {secondary}")
+        second = asyncio.ensure_future(self._post_region_async(secondary, files, data))
+        pending = {first, second}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        continue
+                    if task is second and first.done() and first.exception() is not None:
+                        self._pin(secondary)
+                    return task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+        raise first.exception()
+    
+    def _build_request(self, sample: EncodedAudio, start_time: float, duration: float) -> Dict[str, Any]:
+        """
+        Signed ACRCloud identify request (start_time and duration are not used)
+        
+        No URL: _send() picks the region.
+        """
+        http_method = "POST"
+        uri = "/v1/identify"
+        data_type = "audio"
+        signature_version = "1"
+        timestamp = str(int(time.time()))
+        signature = self._generate_signature(
+            http_method, uri, self.access_key, self.secret_key, data_type, signature_version
+        )
+        
+        return {
+            'files': {
+                'sample': (sample.filename, sample.data, sample.content_type)
+            },
+            'data': {
                 'access_key': self.access_key,
                 'data_type': data_type,
                 'signature_version': signature_version,
                 'signature': signature,
-                'sample_bytes': str(len(audio_data)),
+                'sample_bytes': str(len(sample.data)),
                 'timestamp': timestamp
             }
+        }
+    
+    def _send(self, request: Dict[str, Any]) -> requests.Response:
+        # Pinned region first, other regions only on failure
+        return self._identify(request['files'], request['data'])
+    
+    async def _send_async(self, request: Dict[str, Any]) -> requests.Response:
+        return await self._identify_async(request['files'], request['data'])
+    
+    def _parse_response(self, response: requests.Response) -> Optional[RecognitionResult]:
+        """
+        Parse an ACRCloud response
+        
+        Returns:
+            RecognitionResult if track found, None if no match (raises on API errors)
+        """
+        result = response.json()
+        print(f"[ACRCloud] Response JSON: {str(result)[:500]}")
+        
+        # Parse response
+        status_code = result.get('status', {}).get('code')
+        print(f"[ACRCloud] Status code: {status_code}")
+        
+        if status_code == 0:
+            metadata = result.get('metadata', {})
+            music = metadata.get('music', [])
             
-            # Make API request - try multiple regions if needed
-            last_error = None
-            response = None
-            for region in self.API_REGIONS:
-                api_url = f"https://identify-{region}.acrcloud.com/v1/identify"
-                try:
-                    print(f"[ACRCloud] Trying region {region}...")
-                    response = requests.post(api_url, files=files, data=data, timeout=30)
-                    print(f"[ACRCloud] Response status: {response.status_code}")
-                    response.raise_for_status()
-                    print(f"[ACRCloud] ✓ Success with region {region}")
-                    break  # Success, exit loop
-                except requests.exceptions.HTTPError as e:
-                    last_error = e
-                    error_text = response.text[:300] if response else "No response"
-                    print(f"[ACRCloud] ✗ Region {region} HTTP {response.status_code if response else 'N/A'}: {error_text}")
-                    if response and response.status_code == 404:
-                        # Try next region
-                        continue
-                    else:
-                        # Other error, raise it
-                        raise
-                except Exception as e:
-                    last_error = e
-                    print(f"[ACRCloud] ✗ Region {region} exception: {str(e)[:200]}")
-                    continue
-            
-            # If all regions failed, raise the last error
-            if not response or response.status_code != 200:
-                raise last_error or Exception("All API regions failed")
-            
-            result = response.json()
-            print(f"[ACRCloud] Response JSON: {str(result)[:500]}")
-            
-            # Parse response
-            status_code = result.get('status', {}).get('code')
-            print(f"[ACRCloud] Status code: {status_code}")
-            
-            if status_code == 0:
-                metadata = result.get('metadata', {})
-                music = metadata.get('music', [])
-                
-                if music and len(music) > 0:
-                    track = music[0]
-                    artist = track.get('artists', [{}])[0].get('name') if track.get('artists') else None
-                    title = track.get('title')
-                    print(f"[ACRCloud] ✓ Found: {artist} - {title}")
-                    return RecognitionResult(
-                        artist=artist,
-                        title=title,
-                        confidence=float(track.get('score', 0)) / 100.0 if track.get('score') else 0.0,
-                        source="acrcloud",
-                        metadata=track
-                    )
-            
-            print(f"[ACRCloud] ✗ No match found. Status code: {status_code}")
-            return None
-            
-        except Exception as e:
-            # Log error but don't raise (allow fallback to other recognizers)
-            import traceback
-            error_msg = str(e)
-            if "404" in error_msg:
-                print(f"ACRCloud error: {error_msg} (endpoint not found)")
-            elif "401" in error_msg or "403" in error_msg:
-                print(f"ACRCloud error: {error_msg} (authentication failed - check API keys)")
-            else:
-                print(f"ACRCloud error: {error_msg}")
-            return None
-
+            if music and len(music) > 0:
+                track = music[0]
+                artist = track.get('artists', [{}])[0].get('name') if track.get('artists') else None
+                title = track.get('title')
+                print(f"[ACRCloud] ✓ Found: {artist} - {title}")
+                return RecognitionResult(
+                    artist=artist,
+                    title=title,
+                    confidence=float(track.get('score', 0)) / 100.0 if track.get('score') else 0.0,
+                    source="acrcloud",
+                    metadata=track
+                )
+        
+        if status_code == 3015:
+            # QPS limit exceeded - retried with backoff by BaseRecognizer
+            raise RateLimitedError(f"ACRCloud status {status_code}: {result.get('status', {}).get('msg')}")
+        if status_code not in (0, 1001):
+            # Quota, auth or fingerprint errors - not a "no match"
+            # (3001 = invalid access key, 3014 = invalid signature)
+            raise RecognizerError(
+                f"ACRCloud status {status_code}: {result.get('status', {}).get('msg')}",
+                auth=status_code in (3001, 3014)
+            )
+        
+        print(f"[ACRCloud] ✗ No match found. Status code: {status_code}")
+        return None
+    
+    def _report_error(self, error: Exception):
+        """Log a failed call with a hint for common HTTP errors"""
+        error_msg = str(error)
+        if "404" in error_msg:
+            print(f"ACRCloud error: {error_msg} (endpoint not found)")
+        elif "401" in error_msg or "403" in error_msg:
+            print(f"ACRCloud error: {error_msg} (authentication failed - check API keys)")
+        else:
+            print(f"ACRCloud error: {error_msg}")
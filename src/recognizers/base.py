@@ -1,8 +1,17 @@
 """Base recognizer interface"""
 
+import os
+import time
+import asyncio
+import hashlib
+import mimetypes
 from abc import ABC, abstractmethod
-from typing import Optional, Dict, Any
-from dataclasses import dataclass
+from typing import Optional, Dict, Any, Union
+from dataclasses import dataclass, asdict
+
+import requests
+
+from ..utils import http_client
 
 
 @dataclass
@@ -15,26 +24,369 @@ class RecognitionResult:
     metadata: Optional[Dict[str, Any]] = None
 
 
+@dataclass
+class EncodedAudio:
+    """Audio bytes ready to upload to a recognition API"""
+    data: bytes
+    filename: str = "segment.wav"
+    content_type: str = "audio/wav"
+
+
+# A recognizer accepts a file path, raw encoded bytes, or an in-memory
+# segment object exposing encode(codec) -> EncodedAudio (see AudioProcessor)
+AudioInput = Union[str, bytes, bytearray, memoryview, Any]
+
+
+class RecognizerError(Exception):
+    """Provider answered with an error (quota, auth, bad request) instead of a match or no-match"""
+    
+    def __init__(self, message: str, auth: bool = False):
+        super().__init__(message)
+        self.auth = auth  # Credentials rejected - retrying won't help
+
+
 class BaseRecognizer(ABC):
-    """Base class for all recognition backends"""
+    """
+    Base class for all recognition backends
     
-    @abstractmethod
-    def recognize(self, audio_file_path: str, start_time: float = 0.0, duration: float = 30.0) -> Optional[RecognitionResult]:
+    recognize() (or recognize_async()) is the public entry point: it checks
+    availability, consults the result cache, skips providers whose circuit
+    breaker is open, waits for the provider's rate limiter, sends the
+    request (retrying throttled requests with backoff) and turns its
+    exceptions into a logged None so the cascade can fall through.
+    
+    Subclasses implement _recognize(); API providers derive from
+    HTTPRecognizer, which implements it as one HTTP request. Offline
+    recognizers (offline = True) have _recognize() called directly, with no
+    result cache, circuit breaker, rate limiter or provider stats, since
+    nothing goes over the network.
+    """
+    
+    # Provider key used for caching and stats
+    name: str = "unknown"
+    # Name used in log messages
+    display_name: str = "Recognizer"
+    # Requests per second and burst allowed by the provider quota (0 = unlimited)
+    rate_limit: float = 0.0
+    rate_burst: int = 1
+    # Answers locally at no cost: asked before every API, never fanned out
+    offline: bool = False
+    
+    def recognize(self, audio: AudioInput, start_time: float = 0.0, duration: float = 30.0,
+                  confidence_threshold: Optional[float] = None) -> Optional[RecognitionResult]:
         """
-        Recognize a track from an audio file segment
+        Recognize a track from an audio segment
         
         Args:
-            audio_file_path: Path to the audio file
+            audio: In-memory segment, encoded audio bytes, or path to an audio file
             start_time: Start time in seconds
             duration: Duration of segment in seconds
+            confidence_threshold: Confidence the caller accepts, for the provider
+                hit-rate stats (default: CONFIDENCE_THRESHOLD)
             
         Returns:
-            RecognitionResult if track found, None otherwise
+            RecognitionResult if track found, None otherwise (including on errors)
         """
-        pass
+        if not self.is_available():
+            return None
+        if self.offline:
+            return self._recognize_offline(audio, start_time, duration)
+        
+        cache, audio_hash, hit, cached = self._check_cache(audio)
+        if hit:
+            return cached
+        
+        # Fail fast while the provider is known to be down or misconfigured
+        from ..utils.circuit_breaker import get_breaker
+        breaker = get_breaker(self.name)
+        if not breaker.allow():
+            return None
+        
+        started = time.monotonic()
+        try:
+            result = self._call_with_backoff(audio, start_time, duration)
+        except Exception as e:
+            self._record_failure(breaker, e, time.monotonic() - started)
+            return None
+        self._record_success(breaker, cache, audio_hash, result, time.monotonic() - started, confidence_threshold)
+        return result
+    
+    async def recognize_async(self, audio: AudioInput, start_time: float = 0.0, duration: float = 30.0,
+                              confidence_threshold: Optional[float] = None) -> Optional[RecognitionResult]:
+        """
+        Async counterpart of recognize(), for the asyncio pipeline
+        
+        Same caching, circuit breaking, rate limiting and error handling;
+        requests go through aiohttp and waits don't block the event loop.
+        """
+        if not self.is_available():
+            return None
+        if self.offline:
+            # Lookups are CPU-bound - keep them off the event loop
+            return await asyncio.to_thread(self._recognize_offline, audio, start_time, duration)
+        
+        # Hashing and the SQLite lookup happen off the event loop
+        cache, audio_hash, hit, cached = await asyncio.to_thread(self._check_cache, audio)
+        if hit:
+            return cached
+        
+        from ..utils.circuit_breaker import get_breaker
+        breaker = get_breaker(self.name)
+        if not breaker.allow():
+            return None
+        
+        started = time.monotonic()
+        try:
+            result = await self._call_with_backoff_async(audio, start_time, duration)
+        except asyncio.CancelledError:
+            # Fan-out cancelled the call - not a provider failure
+            breaker.release()
+            raise
+        except Exception as e:
+            self._record_failure(breaker, e, time.monotonic() - started)
+            return None
+        self._record_success(breaker, cache, audio_hash, result, time.monotonic() - started, confidence_threshold)
+        return result
+    
+    def _recognize_offline(self, audio: AudioInput, start_time: float, duration: float) -> Optional[RecognitionResult]:
+        """_recognize() for an offline recognizer; errors are logged and become None"""
+        try:
+            return self._recognize(audio, start_time, duration)
+        except Exception as e:
+            self._report_error(e)
+            return None
+    
+    def _check_cache(self, audio: AudioInput):
+        """
+        Look the segment up in the result cache
+        
+        Returns:
+            (cache, audio_hash, hit, result) - cache and audio_hash are None when caching is off
+        """
+        from ..utils.result_cache import get_result_cache
+        cache = get_result_cache()
+        if cache is None:
+            return None, None, False, None
+        audio_hash = self.audio_digest(audio)
+        hit, cached = cache.get(audio_hash, self.name)
+        if not cached:
+            return cache, audio_hash, hit, None
+        # Marked so the pipeline can tell windows answered without an API call
+        metadata = dict(cached.get('metadata') or {})
+        metadata['result_cache'] = True
+        return cache, audio_hash, hit, RecognitionResult(**{**cached, 'metadata': metadata})
+    
+    def _record_failure(self, breaker, error: Exception, latency: float):
+        from ..scheduler import get_provider_stats
+        breaker.record_failure(error, trip=self._is_auth_error(error))
+        get_provider_stats().record(self.name, latency, hit=False, error=True)
+        # Log error but don't raise (allow fallback to other recognizers)
+        self._report_error(error)
+    
+    def _record_success(self, breaker, cache, audio_hash: Optional[str], result: Optional[RecognitionResult], latency: float,
+                        confidence_threshold: Optional[float] = None):
+        from ..scheduler import get_provider_stats
+        from ..utils.config import Config
+        if confidence_threshold is None:
+            confidence_threshold = Config.CONFIDENCE_THRESHOLD
+        breaker.record_success()
+        # A hit is an answer the caller would accept
+        get_provider_stats().record(self.name, latency, hit=bool(result and result.confidence >= confidence_threshold))
+        # Only real answers are cached - errors never get here
+        if cache is not None:
+            cache.put(audio_hash, self.name, asdict(result) if result else None, latency)
+    
+    def _call_with_backoff(self, audio: AudioInput, start_time: float, duration: float) -> Optional[RecognitionResult]:
+        """
+        Call _recognize() under the provider's token bucket
+        
+        Throttled responses (429, Retry-After) pause the shared bucket so every
+        worker backs off together, then the call is retried with jittered
+        exponential backoff. Other errors are raised immediately.
+        """
+        from ..utils.rate_limit import get_limiter
+        limiter = get_limiter(self.name, self.rate_limit, self.rate_burst)
+        
+        attempt = 0
+        while True:
+            if limiter is not None:
+                limiter.acquire()
+            try:
+                return self._recognize(audio, start_time, duration)
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                if limiter is not None:
+                    limiter.pause(delay)
+                else:
+                    time.sleep(delay)
+                attempt += 1
+    
+    async def _call_with_backoff_async(self, audio: AudioInput, start_time: float, duration: float) -> Optional[RecognitionResult]:
+        """Async _call_with_backoff(): same bucket and retry policy"""
+        from ..utils.rate_limit import get_limiter
+        limiter = get_limiter(self.name, self.rate_limit, self.rate_burst)
+        
+        attempt = 0
+        while True:
+            if limiter is not None:
+                await limiter.acquire_async()
+            try:
+                return await self._recognize_async(audio, start_time, duration)
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                if limiter is not None:
+                    limiter.pause(delay)
+                else:
+                    await asyncio.sleep(delay)
+                attempt += 1
+    
+    def _retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """Seconds to wait before retrying a throttled call, None to give up"""
+        from ..utils.config import Config
+        from ..utils.rate_limit import throttle_delay, backoff_delay
+        retry_after = throttle_delay(error)
+        if retry_after is None or attempt >= Config.RATE_LIMIT_MAX_RETRIES:
+            return None
+        delay = max(retry_after, backoff_delay(attempt, Config.RATE_LIMIT_BACKOFF_BASE, Config.RATE_LIMIT_BACKOFF_MAX))
+        print(f"[{self.display_name}] Rate limited, retrying in {delay:.1f}s (attempt {attempt + 1}/{Config.RATE_LIMIT_MAX_RETRIES})")
+        return delay
+    
+    @staticmethod
+    def _is_auth_error(error: Exception) -> bool:
+        """Whether the provider rejected our credentials"""
+        if isinstance(error, RecognizerError):
+            return error.auth
+        response = getattr(error, 'response', None)
+        return response is not None and getattr(response, 'status_code', None) in (401, 403)
+    
+    def _report_error(self, error: Exception):
+        """Log a failed call"""
+        print(f"{self.display_name} error: {error}")
+    
+    def audio_digest(self, audio: AudioInput) -> str:
+        """Stable hash of the audio a recognizer would be sent"""
+        digest = getattr(audio, 'digest', None)
+        if isinstance(digest, str):
+            return digest
+        if isinstance(audio, EncodedAudio):
+            audio = audio.data
+        if isinstance(audio, (str, os.PathLike)):
+            h = hashlib.sha1()
+            with open(audio, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    h.update(chunk)
+            return h.hexdigest()
+        return hashlib.sha1(audio).hexdigest()
     
     @abstractmethod
     def is_available(self) -> bool:
         """Check if the recognizer is available (API keys configured)"""
         pass
+    
+    @abstractmethod
+    def _recognize(self, audio: AudioInput, start_time: float = 0.0, duration: float = 30.0) -> Optional[RecognitionResult]:
+        """
+        Recognize one segment (no caching, breaker or error handling)
+        
+        Returns:
+            RecognitionResult if track found, None if there is no match
+            
+        Raises:
+            Any exception on errors (these are never cached)
+        """
+        pass
+    
+    async def _recognize_async(self, audio: AudioInput, start_time: float = 0.0, duration: float = 30.0) -> Optional[RecognitionResult]:
+        """Async _recognize(); runs it in a worker thread unless overridden"""
+        return await asyncio.to_thread(self._recognize, audio, start_time, duration)
 
+
+class HTTPRecognizer(BaseRecognizer):
+    """
+    Recognizer backed by an HTTP API
+    
+    Providers implement _build_request() and _parse_response(); the sync and
+    async paths share both, so they only differ in how the request is sent.
+    """
+    
+    # Encoding used when uploading in-memory segments (key of UPLOAD_CODECS)
+    upload_codec: Optional[str] = None
+    
+    def load_audio(self, audio: AudioInput) -> EncodedAudio:
+        """
+        Resolve any supported audio input to uploadable bytes
+        
+        In-memory segments are encoded once per upload codec and the bytes are
+        shared by every recognizer using that codec; file paths are the
+        opt-in fallback and are uploaded as-is.
+        """
+        if isinstance(audio, EncodedAudio):
+            return audio
+        if isinstance(audio, (str, os.PathLike)):
+            with open(audio, 'rb') as f:
+                data = f.read()
+            content_type = mimetypes.guess_type(str(audio))[0] or 'application/octet-stream'
+            return EncodedAudio(data, os.path.basename(audio), content_type)
+        if isinstance(audio, (bytes, bytearray, memoryview)):
+            return EncodedAudio(bytes(audio))
+        return audio.encode(self.upload_codec)
+    
+    def _recognize(self, audio: AudioInput, start_time: float = 0.0, duration: float = 30.0) -> Optional[RecognitionResult]:
+        """
+        One provider request: encode, send, parse
+        
+        Returns:
+            RecognitionResult if track found, None if the provider found no match
+            
+        Raises:
+            Any exception on request or API errors (these are never cached)
+        """
+        # Encoded once per segment and shared across recognizers
+        sample = self.load_audio(audio)
+        response = self._send(self._build_request(sample, start_time, duration))
+        return self._parse_response(response)
+    
+    async def _recognize_async(self, audio: AudioInput, start_time: float = 0.0, duration: float = 30.0) -> Optional[RecognitionResult]:
+        """Async _recognize(); encoding runs in a worker thread"""
+        sample = await asyncio.to_thread(self.load_audio, audio)
+        response = await self._send_async(self._build_request(sample, start_time, duration))
+        return self._parse_response(response)
+    
+    @abstractmethod
+    def _build_request(self, sample: EncodedAudio, start_time: float, duration: float) -> Dict[str, Any]:
+        """
+        Provider request for an encoded segment
+        
+        Returns:
+            http_client.post() keyword arguments (url, data, files, headers, ...)
+        """
+        pass
+    
+    @abstractmethod
+    def _parse_response(self, response: requests.Response) -> Optional[RecognitionResult]:
+        """
+        Turn a provider response into a result
+        
+        Returns:
+            RecognitionResult if track found, None if the provider found no match
+            
+        Raises:
+            RecognizerError (or RateLimitedError) when the provider reports an error
+        """
+        pass
+    
+    def _send(self, request: Dict[str, Any]) -> requests.Response:
+        """POST a request built by _build_request(); raises on HTTP errors"""
+        response = http_client.post(**request)
+        response.raise_for_status()
+        return response
+    
+    async def _send_async(self, request: Dict[str, Any]) -> requests.Response:
+        """Async _send()"""
+        response = await http_client.post_async(**request)
+        response.raise_for_status()
+        return response
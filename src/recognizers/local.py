@@ -0,0 +1,88 @@
+"""Local reference library (offline fingerprint index)"""
+
+import io
+import os
+from typing import Optional
+
+import librosa
+import numpy as np
+
+from .base import BaseRecognizer, RecognitionResult, EncodedAudio, AudioInput
+from ..audio_processor import AudioProcessor
+from ..fingerprint import spectral_peaks
+from ..utils.config import Config
+
+
+class LocalRecognizer(BaseRecognizer):
+    """
+    Recognizer backed by a fingerprint index of our own tracks
+    
+    The index (see reference_index.ReferenceIndex) is built with the
+    edm-index command. Lookups are local and free, so the pipeline asks
+    this recognizer before any API and only goes on when it finds nothing.
+    """
+    
+    name = "local"
+    display_name = "Local library"
+    offline = True
+    
+    def __init__(self, index_dir: Optional[str] = None):
+        self.index_dir = index_dir or Config.LOCAL_INDEX_DIR
+        self.min_votes = Config.LOCAL_MIN_VOTES
+        self.min_coverage = Config.LOCAL_MIN_COVERAGE
+        self.max_stretch = Config.LOCAL_MAX_STRETCH
+        self._index = None
+    
+    @property
+    def index(self):
+        """The reference index, opened on first use (shared process-wide)"""
+        if self._index is None and self.index_dir:
+            from ..reference_index import get_reference_index
+            self._index = get_reference_index(self.index_dir)
+        return self._index
+    
+    def is_available(self) -> bool:
+        """Check if a non-empty reference index is configured"""
+        return self.index is not None and len(self.index) > 0
+    
+    def _recognize(self, audio: AudioInput, start_time: float = 0.0, duration: float = 30.0) -> Optional[RecognitionResult]:
+        """
+        Match a segment against the index
+        
+        Returns:
+            RecognitionResult if enough hashes line up with one reference track
+            (at some playback speed within LOCAL_MAX_STRETCH), None otherwise
+        """
+        samples, sample_rate = self._samples(audio)
+        # In-memory segments share their peaks with the repeat index
+        peaks = audio.peaks() if hasattr(audio, 'peaks') else spectral_peaks(samples, sample_rate)
+        match = self.index.match(peaks, len(samples) / sample_rate, sample_rate, min_votes=self.min_votes,
+                                 min_coverage=self.min_coverage, max_stretch=self.max_stretch)
+        if match is None:
+            return None
+        return RecognitionResult(
+            artist=match.get('artist'),
+            title=match.get('title'),
+            confidence=match['coverage'],
+            source=self.name,
+            metadata={
+                'track_id': match['id'],
+                'path': match['path'],
+                'offset': match['offset'],
+                'votes': match['votes'],
+                'stretch': match['stretch'],
+                'key_lock': match['key_lock'],
+            }
+        )
+    
+    def _samples(self, audio: AudioInput):
+        """(mono samples, sample rate) of any supported audio input"""
+        if hasattr(audio, 'samples') and hasattr(audio, 'sample_rate'):
+            return audio.samples, audio.sample_rate
+        if isinstance(audio, EncodedAudio):
+            audio = audio.data
+        if isinstance(audio, (str, os.PathLike)):
+            y, sr = librosa.load(audio, sr=AudioProcessor.SAMPLE_RATE, mono=True)
+        else:
+            y, sr = librosa.load(io.BytesIO(bytes(audio)), sr=AudioProcessor.SAMPLE_RATE, mono=True)
+        return y.astype(np.float32), sr
@@ -0,0 +1,339 @@
+"""Fingerprint index of a local reference library, stored as memory-mapped arrays"""
+
+import os
+import json
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .fingerprint import (
+    HOP, best_alignment, best_scaled_alignment, coverage, fingerprint, peak_pair_hashes, runner_up_votes, stretch_peaks
+)
+
+TRACKS_FILE = 'tracks.json'
+MAX_POSTINGS = 2000  # Hashes this common (kicks, silence) say nothing about which track it is
+SHARD_TRACKS = 200  # Tracks fingerprinted before a shard is written (bounds memory while building)
+MAX_SHARDS = 8  # Compact when an update leaves more shards than this
+STRETCH_STEP = 0.01  # Speeds searched for pitched clips; hashes still match within half a step
+FINE_STEP = 0.001  # Refinement of each searched speed (re-aligns hit offsets over the clip)
+COARSE_FRAMES = 8  # Offset resolution when ranking speeds
+REFINE_CANDIDATES = 3  # Best-ranked (speed, track) pairs refined
+MIN_MARGIN = 10.0  # A match needs this many times the aligned votes of the runner-up track
+
+
+def parse_track_name(path: str) -> Tuple[Optional[str], str]:
+    """(artist, title) from a file name like 'Artist - Title.mp3'; (None, stem) otherwise"""
+    stem = Path(path).stem
+    if ' - ' in stem:
+        artist, title = stem.split(' - ', 1)
+        return artist.strip() or None, title.strip()
+    return None, stem
+
+
+class ReferenceIndex:
+    """
+    Hash -> (track id, anchor frame) postings for a directory of reference tracks
+
+    Layout of the index directory:
+        tracks.json                  Track id -> path, artist, title, size, mtime, removed
+        shard-NNNN.hashes.npy        Sorted uint32 hashes
+        shard-NNNN.postings.npy      uint32 (track id, anchor frame) rows, in hash order
+
+    Shards are memory-mapped, so opening an index is instant and lookups only
+    touch the pages they binary-search. update() fingerprints new and changed
+    files into new shards; removed or changed tracks are marked removed and
+    dropped for good on the next compact().
+    """
+
+    def __init__(self, path: str):
+        self.path = os.path.expanduser(path)
+        self._lock = threading.Lock()
+        self.tracks: List[Dict[str, Any]] = []
+        self._shards: List[Tuple[np.ndarray, np.ndarray]] = []
+        self._live = np.zeros(0, dtype=bool)
+        self.load()
+
+    def load(self):
+        """(Re)open the index from disk; an empty index if there is none yet"""
+        tracks, shards = [], []
+        try:
+            with open(os.path.join(self.path, TRACKS_FILE)) as f:
+                tracks = json.load(f).get('tracks', [])
+            for name in self._shard_names():
+                shards.append((
+                    np.load(os.path.join(self.path, f"{name}.hashes.npy"), mmap_mode='r'),
+                    np.load(os.path.join(self.path, f"{name}.postings.npy"), mmap_mode='r'),
+                ))
+        except (OSError, ValueError) as e:
+            if tracks:
+                print(f"[LocalIndex] Could not open index at {self.path}: {e}")
+            tracks, shards = [], []
+        with self._lock:
+            self.tracks = tracks
+            self._shards = shards
+            self._live = np.array([not t.get('removed') for t in tracks], dtype=bool)
+
+    def __len__(self) -> int:
+        """Number of live (not removed) tracks"""
+        return int(self._live.sum())
+
+    def _shard_names(self) -> List[str]:
+        try:
+            names = os.listdir(self.path)
+        except OSError:
+            return []
+        return sorted(n[:-len('.hashes.npy')] for n in names if n.startswith('shard-') and n.endswith('.hashes.npy'))
+
+    def hits(self, hashes: np.ndarray, frames: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Postings of every query hash, across all shards
+
+        Returns:
+            (query frame, track id, reference frame) per hit, live tracks only
+        """
+        query_frames, track_ids, ref_frames = [], [], []
+        with self._lock:
+            shards, live = self._shards, self._live
+        order = np.argsort(hashes, kind='stable')
+        hashes, frames = hashes[order], frames[order]
+        for shard_hashes, postings in shards:
+            left = np.searchsorted(shard_hashes, hashes, side='left')
+            right = np.searchsorted(shard_hashes, hashes, side='right')
+            counts = right - left
+            keep = (counts > 0) & (counts <= MAX_POSTINGS)
+            if not keep.any():
+                continue
+            left, counts = left[keep], counts[keep]
+            # Concatenated [left, right) ranges without a Python loop
+            starts = np.repeat(left - np.concatenate(([0], np.cumsum(counts)[:-1])), counts)
+            rows = np.asarray(postings[starts + np.arange(counts.sum())])
+            query_frames.append(np.repeat(frames[keep], counts))
+            track_ids.append(rows[:, 0])
+            ref_frames.append(rows[:, 1])
+        if not query_frames or not len(live):
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, empty
+        query_frames = np.concatenate(query_frames).astype(np.int64)
+        track_ids = np.concatenate(track_ids).astype(np.int64)
+        ref_frames = np.concatenate(ref_frames).astype(np.int64)
+        # Ids past the track list belong to a shard whose update never finished
+        alive = (track_ids < len(live)) & live[np.minimum(track_ids, len(live) - 1)]
+        return query_frames[alive], track_ids[alive], ref_frames[alive]
+
+    def match(self, peaks: Tuple[np.ndarray, np.ndarray], duration: float, sample_rate: int, min_votes: int = 20,
+              min_coverage: float = 0.5, max_stretch: float = 0.0) -> Optional[Dict[str, Any]]:
+        """
+        Reference track a clip was cut from, if any
+
+        The clip is first matched as is. If that fails and max_stretch is set,
+        it is matched again at playback speeds from 1 - max_stretch to
+        1 + max_stretch, for DJs pitching tracks up or down.
+
+        Args:
+            peaks: spectral_peaks() of the clip
+            duration: Seconds of audio fingerprinted
+            sample_rate: Sample rate it was fingerprinted at
+            min_votes: Aligned hash hits needed for a match
+            min_coverage: Share of the clip's seconds the aligned hits must cover
+            max_stretch: Largest speed change searched (0.08 = +/-8%, 0 = none)
+
+        Returns:
+            Track entry plus votes, coverage, offset (seconds into the
+            reference where the clip starts), stretch (clip speed relative
+            to the reference) and key_lock; None without a match
+        """
+        def accepted(candidate, hits):
+            if candidate is None or len(candidate[2]) < min_votes:
+                return False
+            if coverage(candidate[2], sample_rate, duration) < min_coverage:
+                return False
+            query_frames, track_ids, ref_frames = hits
+            runner_up = runner_up_votes(query_frames, track_ids, ref_frames, candidate[2], track_ids == candidate[0])
+            return len(candidate[2]) >= MIN_MARGIN * runner_up
+
+        hits = self.hits(*peak_pair_hashes(*peaks))
+        best = best_scaled_alignment(*hits, (1.0,))
+        key_lock = False
+        if not accepted(best, hits):
+            best = None
+            if max_stretch > 0:
+                best, key_lock = self._match_stretched(peaks, min_votes, max_stretch, accepted)
+        if best is None:
+            return None
+        track_id, offset, agreeing, scale = best
+        return {
+            **self.tracks[track_id],
+            'votes': int(len(agreeing)),
+            'coverage': round(coverage(agreeing, sample_rate, duration), 3),
+            'offset': round(offset * HOP / sample_rate, 2),
+            'stretch': round(float(scale), 3),
+            'key_lock': key_lock,
+        }
+
+    def _match_stretched(self, peaks, min_votes, max_stretch, accepted):
+        """
+        Best accepted alignment over playback speeds within +/- max_stretch
+
+        Every speed (STRETCH_STEP apart, pitch following tempo or key lock)
+        is ranked by a coarse offset vote that tolerates the drift of a speed
+        up to half a step off; the most promising are refined in FINE_STEP
+        steps.
+
+        Returns:
+            ((track id, offset, agreeing query frames, speed) or None, key_lock)
+        """
+        candidates = []
+        steps = int(round(max_stretch / STRETCH_STEP))
+        for factor in 1.0 + STRETCH_STEP * np.arange(-steps, steps + 1):
+            for pitch in (True, False):
+                hits = self.hits(*peak_pair_hashes(*stretch_peaks(*peaks, factor, pitch)))
+                if len(hits[0]) < min_votes:
+                    continue
+                query_frames, track_ids, ref_frames = hits
+                coarse = best_alignment(query_frames // COARSE_FRAMES, track_ids, ref_frames // COARSE_FRAMES)
+                if len(coarse[2]) >= min_votes:
+                    candidates.append((len(coarse[2]), factor, pitch, coarse[0], hits))
+
+        fine = 1.0 + np.arange(-STRETCH_STEP / 2, STRETCH_STEP / 2 + FINE_STEP / 2, FINE_STEP)
+        best, key_lock = None, False
+        for _, factor, pitch, track_id, hits in sorted(candidates, key=lambda c: -c[0])[:REFINE_CANDIDATES]:
+            query_frames, track_ids, ref_frames = hits
+            same = track_ids == track_id
+            candidate = best_scaled_alignment(query_frames[same], track_ids[same], ref_frames[same], fine)
+            if (best is None or len(candidate[2]) > len(best[2])) and accepted(candidate, hits):
+                best, key_lock = (*candidate[:3], factor * candidate[3]), not pitch
+        return best, key_lock
+
+    def update(self, library: str, decode: Callable[[str], Tuple[np.ndarray, int]], extensions: Tuple[str, ...],
+               on_progress: Optional[Callable[[str, str], None]] = None) -> Dict[str, int]:
+        """
+        Bring the index in line with a library directory (incremental)
+
+        Files are matched by path; a file whose size or mtime changed is
+        fingerprinted again. Only new and changed files are decoded.
+
+        Args:
+            library: Directory scanned recursively
+            decode: Returns (mono samples, sample rate) of a file
+            extensions: Lower-case file suffixes to index ('.mp3', ...)
+            on_progress: Called with (path, 'added' | 'updated' | 'failed')
+
+        Returns:
+            Counts of added, updated, removed, unchanged and failed files
+        """
+        os.makedirs(self.path, exist_ok=True)
+        counts = {'added': 0, 'updated': 0, 'removed': 0, 'unchanged': 0, 'failed': 0}
+        tracks = [dict(t) for t in self.tracks]
+        by_path = {t['path']: t for t in tracks if not t.get('removed')}
+
+        found = {}
+        for root, _, files in os.walk(library):
+            for name in sorted(files):
+                if Path(name).suffix.lower() in extensions:
+                    path = os.path.abspath(os.path.join(root, name))
+                    stat = os.stat(path)
+                    found[path] = (stat.st_size, int(stat.st_mtime))
+
+        for path, entry in by_path.items():
+            if path not in found:
+                entry['removed'] = True
+                counts['removed'] += 1
+
+        pending: List[Tuple[np.ndarray, np.ndarray]] = []
+        for path, (size, mtime) in sorted(found.items()):
+            entry = by_path.get(path)
+            if entry is not None and entry.get('size') == size and entry.get('mtime') == mtime:
+                counts['unchanged'] += 1
+                continue
+            try:
+                samples, sample_rate = decode(path)
+                hashes, frames = fingerprint(samples, sample_rate)
+            except Exception as e:
+                print(f"[LocalIndex] Skipping {path}: {e}")
+                counts['failed'] += 1
+                if on_progress:
+                    on_progress(path, 'failed')
+                continue
+            status = 'added'
+            if entry is not None:
+                entry['removed'] = True
+                status = 'updated'
+            counts[status] += 1
+            artist, title = parse_track_name(path)
+            track_id = len(tracks)
+            tracks.append({'id': track_id, 'path': path, 'artist': artist, 'title': title, 'size': size,
+                           'mtime': mtime, 'duration': round(len(samples) / sample_rate, 2)})
+            pending.append((hashes, np.column_stack([np.full(len(hashes), track_id), frames]).astype(np.uint32)))
+            if on_progress:
+                on_progress(path, status)
+            if len(pending) >= SHARD_TRACKS:
+                # Track list after its shard, so an interrupted build keeps what it finished
+                self._write_shard(pending)
+                self._write_tracks(tracks)
+                pending = []
+        if pending:
+            self._write_shard(pending)
+        self._write_tracks(tracks)
+        self.load()
+        if len(self._shard_names()) > MAX_SHARDS:
+            self.compact()
+        return counts
+
+    def compact(self):
+        """Merge all shards into one and drop postings of removed tracks"""
+        with self._lock:
+            shards, live = self._shards, self._live
+        merged = []
+        for shard_hashes, postings in shards:
+            postings = np.asarray(postings)
+            keep = (postings[:, 0] < len(live)) & live[np.minimum(postings[:, 0], max(len(live) - 1, 0))]
+            merged.append((np.asarray(shard_hashes)[keep], postings[keep]))
+        old = self._shard_names()
+        self._write_shard(merged)
+        for name in old:
+            for suffix in ('.hashes.npy', '.postings.npy'):
+                try:
+                    os.unlink(os.path.join(self.path, name + suffix))
+                except OSError:
+                    pass
+        self.load()
+
+    def _write_shard(self, parts: List[Tuple[np.ndarray, np.ndarray]]):
+        """Write (hashes, postings) parts as one new shard, sorted by hash"""
+        hashes = np.concatenate([h for h, _ in parts]).astype(np.uint32) if parts else np.zeros(0, dtype=np.uint32)
+        postings = np.concatenate([p for _, p in parts]) if parts else np.zeros((0, 2), dtype=np.uint32)
+        order = np.argsort(hashes, kind='stable')
+        names = self._shard_names()
+        number = int(names[-1].split('-')[1]) + 1 if names else 0
+        name = f"shard-{number:04d}"
+        # Postings first: a shard only exists once its hashes file is in place
+        self._save_atomic(f"{name}.postings.npy", postings[order])
+        self._save_atomic(f"{name}.hashes.npy", hashes[order])
+
+    def _save_atomic(self, filename: str, array: np.ndarray):
+        fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=self.path)
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, array)
+        os.replace(tmp_path, os.path.join(self.path, filename))
+
+    def _write_tracks(self, tracks: List[Dict[str, Any]]):
+        fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=self.path)
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'tracks': tracks}, f)
+        os.replace(tmp_path, os.path.join(self.path, TRACKS_FILE))
+
+
+_indexes: Dict[str, ReferenceIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_reference_index(path: str) -> ReferenceIndex:
+    """Process-wide index for a directory, opened once"""
+    with _indexes_lock:
+        index = _indexes.get(path)
+        if index is None:
+            index = _indexes[path] = ReferenceIndex(path)
+        return index
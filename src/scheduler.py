@@ -0,0 +1,173 @@
+"""Cost/latency-aware provider ordering learned from past calls"""
+
+import os
+import json
+import atexit
+import tempfile
+import threading
+from collections import deque
+from typing import Dict, List, Optional, Sequence
+
+from .recognizers.base import BaseRecognizer
+from .utils.config import Config
+
+
+class ProviderStats:
+    """
+    Per-provider hit rate and latency, persisted to a small JSON file
+
+    Only real API calls are recorded (not cache hits or calls skipped by an
+    open circuit breaker). Latencies keep a sliding window of recent calls.
+    """
+
+    def __init__(self, path: Optional[str] = None, window: int = 200, save_every: int = 20):
+        self.path = path or os.path.join(tempfile.gettempdir(), 'edm_provider_stats.json')
+        self.window = window
+        self.save_every = save_every
+        self._lock = threading.Lock()
+        self._unsaved = 0
+        self._stats: Dict[str, dict] = {}
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        for provider, entry in data.items():
+            self._stats[provider] = {
+                'calls': int(entry.get('calls', 0)),
+                'hits': int(entry.get('hits', 0)),
+                'errors': int(entry.get('errors', 0)),
+                'latencies': deque(entry.get('latencies', []), maxlen=self.window),
+            }
+
+    def _entry(self, provider: str) -> dict:
+        entry = self._stats.get(provider)
+        if entry is None:
+            entry = self._stats[provider] = {'calls': 0, 'hits': 0, 'errors': 0, 'latencies': deque(maxlen=self.window)}
+        return entry
+
+    def record(self, provider: str, latency: float, hit: bool, error: bool = False):
+        """Record one API call"""
+        with self._lock:
+            entry = self._entry(provider)
+            entry['calls'] += 1
+            entry['hits'] += int(hit)
+            entry['errors'] += int(error)
+            entry['latencies'].append(round(latency, 3))
+            self._unsaved += 1
+            should_save = self._unsaved >= self.save_every
+        if should_save:
+            self.save()
+
+    def save(self):
+        """Write stats atomically (last writer wins across processes)"""
+        with self._lock:
+            data = {p: {**e, 'latencies': list(e['latencies'])} for p, e in self._stats.items()}
+            self._unsaved = 0
+        try:
+            fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(self.path) or '.')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"[Scheduler] Could not save provider stats: {e}")
+
+    def summary(self, provider: str) -> dict:
+        """Calls, hit rate and latency percentiles for a provider"""
+        with self._lock:
+            entry = self._entry(provider)
+            latencies = sorted(entry['latencies'])
+            calls, hits, errors = entry['calls'], entry['hits'], entry['errors']
+
+        def percentile(q: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return latencies[min(len(latencies) - 1, int(len(latencies) * q))]
+
+        return {
+            'calls': calls,
+            'hits': hits,
+            'errors': errors,
+            'hit_rate': round(hits / calls, 3) if calls else None,
+            'latency_mean': round(sum(latencies) / len(latencies), 3) if latencies else None,
+            'latency_p50': percentile(0.5),
+            'latency_p95': percentile(0.95),
+        }
+
+
+class ProviderScheduler:
+    """
+    Order providers to minimize expected time and cost to a confident answer
+
+    Providers are tried until one answers, so with success probability p and
+    cost c per call the expected total is minimized by trying providers in
+    ascending c / p. Cost is mean latency plus the per-call price weighted by
+    SCHEDULER_COST_WEIGHT (seconds per dollar). Both p and latency start
+    from priors and move toward the observed values as calls accumulate,
+    so the static priority order wins ties while there is little data.
+    """
+
+    PRIOR_CALLS = 4  # Weight of the prior, in calls
+
+    def __init__(self, stats: ProviderStats, costs: Optional[Dict[str, float]] = None,
+                 cost_weight: float = 0.0, prior_hit_rate: float = 0.5, prior_latency: float = 3.0):
+        self.stats = stats
+        self.costs = costs or {}
+        self.cost_weight = cost_weight
+        self.prior_hit_rate = prior_hit_rate
+        self.prior_latency = prior_latency
+
+    def expected_cost(self, provider: str) -> float:
+        """Cost of one call divided by the chance it produces a confident answer"""
+        s = self.stats.summary(provider)
+        calls = s['calls']
+        hit_rate = (s['hits'] + self.prior_hit_rate * self.PRIOR_CALLS) / (calls + self.PRIOR_CALLS)
+        latency = s['latency_mean'] if s['latency_mean'] is not None else self.prior_latency
+        n = min(calls, self.stats.window)
+        latency = (latency * n + self.prior_latency * self.PRIOR_CALLS) / (n + self.PRIOR_CALLS)
+        cost = latency + self.cost_weight * self.costs.get(provider, 0.0)
+        return cost / max(hit_rate, 1e-3)
+
+    def order(self, recognizers: Sequence[BaseRecognizer]) -> List[BaseRecognizer]:
+        """Recognizers sorted by expected cost (stable, so given order breaks ties)"""
+        return sorted(recognizers, key=lambda r: self.expected_cost(r.name))
+
+    def report(self, recognizers: Sequence[BaseRecognizer]) -> Dict[str, dict]:
+        """Stats and expected cost per provider, in scheduled order"""
+        return {
+            r.name: {**self.stats.summary(r.name), 'expected_cost': round(self.expected_cost(r.name), 3)}
+            for r in self.order(recognizers)
+        }
+
+
+_scheduler: Optional[ProviderScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_provider_stats() -> ProviderStats:
+    """Process-wide provider stats store"""
+    return get_scheduler().stats
+
+
+def get_scheduler() -> ProviderScheduler:
+    """Process-wide scheduler configured from Config"""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                stats = ProviderStats(Config.PROVIDER_STATS_PATH)
+                atexit.register(stats.save)
+                _scheduler = ProviderScheduler(
+                    stats,
+                    costs={
+                        'acrcloud': Config.ACRCLOUD_COST_PER_CALL,
+                        'audd': Config.AUDD_COST_PER_CALL,
+                        'shazam': Config.SHAZAM_COST_PER_CALL,
+                        'songfinder': Config.SONGFINDER_COST_PER_CALL,
+                    },
+                    cost_weight=Config.SCHEDULER_COST_WEIGHT
+                )
+    return _scheduler
@@ -0,0 +1,116 @@
+"""Circuit breakers for recognition providers"""
+
+import time
+import threading
+from typing import Dict, Optional
+
+from .config import Config
+
+
+class CircuitBreaker:
+    """
+    Stop calling a provider that keeps failing
+
+    closed: calls go through; consecutive failures are counted.
+    open: calls fail fast until reset_timeout has passed.
+    half_open: a single probe call is let through; success closes the
+    breaker, failure opens it again for another reset_timeout.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 60.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.last_error: Optional[str] = None
+        self.rejected = 0  # Calls skipped while open
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may be made now"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                print(f"[CircuitBreaker] {self.name} recovered, closing")
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self, error: Exception, trip: bool = False):
+        """
+        Count a failed call
+
+        Args:
+            error: The exception raised by the call
+            trip: Open immediately (e.g. authentication errors won't fix themselves)
+        """
+        with self._lock:
+            self.failures += 1
+            self.last_error = str(error)[:200]
+            self._probe_in_flight = False
+            if self.state == self.HALF_OPEN or trip or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    print(f"[CircuitBreaker] {self.name} open after {self.failures} failure(s): {self.last_error}")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def release(self):
+        """Give back a half-open probe that was cancelled without an answer"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            retry_in = 0.0
+            if self.state == self.OPEN:
+                retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+            return {
+                'state': self.state,
+                'consecutive_failures': self.failures,
+                'rejected_calls': self.rejected,
+                'retry_in_seconds': round(retry_in, 1),
+                'last_error': self.last_error,
+            }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Process-wide breaker for a provider"""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(
+                name,
+                failure_threshold=Config.CIRCUIT_FAILURE_THRESHOLD,
+                reset_timeout=Config.CIRCUIT_RESET_TIMEOUT
+            )
+        return breaker
+
+
+def breaker_states() -> Dict[str, dict]:
+    """State of every breaker created so far"""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {b.name: b.snapshot() for b in breakers}
@@ -14,6 +14,14 @@ class Config:
     # ACRCloud API credentials
     ACRCLOUD_ACCESS_KEY: Optional[str] = os.getenv("ACRCLOUD_ACCESS_KEY")
     ACRCLOUD_SECRET_KEY: Optional[str] = os.getenv("ACRCLOUD_SECRET_KEY")
+    # Region of the ACRCloud project (e.g. eu-west-1); probed automatically if unset
+    ACRCLOUD_REGION: Optional[str] = os.getenv("ACRCLOUD_REGION")
+    # Hedged requests: also ask a second region when the pinned one is slower
+    # than the given latency percentile; the first answer wins
+    ACRCLOUD_HEDGE: bool = os.getenv("ACRCLOUD_HEDGE", "false").lower() in ("1", "true", "yes")
+    ACRCLOUD_HEDGE_PERCENTILE: float = float(os.getenv("ACRCLOUD_HEDGE_PERCENTILE", "95"))
+    ACRCLOUD_HEDGE_DELAY: float = float(os.getenv("ACRCLOUD_HEDGE_DELAY", "3.0"))  # Until enough samples
+    ACRCLOUD_HEDGE_MIN_SAMPLES: int = int(os.getenv("ACRCLOUD_HEDGE_MIN_SAMPLES", "20"))
     
     # Audd.io API credentials
     AUDD_API_TOKEN: Optional[str] = os.getenv("AUDD_API_TOKEN")
@@ -33,12 +41,134 @@ class Config:
     SEGMENT_LENGTH: int = int(os.getenv("SEGMENT_LENGTH", "45"))
     SEGMENT_OVERLAP: int = int(os.getenv("SEGMENT_OVERLAP", "15"))
     CONFIDENCE_THRESHOLD: float = float(os.getenv("CONFIDENCE_THRESHOLD", "0.5"))
+    # Segments recognized concurrently (requests are mostly waiting on HTTP)
+    WORKERS: int = int(os.getenv("WORKERS", "4"))
+    MAX_WORKERS: int = int(os.getenv("MAX_WORKERS", "8"))  # Upper bound for web requests
+    # How providers are queried per segment: "sequential" cascade (saves quota)
+    # or "fanout" (all at once, first confident answer wins)
+    PROVIDER_MODE: str = os.getenv("PROVIDER_MODE", "sequential")
+    FANOUT_THREADS: int = int(os.getenv("FANOUT_THREADS", "16"))
+    # Segment driver: "threads" (one thread per segment in flight) or
+    # "asyncio" (one event loop, many segments in flight)
+    PIPELINE_ENGINE: str = os.getenv("PIPELINE_ENGINE", "threads")
+    ASYNC_CONCURRENCY: int = int(os.getenv("ASYNC_CONCURRENCY", "64"))  # Segments in flight with asyncio
+    # Which windows are sent to providers: "all", or "adaptive" (every
+    # SAMPLING_STRIDE-th window, bisecting only where the track changes)
+    SAMPLING_MODE: str = os.getenv("SAMPLING_MODE", "all")
+    SAMPLING_STRIDE: int = int(os.getenv("SAMPLING_STRIDE", "4"))
+    # Low-information windows (silence, noise, beatless ambience): "off", "skip"
+    # (never sent) or "defer" (sent last, and only if neighbours don't agree)
+    SCREEN_MODE: str = os.getenv("SCREEN_MODE", "off")
+    SCREEN_SILENCE_DB: float = float(os.getenv("SCREEN_SILENCE_DB", "-50"))  # Quieter windows are silence
+    SCREEN_MAX_FLATNESS: float = float(os.getenv("SCREEN_MAX_FLATNESS", "0.3"))  # Flatter spectra are noise
+    SCREEN_MIN_ONSET_RATE: float = float(os.getenv("SCREEN_MIN_ONSET_RATE", "1.0"))  # Fewer onsets/s are ambient
+    # Segment placement: "grid" (fixed windows) or "novelty" (follow detected track changes)
+    SEGMENT_MODE: str = os.getenv("SEGMENT_MODE", "grid")
+    NOVELTY_CONTEXT: int = int(os.getenv("NOVELTY_CONTEXT", "30"))  # Seconds compared on each side
+    NOVELTY_MIN_GAP: int = int(os.getenv("NOVELTY_MIN_GAP", "60"))  # Minimum seconds between transitions
+    PHRASE_BARS: int = int(os.getenv("PHRASE_BARS", "16"))  # Bars per phrase (4/4) in phrase mode
+    # Seconds of audio sent per segment in probe mode (0 = send the whole window)
+    PROBE_LENGTH: float = float(os.getenv("PROBE_LENGTH", "0"))
+    
+    # Shared HTTP connection pools
+    HTTP_POOL_CONNECTIONS: int = int(os.getenv("HTTP_POOL_CONNECTIONS", "10"))  # Hosts kept pooled
+    HTTP_POOL_MAXSIZE: int = int(os.getenv("HTTP_POOL_MAXSIZE", "16"))  # Keep-alive connections per host
+    HTTP_CONNECT_TIMEOUT: float = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+    HTTP_READ_TIMEOUT: float = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+    # Connections kept open by the asyncio pipeline (all hosts)
+    HTTP_ASYNC_LIMIT: int = int(os.getenv("HTTP_ASYNC_LIMIT", "100"))
+    
+    # Provider rate limits: requests/second and burst (0 = unlimited)
+    ACRCLOUD_RATE_LIMIT: float = float(os.getenv("ACRCLOUD_RATE_LIMIT", "3"))
+    ACRCLOUD_RATE_BURST: int = int(os.getenv("ACRCLOUD_RATE_BURST", "3"))
+    AUDD_RATE_LIMIT: float = float(os.getenv("AUDD_RATE_LIMIT", "2"))
+    AUDD_RATE_BURST: int = int(os.getenv("AUDD_RATE_BURST", "2"))
+    SHAZAM_RATE_LIMIT: float = float(os.getenv("SHAZAM_RATE_LIMIT", "2"))
+    SHAZAM_RATE_BURST: int = int(os.getenv("SHAZAM_RATE_BURST", "2"))
+    SONGFINDER_RATE_LIMIT: float = float(os.getenv("SONGFINDER_RATE_LIMIT", "2"))
+    SONGFINDER_RATE_BURST: int = int(os.getenv("SONGFINDER_RATE_BURST", "2"))
+    # Retries for throttled (429 / Retry-After) requests
+    RATE_LIMIT_MAX_RETRIES: int = int(os.getenv("RATE_LIMIT_MAX_RETRIES", "4"))
+    RATE_LIMIT_BACKOFF_BASE: float = float(os.getenv("RATE_LIMIT_BACKOFF_BASE", "1.0"))
+    RATE_LIMIT_BACKOFF_MAX: float = float(os.getenv("RATE_LIMIT_BACKOFF_MAX", "30"))
+    
+    # Circuit breaker: open after N consecutive failures (or one auth error),
+    # probe again after the reset timeout
+    CIRCUIT_FAILURE_THRESHOLD: int = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+    CIRCUIT_RESET_TIMEOUT: float = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "60"))
+    
+    # Upload encoding per recognizer (wav, wav16k, wav8k, mp3, opus, vorbis)
+    ACRCLOUD_UPLOAD_CODEC: str = os.getenv("ACRCLOUD_UPLOAD_CODEC", "wav8k")
+    AUDD_UPLOAD_CODEC: str = os.getenv("AUDD_UPLOAD_CODEC", "mp3")
+    SHAZAM_UPLOAD_CODEC: str = os.getenv("SHAZAM_UPLOAD_CODEC", "wav")
+    SONGFINDER_UPLOAD_CODEC: str = os.getenv("SONGFINDER_UPLOAD_CODEC", "mp3")
+    
+    # Recognition result cache (SQLite, keyed by segment audio hash + provider)
+    RESULT_CACHE_ENABLED: bool = os.getenv("RESULT_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+    RESULT_CACHE_PATH: Optional[str] = os.getenv("RESULT_CACHE_PATH")
+    RESULT_CACHE_TTL_HOURS: float = float(os.getenv("RESULT_CACHE_TTL_HOURS", "168"))
+    RESULT_CACHE_MAX_ENTRIES: int = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "50000"))
+    
+    # Fingerprint cache (SQLite): answers for segments of earlier mixes whose
+    # audio lines up with a new segment, even when cut at another offset
+    FINGERPRINT_CACHE_ENABLED: bool = os.getenv("FINGERPRINT_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+    FINGERPRINT_CACHE_PATH: Optional[str] = os.getenv("FINGERPRINT_CACHE_PATH")
+    FINGERPRINT_CACHE_TTL_HOURS: float = float(os.getenv("FINGERPRINT_CACHE_TTL_HOURS", "720"))
+    FINGERPRINT_CACHE_MAX_SEGMENTS: int = int(os.getenv("FINGERPRINT_CACHE_MAX_SEGMENTS", "10000"))
+    FINGERPRINT_CACHE_MIN_COVERAGE: float = float(os.getenv("FINGERPRINT_CACHE_MIN_COVERAGE", "0.5"))  # Share of the segment that must match
+    
+    # Repeat detection: segments whose audio matches one already recognized in
+    # the same mix (overlap, loops) reuse its result without an API call
+    REPEAT_INDEX_ENABLED: bool = os.getenv("REPEAT_INDEX_ENABLED", "true").lower() in ("1", "true", "yes")
+    REPEAT_MIN_COVERAGE: float = float(os.getenv("REPEAT_MIN_COVERAGE", "0.6"))  # Share of the segment that must match
+    
+    # Local reference library: fingerprint index of our own tracks, asked
+    # before any API (build it with edm-index; unset = no local matching)
+    LOCAL_INDEX_DIR: Optional[str] = os.getenv("LOCAL_INDEX_DIR")
+    LOCAL_MIN_VOTES: int = int(os.getenv("LOCAL_MIN_VOTES", "20"))  # Aligned hash hits for a match
+    LOCAL_MIN_COVERAGE: float = float(os.getenv("LOCAL_MIN_COVERAGE", "0.5"))  # Share of the segment that must match
+    # Largest pitch/tempo change searched for segments that don't match as is
+    # (0.08 = +/-8%). Off by default: the search costs ~0.8 s per segment the
+    # library doesn't have, which is every segment that goes on to the APIs
+    LOCAL_MAX_STRETCH: float = float(os.getenv("LOCAL_MAX_STRETCH", "0"))
+    
+    # Provider scheduler (orders providers by learned hit rate, latency and cost)
+    SCHEDULER_ENABLED: bool = os.getenv("SCHEDULER_ENABLED", "true").lower() in ("1", "true", "yes")
+    PROVIDER_STATS_PATH: Optional[str] = os.getenv("PROVIDER_STATS_PATH")
+    # Seconds of latency one dollar of API spend is worth (0 = order by time only)
+    SCHEDULER_COST_WEIGHT: float = float(os.getenv("SCHEDULER_COST_WEIGHT", "0"))
+    ACRCLOUD_COST_PER_CALL: float = float(os.getenv("ACRCLOUD_COST_PER_CALL", "0"))
+    AUDD_COST_PER_CALL: float = float(os.getenv("AUDD_COST_PER_CALL", "0"))
+    SHAZAM_COST_PER_CALL: float = float(os.getenv("SHAZAM_COST_PER_CALL", "0"))
+    SONGFINDER_COST_PER_CALL: float = float(os.getenv("SONGFINDER_COST_PER_CALL", "0"))
+    
+    # Decoded PCM cache (memory-mapped, keyed by source file hash). On for
+    # the CLI, which re-runs the same mix; web uploads are one-shot, so the
+    # web app only writes it when WEB_PCM_CACHE_ENABLED is set as well
+    PCM_CACHE_ENABLED: bool = os.getenv("PCM_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+    WEB_PCM_CACHE_ENABLED: bool = os.getenv("WEB_PCM_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+    PCM_CACHE_DIR: Optional[str] = os.getenv("PCM_CACHE_DIR")
+    PCM_CACHE_MAX_MB: int = int(os.getenv("PCM_CACHE_MAX_MB", "512"))
+    
+    # Uploads whose decoded audio (SAMPLE_RATE mono 16-bit, ~150 MB per hour)
+    # would exceed this are streamed through a ring buffer instead of decoded
+    # whole - constant memory, but grid segments only and no screening
+    MAX_DECODE_MB: int = int(os.getenv("MAX_DECODE_MB", "200"))
+    # Largest accepted upload (spooled to disk; a 4 h set at 128 kbps is ~230 MB)
+    MAX_UPLOAD_MB: int = int(os.getenv("MAX_UPLOAD_MB", "250"))
+    
+    # Decoding backend: auto (libsndfile in-process for WAV/FLAC/OGG/MP3,
+    # FFmpeg for other containers) or ffmpeg (always an FFmpeg subprocess)
+    DECODER_BACKEND: str = os.getenv("DECODER_BACKEND", "auto").lower()
     
     @classmethod
     def validate(cls) -> tuple[bool, list[str]]:
-        """Validate that required API keys are set"""
+        """Validate that required API keys are set (a local reference index can stand in for them)"""
         errors = []
         
+        if cls.LOCAL_INDEX_DIR:
+            return True, errors
+        
         if not cls.ACRCLOUD_ACCESS_KEY:
             errors.append("ACRCLOUD_ACCESS_KEY not set")
         if not cls.ACRCLOUD_SECRET_KEY:
@@ -0,0 +1,230 @@
+"""Persistent cache of recognized segments, matched by audio fingerprint across mixes (SQLite)"""
+
+import os
+import json
+import time
+import sqlite3
+import tempfile
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from .config import Config
+from ..fingerprint import best_alignment, coverage, runner_up_votes, sample_hashes
+
+QUERY_CHUNK = 500  # Hashes per SELECT (stays under SQLite's bound-parameter limit)
+MIN_MARGIN = 10.0  # A match needs this many times the aligned votes of any other track
+
+
+class FingerprintCache:
+    """
+    Map segment fingerprints to the answer the APIs gave for them
+
+    The result cache only helps when the exact same samples come back (a
+    re-run of the same file). The same popular tracks turn up in many
+    different mixes, cut at other offsets and mixed over other audio, so
+    this cache stores a compact fingerprint (a fixed 1/keep_one_in of
+    the peak-pair hashes) of every confidently recognized segment and
+    matches new segments against all of them by offset voting.
+
+    Entries expire after ttl seconds and the least recently matched ones
+    are evicted once max_segments is exceeded. SQLite in WAL mode lets
+    several gunicorn workers share the same file.
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl: float = 30 * 24 * 3600, max_segments: int = 10000,
+                 keep_one_in: int = 8, min_votes: int = 10, min_coverage: float = 0.5):
+        """
+        Args:
+            path: SQLite file (defaults to a file in the temp dir)
+            ttl: Seconds before an entry expires
+            max_segments: Maximum cached segments before LRU eviction
+            keep_one_in: Hashes stored and looked up per hash of the fingerprint
+            min_votes: Aligned (sampled) hash hits needed for a match
+            min_coverage: Share of the segment's seconds the aligned hits must cover
+        """
+        self.path = path or os.path.join(tempfile.gettempdir(), 'edm_fingerprint_cache.sqlite3')
+        self.ttl = ttl
+        self.max_segments = max_segments
+        self.keep_one_in = keep_one_in
+        self.min_votes = min_votes
+        self.min_coverage = min_coverage
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS segments ('
+            ' id INTEGER PRIMARY KEY,'
+            ' identity TEXT NOT NULL,'  # Lower-case "artist|title" - copies of one track don't compete
+            ' result TEXT NOT NULL,'  # JSON RecognitionResult
+            ' created REAL NOT NULL,'
+            ' accessed REAL NOT NULL)'
+        )
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS postings ('
+            ' hash INTEGER NOT NULL,'
+            ' segment_id INTEGER NOT NULL,'
+            ' frame INTEGER NOT NULL,'
+            ' PRIMARY KEY (hash, segment_id, frame)) WITHOUT ROWID'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS postings_segment ON postings (segment_id)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS segments_accessed ON segments (accessed)')
+        self._conn.commit()
+        self._puts = 0
+
+        # Counters for this process
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+
+    def get(self, fp: Tuple[np.ndarray, np.ndarray], duration: float, sample_rate: int) -> Optional[Dict[str, Any]]:
+        """
+        Answer cached for a segment with the same audio, from any mix
+
+        Args:
+            fp: fingerprint() of the segment's audio
+            duration: Seconds of audio fingerprinted
+            sample_rate: Sample rate it was fingerprinted at
+
+        Returns:
+            RecognitionResult field dict, or None without a confident match
+        """
+        hashes, frames = sample_hashes(*fp, self.keep_one_in)
+        now = time.time()
+        rows = []
+        with self._lock:
+            unique = np.unique(hashes).tolist()
+            for i in range(0, len(unique), QUERY_CHUNK):
+                chunk = unique[i:i + QUERY_CHUNK]
+                rows.extend(self._conn.execute(
+                    'SELECT hash, segment_id, frame FROM postings WHERE hash IN (%s)' % ','.join('?' * len(chunk)),
+                    chunk
+                ).fetchall())
+
+        match = None
+        if rows:
+            ref_hashes, ref_ids, ref_frames = (np.array(column, dtype=np.int64) for column in zip(*rows))
+            # Pair every posting with each query frame that has its hash
+            order = np.argsort(hashes, kind='stable')
+            query_hashes, query_frames = hashes[order].astype(np.int64), frames[order].astype(np.int64)
+            left = np.searchsorted(query_hashes, ref_hashes, side='left')
+            counts = np.searchsorted(query_hashes, ref_hashes, side='right') - left
+            starts = np.repeat(left - np.concatenate(([0], np.cumsum(counts)[:-1])), counts)
+            hit_frames = query_frames[starts + np.arange(counts.sum())]
+            ref_ids, ref_frames = np.repeat(ref_ids, counts), np.repeat(ref_frames, counts)
+            match = self._best_match(hit_frames, ref_ids, ref_frames, duration, sample_rate, now)
+
+        with self._lock:
+            if match is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute('UPDATE segments SET accessed = ? WHERE id = ?', (now, match[0]))
+            self._conn.commit()
+        return json.loads(match[1])
+
+    def _best_match(self, query_frames: np.ndarray, ref_ids: np.ndarray, ref_frames: np.ndarray, duration: float,
+                    sample_rate: int, now: float) -> Optional[Tuple[int, str]]:
+        """(segment id, result JSON) of the best accepted alignment, or None"""
+        best = best_alignment(query_frames, ref_ids, ref_frames)
+        if best is None:
+            return None
+        segment_id, _, agreeing = best
+        if len(agreeing) < self.min_votes or coverage(agreeing, sample_rate, duration) < self.min_coverage:
+            return None
+        candidates = np.unique(ref_ids).tolist()
+        with self._lock:
+            segments = {}
+            for i in range(0, len(candidates), QUERY_CHUNK):
+                chunk = candidates[i:i + QUERY_CHUNK]
+                segments.update((row[0], row[1:]) for row in self._conn.execute(
+                    'SELECT id, identity, result, created FROM segments WHERE id IN (%s)' % ','.join('?' * len(chunk)),
+                    chunk
+                ))
+        if segment_id not in segments or now - segments[segment_id][2] > self.ttl:
+            return None
+        identity = segments[segment_id][0]
+        same = np.array([segments.get(i, (identity,))[0] == identity for i in candidates])[np.searchsorted(candidates, ref_ids)]
+        if len(agreeing) < MIN_MARGIN * runner_up_votes(query_frames, ref_ids, ref_frames, agreeing, same):
+            return None
+        return segment_id, segments[segment_id][1]
+
+    def put(self, fp: Tuple[np.ndarray, np.ndarray], result: Dict[str, Any]):
+        """Store the fingerprint of a confidently recognized segment with its answer"""
+        hashes, frames = sample_hashes(*fp, self.keep_one_in)
+        if len(hashes) == 0:
+            return
+        identity = f"{str(result.get('artist') or '').lower().strip()}|{str(result.get('title') or '').lower().strip()}"
+        payload = json.dumps(result, default=str)
+        now = time.time()
+        with self._lock:
+            segment_id = self._conn.execute(
+                'INSERT INTO segments (identity, result, created, accessed) VALUES (?, ?, ?, ?)',
+                (identity, payload, now, now)
+            ).lastrowid
+            self._conn.executemany(
+                'INSERT OR IGNORE INTO postings (hash, segment_id, frame) VALUES (?, ?, ?)',
+                ((h, segment_id, f) for h, f in zip(hashes.tolist(), frames.tolist()))
+            )
+            self.stored += 1
+            self._puts += 1
+            # Checking the size on every insert is wasteful; every 100 is plenty
+            if self._puts % 100 == 0:
+                self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        """Drop expired segments, then least recently matched ones over max_segments"""
+        stale = [row[0] for row in self._conn.execute('SELECT id FROM segments WHERE created < ?', (now - self.ttl,))]
+        count = self._conn.execute('SELECT COUNT(*) FROM segments').fetchone()[0] - len(stale)
+        if count > self.max_segments:
+            stale += [row[0] for row in self._conn.execute(
+                'SELECT id FROM segments WHERE created >= ? ORDER BY accessed LIMIT ?',
+                (now - self.ttl, count - self.max_segments)
+            )]
+        for i in range(0, len(stale), QUERY_CHUNK):
+            chunk = stale[i:i + QUERY_CHUNK]
+            placeholders = ','.join('?' * len(chunk))
+            self._conn.execute('DELETE FROM postings WHERE segment_id IN (%s)' % placeholders, chunk)
+            self._conn.execute('DELETE FROM segments WHERE id IN (%s)' % placeholders, chunk)
+
+    def stats(self) -> dict:
+        """Hit/miss counters for this process plus the number of cached segments"""
+        with self._lock:
+            segments = self._conn.execute('SELECT COUNT(*) FROM segments').fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            'segments': segments,
+            'hits': self.hits,
+            'misses': self.misses,
+            'stored': self.stored,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+_cache: Optional[FingerprintCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_fingerprint_cache() -> Optional[FingerprintCache]:
+    """Process-wide fingerprint cache, or None when disabled"""
+    global _cache
+    if not Config.FINGERPRINT_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                try:
+                    _cache = FingerprintCache(
+                        Config.FINGERPRINT_CACHE_PATH,
+                        ttl=Config.FINGERPRINT_CACHE_TTL_HOURS * 3600,
+                        max_segments=Config.FINGERPRINT_CACHE_MAX_SEGMENTS,
+                        min_coverage=Config.FINGERPRINT_CACHE_MIN_COVERAGE
+                    )
+                except sqlite3.Error as e:
+                    print(f"[FingerprintCache] Disabled: {e}")
+                    Config.FINGERPRINT_CACHE_ENABLED = False
+                    return None
+    return _cache
@@ -0,0 +1,147 @@
+"""Shared HTTP sessions with keep-alive connection pools"""
+
+import asyncio
+import threading
+import weakref
+from http.cookiejar import DefaultCookiePolicy
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from .config import Config
+
+try:
+    import aiohttp
+except ImportError:  # Optional: post_async() falls back to a thread per request
+    aiohttp = None
+
+_session: Optional[requests.Session] = None
+_lock = threading.Lock()
+# One aiohttp session per event loop (sessions can't be shared across loops)
+_async_sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aiohttp.ClientSession]" = weakref.WeakKeyDictionary()
+
+
+def _build_session() -> requests.Session:
+    session = requests.Session()
+    # One pool per host, reused across segments, recognizers and web requests
+    adapter = HTTPAdapter(
+        pool_connections=Config.HTTP_POOL_CONNECTIONS,
+        pool_maxsize=Config.HTTP_POOL_MAXSIZE,
+        max_retries=0
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    # No API we call needs cookies; blocking them keeps the shared session
+    # free of per-request state so worker threads can use it concurrently
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    return session
+
+
+def get_session() -> requests.Session:
+    """Process-wide session (created lazily, so each gunicorn worker gets its own after fork)"""
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def reset_session():
+    """Close pooled connections and start over with the current Config"""
+    global _session
+    with _lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+
+
+def post(url: str, timeout=None, **kwargs) -> requests.Response:
+    """
+    POST through the shared session
+
+    Args:
+        url: Request URL
+        timeout: Seconds or (connect, read) tuple; defaults to HTTP_CONNECT_TIMEOUT/HTTP_READ_TIMEOUT
+        **kwargs: Passed through to requests
+    """
+    if timeout is None:
+        timeout = (Config.HTTP_CONNECT_TIMEOUT, Config.HTTP_READ_TIMEOUT)
+    return get_session().post(url, timeout=timeout, **kwargs)
+
+
+def _split_timeout(timeout):
+    if timeout is None:
+        return Config.HTTP_CONNECT_TIMEOUT, Config.HTTP_READ_TIMEOUT
+    if isinstance(timeout, tuple):
+        return timeout
+    return timeout, timeout
+
+
+def _get_async_session() -> "aiohttp.ClientSession":
+    loop = asyncio.get_running_loop()
+    session = _async_sessions.get(loop)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(limit=Config.HTTP_ASYNC_LIMIT, limit_per_host=0)
+        session = _async_sessions[loop] = aiohttp.ClientSession(
+            connector=connector,
+            cookie_jar=aiohttp.DummyCookieJar()
+        )
+    return session
+
+
+def _form_data(data: Optional[dict], files: Optional[dict]) -> "aiohttp.FormData":
+    """requests-style data/files as a multipart form"""
+    form = aiohttp.FormData()
+    for name, value in (data or {}).items():
+        form.add_field(name, value)
+    for name, (filename, content, content_type) in files.items():
+        form.add_field(name, content, filename=filename, content_type=content_type)
+    return form
+
+
+async def post_async(url: str, timeout=None, data: Optional[dict] = None, files: Optional[dict] = None,
+                     json=None, headers: Optional[dict] = None) -> requests.Response:
+    """
+    POST without blocking the event loop
+
+    Takes the same arguments as post() and returns a requests.Response, so
+    callers parse answers and handle HTTP errors exactly as in the sync path.
+    Uses aiohttp when installed, otherwise runs post() in a worker thread.
+
+    Args:
+        url: Request URL
+        timeout: Seconds or (connect, read) tuple; defaults to HTTP_CONNECT_TIMEOUT/HTTP_READ_TIMEOUT
+        data: Form fields
+        files: {field: (filename, bytes, content_type)} sent as multipart
+        json: JSON body
+        headers: Extra headers
+    """
+    if aiohttp is None:
+        return await asyncio.to_thread(post, url, timeout=timeout, data=data, files=files, json=json, headers=headers)
+
+    connect, read = _split_timeout(timeout)
+    body = _form_data(data, files) if files else data
+    async with _get_async_session().post(
+        url, data=body, json=json, headers=headers,
+        timeout=aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)
+    ) as resp:
+        content = await resp.read()
+
+    response = requests.Response()
+    response.status_code = resp.status
+    response.reason = resp.reason
+    response.url = str(resp.url)
+    response.headers = CaseInsensitiveDict(resp.headers)
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    response._content = content
+    return response
+
+
+async def close_async_session():
+    """Close the current event loop's session (call before the loop ends)"""
+    session = _async_sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None:
+        await session.close()
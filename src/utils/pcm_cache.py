@@ -0,0 +1,123 @@
+"""Persistent on-disk cache of decoded PCM"""
+
+import os
+import hashlib
+import tempfile
+import numpy as np
+from typing import Optional
+
+
+class PCMCache:
+    """
+    Cache decoded mono PCM as raw int16 files keyed by source content hash
+
+    Files are plain little-endian int16 samples so later runs can map them
+    with np.memmap instead of decoding again. Total size is capped and the
+    least recently used entries are evicted first (file mtime is the access
+    clock, bumped on every hit).
+    """
+
+    DTYPE = np.dtype('<i2')
+    SUFFIX = '.pcm'
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = 1024 * 1024 * 1024):
+        """
+        Initialize PCM cache
+
+        Args:
+            cache_dir: Directory for cache files (defaults to a folder in the temp dir)
+            max_bytes: Maximum total size of cached PCM in bytes
+        """
+        self.cache_dir = cache_dir or os.path.join(tempfile.gettempdir(), 'edm_pcm_cache')
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def file_hash(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+        """SHA-256 of the file contents (streamed, constant memory)"""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def key_for(self, file_path: str, sample_rate: int) -> str:
+        """Cache key for a source file decoded at the given sample rate"""
+        return f"{self.file_hash(file_path)}_{sample_rate}"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + self.SUFFIX)
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """Map cached PCM read-only, or return None on a miss"""
+        path = self._path(key)
+        try:
+            if os.path.getsize(path) == 0:
+                return None
+            os.utime(path)  # Mark as recently used
+            return np.memmap(path, dtype=self.DTYPE, mode='r')
+        except OSError:
+            return None
+
+    def put(self, key: str, pcm: np.ndarray) -> np.ndarray:
+        """
+        Store PCM and return a read-only memory map of the stored copy
+
+        Falls back to returning the input if the entry cannot be written
+        (e.g. it is larger than the cache or the disk is full).
+        """
+        pcm = np.ascontiguousarray(pcm, dtype=self.DTYPE)
+        if pcm.nbytes == 0 or pcm.nbytes > self.max_bytes:
+            return pcm
+
+        self._evict(self.max_bytes - pcm.nbytes)
+
+        path = self._path(key)
+        fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pcm.tofile(f)
+            # Atomic rename so concurrent workers never map a partial file
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"[PCMCache] Could not write cache entry: {e}")
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            return pcm
+
+        return np.memmap(path, dtype=self.DTYPE, mode='r')
+
+    def _entries(self) -> list[tuple[float, int, str]]:
+        """(mtime, size, path) for every cache file, oldest first"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(self.SUFFIX):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        entries.sort()
+        return entries
+
+    def size(self) -> int:
+        """Total bytes currently cached"""
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self, budget: int):
+        """Delete least recently used entries until total size fits in budget"""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= budget:
+                break
+            try:
+                # Open memmaps keep working on POSIX after unlink
+                os.unlink(path)
+                total -= size
+            except OSError:
+                pass
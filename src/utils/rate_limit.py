@@ -0,0 +1,120 @@
+"""Per-provider rate limiting and retry backoff"""
+
+import time
+import random
+import asyncio
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+import requests
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket
+
+    Refills at `rate` tokens per second up to `burst`. pause() blocks every
+    caller until a deadline, which is how a provider's Retry-After is applied
+    to all worker threads at once instead of each one finding out by itself.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take a token if one is available; otherwise return seconds to wait"""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                return self._paused_until - now
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return 0.0
+            return (1.0 - self._tokens) / self.rate
+
+    def acquire(self):
+        """Block until a request may be sent"""
+        while (wait := self._reserve()) > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """Wait (without blocking the event loop) until a request may be sent"""
+        while (wait := self._reserve()) > 0:
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds: float):
+        """Hold all requests for the given number of seconds"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            # Resume with a single token so a burst doesn't hit the limit again
+            self._tokens = 1.0
+            self._updated = self._paused_until
+
+
+class RateLimitedError(Exception):
+    """Provider rejected the request for sending too fast"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+_buckets: Dict[str, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def get_limiter(provider: str, rate: float, burst: int) -> Optional[TokenBucket]:
+    """Process-wide bucket for a provider (None when rate is 0 = unlimited)"""
+    if not rate or rate <= 0:
+        return None
+    with _buckets_lock:
+        bucket = _buckets.get(provider)
+        if bucket is None:
+            bucket = _buckets[provider] = TokenBucket(rate, burst)
+        return bucket
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After header as seconds (accepts delta-seconds or an HTTP date)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def throttle_delay(error: Exception) -> Optional[float]:
+    """
+    Whether an error is a throttling response worth retrying
+
+    Returns:
+        Seconds requested by the provider (0.0 if it didn't say), or None if
+        the error is not a rate limit
+    """
+    if isinstance(error, RateLimitedError):
+        return error.retry_after or 0.0
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        status = error.response.status_code
+        retry_after = parse_retry_after(error.response.headers.get('Retry-After'))
+        if status == 429 or (status == 503 and retry_after is not None):
+            return retry_after or 0.0
+    return None
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Exponential backoff with jitter (half fixed, half random) for the given attempt"""
+    delay = min(cap, base * (2 ** attempt))
+    return delay / 2 + random.uniform(0, delay / 2)
@@ -0,0 +1,157 @@
+"""Persistent recognition result cache (SQLite)"""
+
+import os
+import json
+import time
+import sqlite3
+import tempfile
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from .config import Config
+
+
+class ResultCache:
+    """
+    Map (segment audio hash, provider) to the provider's answer
+
+    Answers are RecognitionResult field dicts, stored as JSON.
+
+    "No match" answers are cached too - they cost the same quota. Entries
+    expire after ttl seconds and the least recently used ones are evicted
+    once max_entries is exceeded. SQLite in WAL mode lets several gunicorn
+    workers share the same file.
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl: float = 7 * 24 * 3600, max_entries: int = 50000):
+        """
+        Initialize result cache
+
+        Args:
+            path: SQLite file (defaults to a file in the temp dir)
+            ttl: Seconds before an entry expires
+            max_entries: Maximum cached answers before LRU eviction
+        """
+        self.path = path or os.path.join(tempfile.gettempdir(), 'edm_result_cache.sqlite3')
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS results ('
+            ' audio_hash TEXT NOT NULL,'
+            ' provider TEXT NOT NULL,'
+            ' result TEXT,'  # JSON RecognitionResult, NULL for "no match"
+            ' latency REAL NOT NULL DEFAULT 0,'  # Seconds the original API call took
+            ' created REAL NOT NULL,'
+            ' accessed REAL NOT NULL,'
+            ' PRIMARY KEY (audio_hash, provider))'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)')
+        self._conn.commit()
+        self._puts = 0
+
+        # Counters for this process
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+        self.saved_seconds = 0.0
+
+    def get(self, audio_hash: str, provider: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """
+        Look up a cached answer
+
+        Returns:
+            (hit, result) - result is None on a miss or a cached "no match"
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT result, latency, created FROM results WHERE audio_hash = ? AND provider = ?',
+                (audio_hash, provider)
+            ).fetchone()
+            if row is None or now - row[2] > self.ttl:
+                if row is not None:
+                    self._conn.execute('DELETE FROM results WHERE audio_hash = ? AND provider = ?', (audio_hash, provider))
+                    self._conn.commit()
+                self.misses[provider] = self.misses.get(provider, 0) + 1
+                return False, None
+
+            self._conn.execute(
+                'UPDATE results SET accessed = ? WHERE audio_hash = ? AND provider = ?',
+                (now, audio_hash, provider)
+            )
+            self._conn.commit()
+            self.hits[provider] = self.hits.get(provider, 0) + 1
+            self.saved_seconds += row[1]
+
+        if row[0] is None:
+            return True, None
+        return True, json.loads(row[0])
+
+    def put(self, audio_hash: str, provider: str, result: Optional[Dict[str, Any]], latency: float = 0.0):
+        """Store a provider answer (None = no match)"""
+        payload = json.dumps(result, default=str) if result is not None else None
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO results (audio_hash, provider, result, latency, created, accessed)'
+                ' VALUES (?, ?, ?, ?, ?, ?)',
+                (audio_hash, provider, payload, latency, now, now)
+            )
+            self._puts += 1
+            # Checking the size on every insert is wasteful; every 100 is plenty
+            if self._puts % 100 == 0:
+                self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        """Drop expired entries, then least recently used ones over max_entries"""
+        self._conn.execute('DELETE FROM results WHERE created < ?', (now - self.ttl,))
+        count = self._conn.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+        if count > self.max_entries:
+            self._conn.execute(
+                'DELETE FROM results WHERE rowid IN (SELECT rowid FROM results ORDER BY accessed LIMIT ?)',
+                (count - self.max_entries,)
+            )
+
+    def stats(self) -> dict:
+        """Hit/miss counters for this process plus the number of stored entries"""
+        with self._lock:
+            entries = self._conn.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+        hits = sum(self.hits.values())
+        misses = sum(self.misses.values())
+        return {
+            'entries': entries,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses), 3) if hits + misses else 0.0,
+            'api_calls_saved': dict(self.hits),
+            'api_seconds_saved': round(self.saved_seconds, 1),
+        }
+
+
+_cache: Optional[ResultCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> Optional[ResultCache]:
+    """Process-wide result cache, or None when disabled"""
+    global _cache
+    if not Config.RESULT_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                try:
+                    _cache = ResultCache(
+                        Config.RESULT_CACHE_PATH,
+                        ttl=Config.RESULT_CACHE_TTL_HOURS * 3600,
+                        max_entries=Config.RESULT_CACHE_MAX_ENTRIES
+                    )
+                except sqlite3.Error as e:
+                    print(f"[ResultCache] Disabled: {e}")
+                    Config.RESULT_CACHE_ENABLED = False
+                    return None
+    return _cache
@@ -48,26 +48,53 @@ def merge_results(results: list[RecognitionResult], start_time: float, end_time:
     
     # Only use AI if results conflict (different tracks from different APIs)
     # This is much faster - AI only called when needed
-    if use_ai and len(valid_results) > 1:
-        # Check if results conflict (different artist/title)
-        artists = set(r.artist.lower().strip() if r.artist else "" for r in valid_results)
-        titles = set(r.title.lower().strip() if r.title else "" for r in valid_results)
-        
-        # Only use AI if there's actual conflict
-        if len(artists) > 1 or len(titles) > 1:
-            try:
-                from ..ai.orchestrator import AIOrchestrator
-                orchestrator = AIOrchestrator()
-                if orchestrator.is_available():
-                    valid_results = orchestrator.validate_and_rank_results(valid_results)
-                    print(f"[AI] Resolved conflict: {len(valid_results)} results")
-            except Exception as e:
-                print(f"[AI] Unavailable: {e}, using confidence-based selection")
+    if use_ai and _results_conflict(valid_results):
+        try:
+            from ..ai.orchestrator import AIOrchestrator
+            orchestrator = AIOrchestrator()
+            if orchestrator.is_available():
+                valid_results = orchestrator.validate_and_rank_results(valid_results)
+                print(f"[AI] Resolved conflict: {len(valid_results)} results")
+        except Exception as e:
+            print(f"[AI] Unavailable: {e}, using confidence-based selection")
     
+    return _track_dict(valid_results, start_time, end_time)
+
+
+async def merge_results_async(results: list[RecognitionResult], start_time: float, end_time: float, confidence_threshold: float, use_ai: bool = False) -> Optional[dict]:
+    """Async merge_results() - the AI call doesn't block the event loop"""
+    valid_results = [r for r in results if r and r.confidence >= confidence_threshold]
+    
+    if not valid_results:
+        return None
+    
+    if use_ai and _results_conflict(valid_results):
+        try:
+            from ..ai.orchestrator import AIOrchestrator
+            orchestrator = AIOrchestrator()
+            if orchestrator.is_available():
+                valid_results = await orchestrator.validate_and_rank_results_async(valid_results)
+                print(f"[AI] Resolved conflict: {len(valid_results)} results")
+        except Exception as e:
+            print(f"[AI] Unavailable: {e}, using confidence-based selection")
+    
+    return _track_dict(valid_results, start_time, end_time)
+
+
+def _results_conflict(valid_results: list[RecognitionResult]) -> bool:
+    """Whether results name different tracks (different artist/title)"""
+    if len(valid_results) <= 1:
+        return False
+    artists = set(r.artist.lower().strip() if r.artist else "" for r in valid_results)
+    titles = set(r.title.lower().strip() if r.title else "" for r in valid_results)
+    return len(artists) > 1 or len(titles) > 1
+
+
+def _track_dict(valid_results: list[RecognitionResult], start_time: float, end_time: float) -> dict:
     # Get best result (AI-validated if conflict, otherwise highest confidence)
     best_result = valid_results[0] if valid_results else max(valid_results, key=lambda r: r.confidence)
     
-    return {
+    track = {
         "start_time": format_time(start_time),
         "end_time": format_time(end_time),
         "artist": best_result.artist or "Unknown Artist",
@@ -75,4 +102,26 @@ def merge_results(results: list[RecognitionResult], start_time: float, end_time:
         "confidence": best_result.confidence,
         "source": best_result.source
     }
+    # Every answer came from the fingerprint or result cache - no provider was asked
+    if all((r.metadata or {}).get("fingerprint_cache") or (r.metadata or {}).get("result_cache") for r in valid_results):
+        track["cached"] = True
+    return track
 
+
+def track_identity(track: Optional[dict]) -> Optional[tuple]:
+    """Comparable (artist, title) of a merged track, None if no track"""
+    if not track:
+        return None
+    return (str(track.get("artist", "")).lower().strip(), str(track.get("title", "")).lower().strip())
+
+
+def track_reused(track: Optional[dict]) -> bool:
+    """Whether a processed window was answered without an API call (repeat of earlier audio, or cached)"""
+    return bool(track and (track.get("inferred") or track.get("cached")))
+
+
+def infer_track(track: Optional[dict], start_time: float, end_time: float) -> Optional[dict]:
+    """A neighbouring window's track moved to this window (not sent to any provider)"""
+    if not track:
+        return None
+    return {**track, "start_time": format_time(start_time), "end_time": format_time(end_time), "inferred": True}
@@ -0,0 +1,99 @@
+"""Tests for the PCM ring buffer and streamed segment extraction"""
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from benchmarks.common import synth_track
+from src import audio_processor
+from src.audio_processor import AudioProcessor, PCMRing, SegmentStream
+
+SR = AudioProcessor.SAMPLE_RATE
+
+
+def test_ring_wraps_and_keeps_the_newest_samples():
+    ring = PCMRing(10)
+    stream = np.arange(1, 26, dtype=np.int16)
+    for i in range(0, len(stream), 7):
+        ring.write(stream[i:i + 7])
+
+    assert (ring.start, ring.end) == (15, 25)
+    assert np.array_equal(ring.read(15, 25), stream[15:25])
+    assert np.array_equal(ring.read(18, 22), stream[18:22])
+    assert len(ring.read(20, 20)) == 0
+
+
+def test_ring_rejects_samples_it_no_longer_holds():
+    ring = PCMRing(10)
+    ring.write(np.arange(8, dtype=np.int16))
+    ring.write(np.arange(8, dtype=np.int16))
+
+    with pytest.raises(IndexError):
+        ring.read(5, 10)  # Overwritten
+    with pytest.raises(IndexError):
+        ring.read(10, 17)  # Not written yet
+    with pytest.raises(ValueError):
+        ring.write(np.zeros(11, dtype=np.int16))
+
+
+@pytest.fixture(scope='module')
+def mix(tmp_path_factory):
+    """Path and samples of a 100 s int16 WAV mix"""
+    y = (synth_track(100, SR, seed=7) * 32767).astype(np.int16)
+    path = str(tmp_path_factory.mktemp('audio') / 'mix.wav')
+    sf.write(path, y, SR, subtype='PCM_16')
+    return path, y
+
+
+@pytest.mark.parametrize('probe_length', [None, 10.0])
+def test_stream_matches_single_decode(mix, probe_length):
+    path, _ = mix
+    processor = AudioProcessor(segment_length=30, segment_overlap=10, probe_length=probe_length)
+    segments = processor.segment_audio(path)
+    # A window past the end of the file (the duration estimate ran long)
+    segments.append((95.0, 110.0))
+    streamed = dict(processor.stream_segments(path, segments))
+
+    assert sorted(streamed) == list(range(len(segments)))
+    for index, (start, end) in enumerate(segments):
+        expected = processor.load_segment(path, start, end - start)
+        assert np.array_equal(streamed[index].samples, expected.samples)
+        assert streamed[index].offset == expected.offset
+
+
+class RecordingRing(PCMRing):
+    """PCMRing that remembers the capacity it was created with"""
+
+    capacities = []
+
+    def __init__(self, capacity):
+        RecordingRing.capacities.append(capacity)
+        super().__init__(capacity)
+
+
+def test_stream_ring_holds_one_window(mix, monkeypatch):
+    path, _ = mix
+    monkeypatch.setattr(audio_processor, 'PCMRing', RecordingRing)
+    monkeypatch.setattr(RecordingRing, 'capacities', [])
+    processor = AudioProcessor(segment_length=30, segment_overlap=10)
+    list(processor.stream_segments(path, processor.segment_audio(path)))
+
+    assert RecordingRing.capacities == [int((30 + AudioProcessor.STREAM_CHUNK_SECONDS) * SR)]
+
+
+def test_segment_stream_seeks_for_windows_it_has_passed(mix):
+    path, y = mix
+    processor = AudioProcessor(segment_length=30, segment_overlap=10, single_decode=False)
+    segments = processor.segment_audio(path)
+    stream = SegmentStream(processor, path, segments, lookahead=1)
+
+    def window(index):
+        start, end = segments[index]
+        return y[int(start * SR):int(end * SR)]
+
+    # In order, then back past the lookahead (adaptive sampling bisecting a gap)
+    for index in (0, 1, 4, 2, 3):
+        assert np.array_equal(stream.get(index).samples, window(index))
+    # Window 3 was kept as lookahead; window 2 fell out of it
+    assert stream.stats() == {'streamed': 4, 'seeked': 1}
+    stream.close()
@@ -0,0 +1,81 @@
+"""Tests for per-provider circuit breakers"""
+
+import pytest
+
+from src.utils import circuit_breaker
+from src.utils.circuit_breaker import CircuitBreaker
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(circuit_breaker.time, 'monotonic', lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def breaker(clock):
+    return CircuitBreaker('test', failure_threshold=3, reset_timeout=60)
+
+
+def fail(breaker: CircuitBreaker, times: int = 1, trip: bool = False):
+    for _ in range(times):
+        breaker.record_failure(RuntimeError('boom'), trip=trip)
+
+
+def test_opens_after_consecutive_failures(breaker):
+    fail(breaker, 2)
+    assert breaker.allow()
+    fail(breaker)
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    assert breaker.snapshot()['rejected_calls'] == 1
+
+
+def test_success_resets_the_count(breaker):
+    fail(breaker, 2)
+    breaker.record_success()
+    fail(breaker, 2)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_auth_errors_trip_immediately(breaker):
+    fail(breaker, trip=True)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_half_open_lets_one_probe_through(breaker, clock):
+    fail(breaker, 3)
+    clock[0] += 59
+    assert not breaker.allow()
+    assert breaker.snapshot()['retry_in_seconds'] == 1.0
+
+    clock[0] += 1
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()  # Only one probe at a time
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+
+def test_failed_probe_reopens(breaker, clock):
+    fail(breaker, 3)
+    clock[0] += 60
+    assert breaker.allow()
+    fail(breaker)
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    clock[0] += 60
+    assert breaker.allow()
+
+
+def test_released_probe_can_be_retried(breaker, clock):
+    fail(breaker, 3)
+    clock[0] += 60
+    assert breaker.allow()
+    breaker.release()  # Cancelled by fan-out before answering
+    assert breaker.allow()
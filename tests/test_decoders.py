@@ -0,0 +1,126 @@
+"""Tests for the audio decoding backends"""
+
+import os
+import shutil
+import threading
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from benchmarks.common import synth_track
+from src.decoders import FFmpegDecoder, SoundfileDecoder
+
+SR = 22050
+
+
+def write_wav(path, seconds: float = 20.0, seed: int = 0, sample_rate: int = SR, channels: int = 1) -> np.ndarray:
+    """Write a synthetic int16 WAV and return its samples"""
+    y = (synth_track(seconds, sample_rate, seed=seed) * 32767).astype(np.int16)
+    if channels > 1:
+        y = np.column_stack([y] * channels)
+    sf.write(str(path), y, sample_rate, subtype='PCM_16')
+    return y
+
+
+def test_int16_wav_round_trips_exactly(tmp_path):
+    y = write_wav(tmp_path / 'mix.wav')
+    decoder = SoundfileDecoder()
+
+    assert decoder.duration(str(tmp_path / 'mix.wav')) == pytest.approx(20.0)
+    assert np.array_equal(decoder.read(str(tmp_path / 'mix.wav'), SR), y)
+    window = decoder.read(str(tmp_path / 'mix.wav'), SR, start=4.5, duration=6.5)
+    assert np.array_equal(window, y[int(4.5 * SR):int(11.0 * SR)])
+
+
+def test_downmixes_and_resamples(tmp_path):
+    write_wav(tmp_path / 'stereo.wav', seconds=10.0, sample_rate=44100, channels=2)
+    samples = SoundfileDecoder().read(str(tmp_path / 'stereo.wav'), SR)
+
+    assert samples.dtype == np.int16 and samples.ndim == 1
+    assert abs(len(samples) - 10 * SR) <= 1
+
+
+def test_supports_keeps_the_probed_handle(tmp_path):
+    write_wav(tmp_path / 'mix.wav', seconds=2.0)
+    (tmp_path / 'notes.txt').write_text('not audio')
+    (tmp_path / 'broken.wav').write_bytes(b'not a wav file')
+    decoder = SoundfileDecoder()
+
+    assert not decoder.supports(str(tmp_path / 'notes.txt'))
+    assert not decoder.supports(str(tmp_path / 'broken.wav'))
+    assert decoder.supports(str(tmp_path / 'mix.wav'))
+    handle = decoder._files[str(tmp_path / 'mix.wav')].handle
+    decoder.read(str(tmp_path / 'mix.wav'), SR)
+    assert decoder._files[str(tmp_path / 'mix.wav')].handle is handle
+    decoder.close()
+    assert handle.closed
+
+
+def test_evicted_handle_stays_open_for_its_reader(tmp_path):
+    first = write_wav(tmp_path / 'first.wav', seed=1)
+    second = write_wav(tmp_path / 'second.wav', seed=2)
+    decoder = SoundfileDecoder(max_open=1)
+
+    blocks = decoder.blocks(str(tmp_path / 'first.wav'), SR)
+    head = next(blocks)
+    handle = decoder._files[str(tmp_path / 'first.wav')].handle
+    # Opening another file evicts the first while its reader is mid-stream
+    assert np.array_equal(decoder.read(str(tmp_path / 'second.wav'), SR), second)
+    assert not handle.closed
+    rest = list(blocks)
+    assert np.array_equal(np.concatenate([head] + rest), first)
+    assert handle.closed
+    assert list(decoder._files) == [str(tmp_path / 'second.wav')]
+
+
+def test_concurrent_reads_under_eviction(tmp_path):
+    tracks = {str(tmp_path / f"track{k}.wav"): write_wav(tmp_path / f"track{k}.wav", seconds=12.0, seed=k)
+              for k in range(3)}
+    decoder = SoundfileDecoder(max_open=1)
+    errors = []
+
+    def reader(worker: int):
+        try:
+            for i in range(10):
+                path = list(tracks)[(worker + i) % len(tracks)]
+                start = (worker * 7 + i * 3) % 8
+                window = decoder.read(path, SR, start=start, duration=3.0)
+                assert np.array_equal(window, tracks[path][start * SR:(start + 3) * SR])
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=reader, args=(worker,)) for worker in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(decoder._files) == 1
+
+
+def test_changed_file_is_reopened(tmp_path):
+    path = tmp_path / 'mix.wav'
+    write_wav(path, seconds=5.0, seed=1)
+    decoder = SoundfileDecoder()
+    decoder.read(str(path), SR)
+
+    replaced = write_wav(path, seconds=6.0, seed=2)
+    os.utime(path, (1, 1))
+    assert np.array_equal(decoder.read(str(path), SR), replaced)
+
+
+@pytest.mark.skipif(shutil.which('ffmpeg') is None, reason='FFmpeg not installed')
+def test_ffmpeg_matches_soundfile(tmp_path):
+    y = write_wav(tmp_path / 'mix.wav', seconds=8.0)
+    window = FFmpegDecoder().read(str(tmp_path / 'mix.wav'), SR, start=2.0, duration=4.0)
+
+    assert np.array_equal(window, y[2 * SR:6 * SR])
+
+
+@pytest.mark.skipif(shutil.which('ffmpeg') is None, reason='FFmpeg not installed')
+def test_ffmpeg_failure_reports_its_errors(tmp_path):
+    (tmp_path / 'broken.wav').write_bytes(b'not a wav file' * 1000)
+
+    with pytest.raises(RuntimeError, match='broken.wav'):
+        FFmpegDecoder().read(str(tmp_path / 'broken.wav'), SR, duration=1.0)
@@ -0,0 +1,81 @@
+"""Tests for local fingerprints and the in-mix repeat index"""
+
+import numpy as np
+import pytest
+
+from benchmarks.common import synth_track
+from src.fingerprint import HOP, RepeatIndex, best_alignment, fingerprint
+from src.utils.config import Config
+
+SR = 22050
+
+
+@pytest.fixture(scope='module')
+def tracks():
+    """Two unrelated 90 s tracks"""
+    return synth_track(90, SR, seed=1), synth_track(90, SR, seed=2)
+
+
+def clip(y: np.ndarray, start: float, seconds: float) -> np.ndarray:
+    return y[int(start * SR):int((start + seconds) * SR)]
+
+
+def lookup(index: RepeatIndex, y: np.ndarray):
+    return index.lookup(fingerprint(y, SR), len(y) / SR, SR)
+
+
+def test_repeat_index_finds_audio_it_has_seen(tracks):
+    index = RepeatIndex(min_coverage=Config.REPEAT_MIN_COVERAGE)
+    index.add(fingerprint(clip(tracks[0], 0, 45), SR), {'title': 'first'})
+
+    # Audio inside the indexed window, at another offset
+    assert lookup(index, clip(tracks[0], 10, 30)) == {'title': 'first'}
+    assert index.stats() == {'indexed': 1, 'hits': 1, 'misses': 0}
+
+
+def test_repeat_index_misses_other_tracks(tracks):
+    index = RepeatIndex(min_coverage=Config.REPEAT_MIN_COVERAGE)
+    index.add(fingerprint(clip(tracks[0], 0, 45), SR), {'title': 'first'})
+
+    assert lookup(index, clip(tracks[1], 0, 45)) is None
+    assert index.stats()['misses'] == 1
+
+
+def test_adjacent_overlapping_window_is_not_a_repeat(tracks):
+    # 45 s windows every 30 s: the next window shares only 15 s with this
+    # one, and the next track starts after the shared part
+    index = RepeatIndex(min_coverage=Config.REPEAT_MIN_COVERAGE)
+    index.add(fingerprint(clip(tracks[0], 0, 45), SR), {'title': 'first'})
+    following = np.concatenate([clip(tracks[0], 30, 15), clip(tracks[1], 0, 30)])
+
+    assert lookup(index, following) is None
+
+
+def test_best_alignment_finds_shift_of_copy(tracks):
+    shift = 173  # Frames
+    reference = clip(tracks[0], 0, 60)
+    query = reference[shift * HOP:shift * HOP + 30 * SR]
+    other = clip(tracks[1], 0, 60)
+
+    postings = {}
+    for ref_id, y in enumerate((other, reference)):
+        for h, frame in zip(*fingerprint(y, SR)):
+            postings.setdefault(int(h), []).append((ref_id, int(frame)))
+    query_frames, ref_ids, ref_frames = [], [], []
+    for h, frame in zip(*fingerprint(query, SR)):
+        for ref_id, ref_frame in postings.get(int(h), ()):
+            query_frames.append(frame)
+            ref_ids.append(ref_id)
+            ref_frames.append(ref_frame)
+
+    ref_id, offset, agreeing = best_alignment(np.array(query_frames, dtype=np.int64),
+                                              np.array(ref_ids, dtype=np.int64),
+                                              np.array(ref_frames, dtype=np.int64))
+    assert ref_id == 1
+    assert offset == shift
+    assert len(agreeing) > 0.5 * len(query_frames)
+
+
+def test_best_alignment_without_hits():
+    empty = np.zeros(0, dtype=np.int64)
+    assert best_alignment(empty, empty, empty) is None
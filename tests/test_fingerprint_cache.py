@@ -0,0 +1,75 @@
+"""Tests for the cross-mix fingerprint cache"""
+
+import numpy as np
+import pytest
+
+from benchmarks.common import synth_track
+from src.fingerprint import fingerprint
+from src.utils.fingerprint_cache import FingerprintCache
+
+SR = 22050
+
+
+@pytest.fixture(scope='module')
+def tracks():
+    """Two unrelated 120 s tracks"""
+    return synth_track(120, SR, seed=3), synth_track(120, SR, seed=4)
+
+
+def clip(y: np.ndarray, start: float, seconds: float = 45.0) -> np.ndarray:
+    return y[int(start * SR):int((start + seconds) * SR)]
+
+
+def lookup(cache: FingerprintCache, y: np.ndarray):
+    return cache.get(fingerprint(y, SR), len(y) / SR, SR)
+
+
+def answer(title: str) -> dict:
+    return {'artist': 'Artist', 'title': title, 'confidence': 0.9, 'source': 'acrcloud', 'metadata': None}
+
+
+def test_segment_cut_at_another_offset_hits(tmp_path, tracks):
+    cache = FingerprintCache(str(tmp_path / 'fp.sqlite3'))
+    cache.put(fingerprint(clip(tracks[0], 0), SR), answer('First'))
+
+    # Two seconds later: not a whole number of STFT hops
+    assert lookup(cache, clip(tracks[0], 2))['title'] == 'First'
+    assert lookup(cache, clip(tracks[1], 2)) is None
+    stats = cache.stats()
+    assert (stats['segments'], stats['stored'], stats['hits'], stats['misses']) == (1, 1, 1, 1)
+    assert stats['hit_rate'] == 0.5
+
+
+def test_segment_from_elsewhere_in_the_track_misses(tmp_path, tracks):
+    cache = FingerprintCache(str(tmp_path / 'fp.sqlite3'))
+    cache.put(fingerprint(clip(tracks[0], 0), SR), answer('First'))
+
+    # Same track, no audio in common with the cached segment
+    assert lookup(cache, clip(tracks[0], 60)) is None
+
+
+def test_entries_are_shared_through_the_file(tmp_path, tracks):
+    path = str(tmp_path / 'fp.sqlite3')
+    FingerprintCache(path).put(fingerprint(clip(tracks[1], 30), SR), answer('Second'))
+
+    assert lookup(FingerprintCache(path), clip(tracks[1], 28))['title'] == 'Second'
+
+
+def test_expired_entries_miss(tmp_path, tracks):
+    cache = FingerprintCache(str(tmp_path / 'fp.sqlite3'), ttl=-1)
+    cache.put(fingerprint(clip(tracks[0], 0), SR), answer('First'))
+
+    assert lookup(cache, clip(tracks[0], 0)) is None
+
+
+def test_eviction_drops_least_recently_matched(tmp_path, tracks):
+    cache = FingerprintCache(str(tmp_path / 'fp.sqlite3'), max_segments=1)
+    cache.put(fingerprint(clip(tracks[0], 0), SR), answer('First'))
+    cache.put(fingerprint(clip(tracks[1], 0), SR), answer('Second'))
+    assert lookup(cache, clip(tracks[0], 0))['title'] == 'First'
+
+    with cache._lock:
+        cache._evict(cache._conn.execute('SELECT MAX(accessed) FROM segments').fetchone()[0])
+    assert cache.stats()['segments'] == 1
+    assert lookup(cache, clip(tracks[0], 0))['title'] == 'First'
+    assert lookup(cache, clip(tracks[1], 0)) is None
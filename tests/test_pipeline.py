@@ -0,0 +1,155 @@
+"""Tests for the segment drivers in src.pipeline"""
+
+import asyncio
+
+import pytest
+
+from src import scheduler
+from src.pipeline import recognize_segment, recognize_segment_async, run_segments_adaptive, run_segments_screened
+from src.recognizers.base import BaseRecognizer, RecognitionResult
+from src.utils.circuit_breaker import breaker_states
+from src.utils.config import Config
+from src.utils.track_utils import infer_track
+
+# Window -> track for a 20-window mix: A, then B from window 7, then C from window 15
+TRACKS = ['A'] * 7 + ['B'] * 8 + ['C'] * 5
+SEGMENTS = [(i * 30.0, i * 30.0 + 45.0) for i in range(len(TRACKS))]
+
+
+def answer(index: int) -> dict:
+    return {'artist': TRACKS[index], 'title': TRACKS[index]}
+
+
+@pytest.mark.parametrize('engine', ['threads', 'asyncio'])
+@pytest.mark.parametrize('stride', [1, 4, 6])
+def test_adaptive_matches_querying_every_window(engine, stride):
+    queried = []
+
+    if engine == 'asyncio':
+        async def process(index, start_time, end_time):
+            queried.append(index)
+            return answer(index)
+    else:
+        def process(index, start_time, end_time):
+            queried.append(index)
+            return answer(index)
+
+    completed = {}
+    results, count = run_segments_adaptive(SEGMENTS, process, stride=stride, workers=3, engine=engine,
+                                           on_complete=lambda index, result: completed.setdefault(index, result))
+
+    assert [(r['artist'], r['title']) for r in results] == [(t, t) for t in TRACKS]
+    assert sorted(completed) == list(range(len(TRACKS)))
+    assert count == len(queried) == len(set(queried))
+    if stride > 1:
+        assert count < len(TRACKS)
+    # Both sides of every track change were queried, not inferred
+    for index in range(1, len(TRACKS)):
+        if TRACKS[index] != TRACKS[index - 1]:
+            assert {index - 1, index} <= set(queried)
+
+
+def test_adaptive_marks_inferred_windows():
+    results, count = run_segments_adaptive(SEGMENTS[:7], lambda index, start_time, end_time: answer(index), stride=6)
+
+    assert count == 2  # Windows 0 and 6 are both track A
+    assert all(results[i].get('inferred') for i in range(1, 6))
+    assert results[3]['start_time'] == '00:01:30'
+
+
+def test_adaptive_bisects_gaps_without_answers():
+    # Nothing found anywhere: every window ends up queried
+    results, count = run_segments_adaptive(SEGMENTS, lambda index, start_time, end_time: None, stride=4)
+    assert count == len(SEGMENTS)
+    assert results == [None] * len(SEGMENTS)
+
+
+def test_adaptive_without_segments():
+    assert run_segments_adaptive([], lambda *args: None) == ([], 0)
+
+
+@pytest.mark.parametrize('engine', ['threads', 'asyncio'])
+@pytest.mark.parametrize('sampling', ['all', 'adaptive'])
+def test_screened_counts_each_outcome(engine, sampling):
+    screen = [None] * len(TRACKS)
+    screen[3] = 'noise'  # Deferred, between two windows of track A: inferred
+    screen[10] = 'silence'  # Always skipped
+    calls = []
+
+    def result(index):
+        track = answer(index)
+        if index == 12:
+            track['cached'] = True  # Answered from a cache
+        if index == 17:
+            return infer_track(track, *SEGMENTS[index])  # Repeat index hit
+        return track
+
+    if engine == 'asyncio':
+        async def process(index, start_time, end_time):
+            calls.append(index)
+            return result(index)
+    else:
+        def process(index, start_time, end_time):
+            calls.append(index)
+            return result(index)
+
+    _, counts = run_segments_screened(SEGMENTS, process, screen, policy='defer', sampling=sampling, stride=4,
+                                      workers=3, engine=engine)
+
+    assert counts['low_info'] == 2
+    assert counts['skipped'] == 1
+    assert counts['queried'] + counts['reused'] == len(calls)
+    assert counts['queried'] + counts['reused'] + counts['inferred'] + counts['skipped'] == len(TRACKS)
+    assert counts['reused'] == sum(1 for index in calls if index in (12, 17))
+    assert 3 not in calls
+
+
+class Answering(BaseRecognizer):
+    """Answers every segment with a fixed confidence (None = no match)"""
+
+    def __init__(self, name, confidence, offline=False):
+        self.name = name
+        self.confidence = confidence
+        self.offline = offline
+        self.calls = 0
+
+    def is_available(self):
+        return True
+
+    def _recognize(self, audio, start_time=0.0, duration=30.0):
+        self.calls += 1
+        if self.confidence is None:
+            return None
+        return RecognitionResult(self.name, self.name, self.confidence, self.name)
+
+
+@pytest.fixture
+def providers(monkeypatch, tmp_path):
+    # No result cache, and a throwaway stats file: every call reaches the fake provider
+    monkeypatch.setattr(Config, 'RESULT_CACHE_ENABLED', False)
+    monkeypatch.setattr(Config, 'PROVIDER_STATS_PATH', str(tmp_path / 'provider_stats.json'))
+    monkeypatch.setattr(scheduler, '_scheduler', None)
+    return [Answering('test-local', 0.3, offline=True), Answering('test-p1', None),
+            Answering('test-p2', 0.9), Answering('test-p3', 0.95)]
+
+
+@pytest.mark.parametrize('engine', ['threads', 'asyncio'])
+def test_sequential_stops_at_first_accepted_answer(providers, engine):
+    if engine == 'asyncio':
+        results = asyncio.run(recognize_segment_async(providers, b'audio', 0.0, 45.0, 0.5))
+    else:
+        results = recognize_segment(providers, b'audio', 0.0, 45.0, 0.5)
+
+    # Accepted answer first, the weak local one kept behind it
+    assert [r.source for r in results] == ['test-p2', 'test-local']
+    assert [p.calls for p in providers] == [1, 1, 1, 0]
+    # Local lookups bypass the circuit breaker
+    assert 'test-local' not in breaker_states()
+
+
+def test_accepted_local_answer_skips_every_api(providers):
+    providers[0].confidence = 0.8
+    results = recognize_segment(providers, b'audio', 0.0, 45.0, 0.5)
+
+    assert [r.source for r in results] == ['test-local']
+    assert [p.calls for p in providers] == [1, 0, 0, 0]
@@ -0,0 +1,164 @@
+"""Tests for the per-provider token bucket and throttling helpers"""
+
+import asyncio
+from email.utils import formatdate
+
+import pytest
+import requests
+
+from src.recognizers.base import BaseRecognizer, RecognitionResult
+from src.utils import rate_limit
+from src.utils.rate_limit import (
+    RateLimitedError, TokenBucket, backoff_delay, get_limiter, parse_retry_after, throttle_delay
+)
+
+
+class FakeClock:
+    """monotonic() that only moves when the code under test sleeps"""
+
+    def __init__(self):
+        self.now = 100.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+    async def sleep_async(self, seconds):
+        self.sleep(seconds)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit.time, 'monotonic', clock.monotonic)
+    monkeypatch.setattr(rate_limit.time, 'sleep', clock.sleep)
+    monkeypatch.setattr(rate_limit.asyncio, 'sleep', clock.sleep_async)
+    return clock
+
+
+def http_error(status: int, retry_after: str = None) -> requests.exceptions.HTTPError:
+    response = requests.Response()
+    response.status_code = status
+    if retry_after is not None:
+        response.headers['Retry-After'] = retry_after
+    return requests.exceptions.HTTPError(str(status), response=response)
+
+
+def test_burst_then_rate(clock):
+    bucket = TokenBucket(rate=2.0, burst=3)
+    for _ in range(3):
+        bucket.acquire()
+    assert clock.slept == []
+
+    bucket.acquire()
+    assert sum(clock.slept) == pytest.approx(0.5)
+
+
+def test_idle_refill_is_capped_at_burst(clock):
+    bucket = TokenBucket(rate=1.0, burst=2)
+    clock.now += 60
+    for _ in range(3):
+        bucket.acquire()
+    assert sum(clock.slept) == pytest.approx(1.0)
+
+
+def test_pause_holds_every_caller_then_resumes_with_one_token(clock):
+    bucket = TokenBucket(rate=1.0, burst=5)
+    bucket.pause(10)
+    bucket.acquire()
+    assert sum(clock.slept) == pytest.approx(10)
+
+    bucket.acquire()  # No burst after the pause
+    assert sum(clock.slept) == pytest.approx(11)
+
+
+def test_pause_keeps_the_later_deadline(clock):
+    bucket = TokenBucket(rate=1.0)
+    bucket.pause(10)
+    bucket.pause(2)
+    bucket.acquire()
+    assert sum(clock.slept) == pytest.approx(10)
+
+
+def test_acquire_async_waits(clock):
+    bucket = TokenBucket(rate=4.0, burst=1)
+
+    async def take_two():
+        await bucket.acquire_async()
+        await bucket.acquire_async()
+
+    asyncio.run(take_two())
+    assert sum(clock.slept) == pytest.approx(0.25)
+
+
+def test_limiter_per_provider():
+    assert get_limiter('test-unlimited', 0, 1) is None
+    bucket = get_limiter('test-limited', 5, 2)
+    assert get_limiter('test-limited', 5, 2) is bucket
+    assert get_limiter('test-other', 5, 2) is not bucket
+
+
+def test_parse_retry_after():
+    assert parse_retry_after('7') == 7.0
+    assert parse_retry_after('-3') == 0.0
+    assert 25 < parse_retry_after(formatdate(rate_limit.time.time() + 30, usegmt=True)) <= 30
+    assert parse_retry_after('soon') is None
+    assert parse_retry_after(None) is None
+
+
+def test_throttle_delay():
+    assert throttle_delay(http_error(429, '4')) == 4.0
+    assert throttle_delay(http_error(429)) == 0.0
+    assert throttle_delay(http_error(503, '2')) == 2.0
+    assert throttle_delay(http_error(503)) is None  # Plain outage, not throttling
+    assert throttle_delay(http_error(401)) is None
+    assert throttle_delay(RateLimitedError('slow down', retry_after=1.5)) == 1.5
+    assert throttle_delay(ValueError('other')) is None
+
+
+def test_backoff_delay_bounds():
+    for attempt in range(8):
+        delay = min(30.0, 0.5 * 2 ** attempt)
+        assert delay / 2 <= backoff_delay(attempt, 0.5, 30.0) <= delay
+
+
+class ThrottledRecognizer(BaseRecognizer):
+    """Answers after failing with the given errors"""
+
+    name = 'test-throttled'
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def is_available(self):
+        return True
+
+    def _recognize(self, audio, start_time=0.0, duration=30.0):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return RecognitionResult('Artist', 'Title', 0.9, self.name)
+
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    from src.recognizers import base
+    monkeypatch.setattr(base.time, 'sleep', lambda seconds: None)
+
+
+def test_recognizer_retries_throttled_calls(no_backoff):
+    recognizer = ThrottledRecognizer([http_error(429, '0'), RateLimitedError('3015')])
+    assert recognizer._call_with_backoff(b'audio', 0, 30).title == 'Title'
+    assert recognizer.calls == 3
+
+
+def test_recognizer_does_not_retry_other_errors(no_backoff):
+    recognizer = ThrottledRecognizer([http_error(401)])
+    with pytest.raises(requests.exceptions.HTTPError):
+        recognizer._call_with_backoff(b'audio', 0, 30)
+    assert recognizer.calls == 1
@@ -0,0 +1,77 @@
+"""Tests for the on-disk reference index of a local library"""
+
+import os
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from benchmarks.common import synth_track
+from src.fingerprint import spectral_peaks
+from src.reference_index import ReferenceIndex, parse_track_name
+
+SR = 22050
+EXTENSIONS = ('.wav',)
+
+
+def decode(path: str):
+    samples, sample_rate = sf.read(path, dtype='int16')
+    return samples, sample_rate
+
+
+def match(index: ReferenceIndex, y: np.ndarray):
+    return index.match(spectral_peaks(y, SR), len(y) / SR, SR)
+
+
+@pytest.fixture(scope='module')
+def tracks():
+    return {f"Artist {k} - Track {k}.wav": synth_track(60, SR, seed=10 + k) for k in range(3)}
+
+
+@pytest.fixture
+def library(tmp_path, tracks):
+    library = tmp_path / 'library'
+    library.mkdir()
+    for name, y in tracks.items():
+        sf.write(str(library / name), y, SR, subtype='PCM_16')
+    return library
+
+
+def test_update_indexes_library_and_matches_clips(tmp_path, library, tracks):
+    index = ReferenceIndex(str(tmp_path / 'index'))
+    counts = index.update(str(library), decode, EXTENSIONS)
+
+    assert counts['added'] == 3 and counts['failed'] == 0
+    assert len(index) == 3
+    found = match(index, tracks['Artist 1 - Track 1.wav'][20 * SR:45 * SR])
+    assert (found['artist'], found['title']) == ('Artist 1', 'Track 1')
+    assert found['offset'] == pytest.approx(20.0, abs=0.1)
+    assert match(index, synth_track(25, SR, seed=99)) is None
+
+
+def test_update_is_incremental(tmp_path, library, tracks):
+    index = ReferenceIndex(str(tmp_path / 'index'))
+    index.update(str(library), decode, EXTENSIONS)
+
+    os.unlink(library / 'Artist 0 - Track 0.wav')
+    counts = index.update(str(library), decode, EXTENSIONS)
+    assert counts['removed'] == 1 and counts['unchanged'] == 2 and counts['added'] == 0
+    assert len(index) == 2
+    assert match(index, tracks['Artist 0 - Track 0.wav'][10 * SR:35 * SR]) is None
+
+    # Reopened from disk, compacted: the remaining tracks still match
+    index = ReferenceIndex(str(tmp_path / 'index'))
+    index.compact()
+    assert len(index) == 2
+    assert match(index, tracks['Artist 2 - Track 2.wav'][10 * SR:35 * SR])['title'] == 'Track 2'
+
+
+def test_empty_index_matches_nothing(tmp_path):
+    index = ReferenceIndex(str(tmp_path / 'missing'))
+    assert len(index) == 0
+    assert match(index, synth_track(25, SR, seed=1)) is None
+
+
+def test_parse_track_name():
+    assert parse_track_name('/music/Artist - Title - Remix.mp3') == ('Artist', 'Title - Remix')
+    assert parse_track_name('untitled.wav') == (None, 'untitled')
@@ -0,0 +1,68 @@
+"""Tests for the SQLite recognition result cache"""
+
+import pytest
+
+from src.utils import result_cache
+from src.utils.result_cache import ResultCache
+
+ANSWER = {'artist': 'Artist', 'title': 'Title', 'confidence': 0.9, 'source': 'acrcloud', 'metadata': None}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResultCache(str(tmp_path / 'results.sqlite3'))
+
+
+def test_miss_then_hit(cache):
+    assert cache.get('abc', 'acrcloud') == (False, None)
+    cache.put('abc', 'acrcloud', ANSWER, latency=2.5)
+
+    assert cache.get('abc', 'acrcloud') == (True, ANSWER)
+    stats = cache.stats()
+    assert (stats['entries'], stats['hits'], stats['misses']) == (1, 1, 1)
+    assert stats['api_calls_saved'] == {'acrcloud': 1}
+    assert stats['api_seconds_saved'] == 2.5
+
+
+def test_no_match_is_cached(cache):
+    cache.put('abc', 'acrcloud', None)
+    assert cache.get('abc', 'acrcloud') == (True, None)
+
+
+def test_answers_are_per_provider(cache):
+    cache.put('abc', 'acrcloud', ANSWER)
+    assert cache.get('abc', 'shazam') == (False, None)
+
+
+def test_expired_entries_miss(cache, monkeypatch):
+    cache.ttl = 60
+    now = result_cache.time.time()
+    cache.put('abc', 'acrcloud', ANSWER)
+    monkeypatch.setattr(result_cache.time, 'time', lambda: now + 61)
+
+    assert cache.get('abc', 'acrcloud') == (False, None)
+    assert cache.stats()['entries'] == 0
+
+
+def test_least_recently_used_are_evicted(cache, monkeypatch):
+    cache.max_entries = 50
+    clock = [1000.0]
+    monkeypatch.setattr(result_cache.time, 'time', lambda: clock[0])
+    for i in range(99):
+        clock[0] += 1
+        cache.put(f'h{i}', 'acrcloud', ANSWER)
+    clock[0] += 1
+    assert cache.get('h0', 'acrcloud')[0]  # Oldest entry, but just used
+    clock[0] += 1
+    cache.put('h99', 'acrcloud', ANSWER)  # 100th insert evicts
+
+    assert cache.stats()['entries'] == 50
+    assert cache.get('h0', 'acrcloud')[0]
+    assert not cache.get('h1', 'acrcloud')[0]
+    assert cache.get('h99', 'acrcloud')[0]
+
+
+def test_file_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / 'results.sqlite3')
+    ResultCache(path).put('abc', 'acrcloud', ANSWER)
+    assert ResultCache(path).get('abc', 'acrcloud') == (True, ANSWER)